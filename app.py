@@ -1,10 +1,11 @@
 import os
-from flask import Flask, request, render_template, redirect, url_for, flash, send_file
-from src.scraper import crawl_and_filter_content, extract_subdomains, scrape_page
-from src.gemini_query import gemini_query_api, gemini_query_but, save_ctdl_to_json
-from src.convert_csv import json_file_to_csv
-from src.publish import post_bulk_publish
-from src.validate import validate_json
+import time
+STARTUP_STARTED = time.perf_counter()  # Taken before the imports below so app_startup_seconds includes them
+from flask import Flask, request, render_template, redirect, url_for, flash, send_file, jsonify, Response
+from src.pipeline import run_pipeline
+from src.jobs import JobManager, SUCCEEDED
+from src.workspace import WorkspaceManager
+from src.metrics import METRICS
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -23,84 +24,106 @@ app.config["UPLOAD_FOLDER"] = os.path.join(BASE_DIR, 'uploads')
 # Path to the keywords file
 KEYWORDS_FILE = os.path.join(BASE_DIR, 'config', 'keywords.txt')
 
+# Each run writes its outputs to its own workspace, uploads/runs/<run_id>, where the run ID is the job ID.
+# The job status is kept there too, so every worker process of a WSGI server can serve it.
+workspaces = WorkspaceManager(os.path.join(app.config["UPLOAD_FOLDER"], 'runs'))
+
+def run_job(job):
+    return run_pipeline(job.domain, job.publish_method, KEYWORDS_FILE, workspaces.path(job.id),
+                        progress=job.update_stage, cancel_event=job.cancel_event,
+                        cache_folder=app.config["UPLOAD_FOLDER"])
+
+# Background workers that run the crawl, extraction and publish pipeline for submitted domains
+job_manager = JobManager(run_job, workspaces=workspaces)
+METRICS.add_collector(lambda: [('jobs', {'status': status}, count) for status, count in job_manager.stats().items()])
+METRICS.set('app_startup_seconds', time.perf_counter() - STARTUP_STARTED)
+
+def wants_json():
+    return request.accept_mimetypes.best == 'application/json'
+
 @app.route('/')
 def index():
-    return render_template('index.html', ctdl_json=None)
+    job_id = request.args.get('job')
+    job = job_manager.get(job_id) if job_id else None
+    if job is None:
+        if job_id:
+            flash("Job not found. It may have expired.", "error")
+        return render_template('index.html', ctdl_json=None)
+
+    if not job.finished:
+        return render_template('index.html', ctdl_json=None, job=job.to_dict())
+
+    # Show the outcome of a finished job
+    ctdl_json = None
+    if job.status == SUCCEEDED:
+        for category, message in job.result['messages']:
+            flash(message, category)
+        ctdl_json = job.result['ctdl_json']
+    elif job.error:
+        flash(f"The run failed: {job.error}", "error")
+    else:
+        flash("The run was cancelled.", "error")
+    return render_template('index.html', ctdl_json=ctdl_json, publish_method=job.publish_method, run_id=job.id)
 
 @app.route('/scrape', methods=['POST'])
 def scrape():
-    ctdl_json = None
     domain_input = request.form['domain']
     publish_method = request.form.get('publishMethod', 'api')  # Default to 'api' if not specified
-    
+
     if not domain_input:
+        if wants_json():
+            return jsonify({'error': "Please provide a domain."}), 400
         flash("Please provide a domain.", "error")
         return redirect(url_for('index'))
-    
-    # Read keywords from the file
+
+    # Check the keywords file before queuing the job
     if not os.path.exists(KEYWORDS_FILE):
+        if wants_json():
+            return jsonify({'error': "Keywords file not found."}), 500
         flash("Keywords file not found. Please ensure 'keywords.txt' exists in the app directory.", "error")
         return redirect(url_for('index'))
-    
-    with open(KEYWORDS_FILE, 'r') as f:
-        keywords = [line.strip() for line in f]
-
-    # Extract URLs and crawl
-    LinkTree = f"https://{domain_input}"
-    urls_to_scrape = extract_subdomains(LinkTree)
-    filtered_links_with_keywords = []
-    visited_links = set()
-    for url in urls_to_scrape:
-        filtered_links_with_keywords = crawl_and_filter_content(url, keywords, visited=visited_links)
-    print("Relevant links and keywords saved to 'relevant_links.json'.")
-
-    # Scrape content
-    if not filtered_links_with_keywords:
-        flash("No links found with the specified keywords. Please check your input.", "error")
-    with open(os.path.join(app.config['UPLOAD_FOLDER'], "scraped_content.txt"), "w", encoding="utf-8") as file:
-        for entry in filtered_links_with_keywords:
-            scrape_page(entry['url'], file)
-    
-    # Query Google Gemini
-    with open(os.path.join(app.config['UPLOAD_FOLDER'], "scraped_content.txt"), "r", encoding="utf-8") as file:
-        text = file.read()
-    
-    # Use different API calls based on publish method
-    if publish_method == 'api':
-        ctdl_json = gemini_query_api(text)
-        if ctdl_json:
-            save_ctdl_to_json(ctdl_json, filepath=os.path.join(app.config['UPLOAD_FOLDER'], "support_services_api.json"))
-            json_filepath = os.path.join(app.config["UPLOAD_FOLDER"], "support_services_api.json")
-
-            try:
-                post_bulk_publish(ctdl_json)  # Publish to API
-                flash("Support services published to API successfully.", "success")
-            except Exception as e:
-                flash(f"Error publishing to API: {str(e)}", "error")
-    else:  # bulk
-        ctdl_json = gemini_query_but(text)
-        if ctdl_json:
-            save_ctdl_to_json(ctdl_json, filepath=os.path.join(app.config['UPLOAD_FOLDER'], "support_services_but.json"))
-            json_filepath = os.path.join(app.config["UPLOAD_FOLDER"], "support_services_but.json")
-            filtered_json_filepath = os.path.join(app.config["UPLOAD_FOLDER"], "filtered_output.json")
-            output_csv = os.path.join(app.config["UPLOAD_FOLDER"], "support_services_but.csv")
-            
-            validate_json(json_filepath, filtered_json_filepath) # Validate and filter JSON
-            json_file_to_csv(filtered_json_filepath, output_csv) # Convert JSON to CSV for bulk upload
-            flash("Support services prepared for bulk upload successfully.", "success")
-    
-    if not ctdl_json:
-        flash("No data returned from the Gemini API. Please check your input.", "error")
-        return redirect(url_for('index'))
-    
-    return render_template('index.html', ctdl_json=ctdl_json, publish_method=publish_method)
-    
-#Download csv
-@app.route('/download')
-def download_csv():
-    output_csv = os.path.join(app.config["UPLOAD_FOLDER"], "support_services_but.csv")
-    if os.path.exists(output_csv):
-        return send_file(output_csv, as_attachment=True) 
+
+    # Queue the pipeline and return immediately
+    job = job_manager.submit(domain_input, publish_method)
+    if wants_json():
+        return jsonify(job.to_dict()), 202, {'Location': url_for('job_status', job_id=job.id)}
+    return redirect(url_for('index', job=job.id))
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': "Job not found."}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': "Job not found."}), 404
+    if not job.finished:
+        return jsonify({'error': "Job has not finished.", 'status': job.status}), 409
+    if job.status != SUCCEEDED:
+        return jsonify({'error': job.error or "Job was cancelled.", 'status': job.status}), 410
+    return jsonify(dict(job.result, messages=[list(message) for message in job.result['messages']]))
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': "Job not found."}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/metrics')
+def metrics():
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+#Download the csv of a run
+@app.route('/download/<run_id>')
+def download_csv(run_id):
+    output_csv = workspaces.file(run_id, "support_services_but.csv")
+    if output_csv:
+        return send_file(output_csv, as_attachment=True)
     else:
         return "File not found!", 404
 
@@ -0,0 +1,268 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from src.gemini_scheduler import DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE, DEFAULT_MAX_CONCURRENT
+
+# Load environment variables from .env file
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+KEYWORDS_FILE = os.path.join(BASE_DIR, 'config', 'keywords.txt')
+DEFAULT_OUTPUT_DIR = os.path.join(BASE_DIR, 'uploads', 'batch')
+
+# Written to a domain's output folder when its run has completed
+RESULT_FILE = 'result.json'
+PUBLISH_METHODS = ('api', 'bulk')
+# Gemini quota settings split between the worker processes, with the scheduler's defaults
+QUOTA_SETTINGS = {
+    'GEMINI_REQUESTS_PER_MINUTE': DEFAULT_REQUESTS_PER_MINUTE,
+    'GEMINI_TOKENS_PER_MINUTE': DEFAULT_TOKENS_PER_MINUTE,
+    'GEMINI_MAX_CONCURRENT': DEFAULT_MAX_CONCURRENT
+}
+
+
+def read_domains(path, default_publish_method):
+    """
+    Reads the domains to process from a text or JSON Lines file.
+
+    Text files hold one domain per line. JSON Lines files hold one object per line with a "domain" key and
+    an optional "publish_method" key. Blank lines and lines starting with '#' are ignored, and repeated
+    domains are only processed once. Malformed JSON lines, entries without a domain and domains with a
+    publish method other than 'api' or 'bulk' are reported and skipped.
+
+    Parameters:
+    path (str): Path to the domains file.
+    default_publish_method (str): The publish method for domains that do not set one.
+
+    Returns:
+    list: A list of (domain, publish_method) tuples.
+    """
+    domains = []
+    seen = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                try:
+                    entry = json.loads(line)
+                except ValueError as e:
+                    print(f"Skipping line {number}: invalid JSON ({e}).")
+                    continue
+                domain = entry.get('domain') if isinstance(entry, dict) else None
+                if not isinstance(domain, str) or not domain.strip():
+                    print(f"Skipping line {number}: no \"domain\".")
+                    continue
+                domain = domain.strip()
+                publish_method = entry.get('publish_method', default_publish_method)
+            else:
+                domain, publish_method = line, default_publish_method
+            domain = re.sub(r'^https?://', '', domain).strip('/')
+            if publish_method not in PUBLISH_METHODS:
+                print(f"Skipping {domain}: unknown publish method {publish_method!r} (expected 'api' or 'bulk').")
+                continue
+            if domain and domain not in seen:
+                seen.add(domain)
+                domains.append((domain, publish_method))
+    return domains
+
+
+def domain_folder(output_dir, domain):
+    """
+    Returns the output folder for a domain.
+
+    Parameters:
+    output_dir (str): The batch output directory.
+    domain (str): The school domain.
+
+    Returns:
+    str: The path of the domain's folder.
+    """
+    return os.path.join(output_dir, re.sub(r'[^A-Za-z0-9._-]', '_', domain))
+
+
+def load_result(output_dir, domain):
+    """
+    Returns the saved result of a domain's previous run, or None if it has not completed.
+
+    Parameters:
+    output_dir (str): The batch output directory.
+    domain (str): The school domain.
+
+    Returns:
+    dict: The saved result, or None.
+    """
+    path = os.path.join(domain_folder(output_dir, domain), RESULT_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _count_services(ctdl_json):
+    try:
+        data = json.loads(ctdl_json)
+    except (TypeError, ValueError):
+        return 0
+    if isinstance(data, dict):
+        return len(data.get('SupportServices', [data]))
+    return len(data)
+
+
+def max_workers_for_quota():
+    """
+    Returns the largest number of worker processes the Gemini quota can be split between.
+
+    Every worker needs a share of at least 1 of each quota setting, so there can be no more workers than the
+    smallest setting (usually `GEMINI_MAX_CONCURRENT` or `GEMINI_REQUESTS_PER_MINUTE`).
+
+    Returns:
+    int: The maximum number of workers.
+    """
+    return max(min(int(os.getenv(name, default)) for name, default in QUOTA_SETTINGS.items()), 1)
+
+
+def worker_quota(workers):
+    """
+    Splits the Gemini quota evenly between worker processes.
+
+    Each worker process has its own Gemini scheduler, so without a split every worker would use the whole
+    quota and the batch would exceed it by the number of workers. `workers` should be at most
+    `max_workers_for_quota()`, so that every share is at least 1 and the shares add up to no more than the quota.
+
+    Parameters:
+    workers (int): The number of worker processes.
+
+    Returns:
+    dict: The per-worker value of each quota environment variable.
+    """
+    return {name: str(max(int(os.getenv(name, default)) // workers, 1)) for name, default in QUOTA_SETTINGS.items()}
+
+
+def _init_worker(quota):
+    # Runs in each worker process before its first domain, so its scheduler is created with the worker's share
+    os.environ.update(quota)
+
+
+def run_domain(domain, publish_method, keywords_file, output_dir):
+    """
+    Runs the pipeline for one domain in a worker process and records the outcome in its folder.
+
+    Parameters:
+    domain (str): The school domain.
+    publish_method (str): 'api' or 'bulk'.
+    keywords_file (str): Path to the keywords file.
+    output_dir (str): The batch output directory.
+
+    Returns:
+    dict: A summary with 'domain', 'publish_method', 'status', 'services', 'seconds', 'messages', 'metrics' (the
+    run's timing summary) and 'error'.
+    """
+    from src.pipeline import run_pipeline
+
+    folder = domain_folder(output_dir, domain)
+    os.makedirs(folder, exist_ok=True)
+    started = time.time()
+    summary = {'domain': domain, 'publish_method': publish_method, 'services': 0, 'messages': [], 'error': None}
+    try:
+        result = run_pipeline(domain, publish_method, keywords_file, folder)
+        summary['services'] = _count_services(result['ctdl_json'])
+        summary['messages'] = [list(message) for message in result['messages']]
+        summary['status'] = 'succeeded' if result['ctdl_json'] else 'empty'
+        summary['metrics'] = result['metrics']
+    except Exception as e:
+        summary['status'] = 'failed'
+        summary['error'] = str(e)
+    summary['seconds'] = round(time.time() - started, 1)
+
+    # Only successful runs are recorded, so failed or empty domains are retried on the next invocation
+    if summary['status'] == 'succeeded':
+        with open(os.path.join(folder, RESULT_FILE), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    return summary
+
+
+def print_summary(summaries):
+    """
+    Prints one line per domain and the totals of a batch run.
+
+    Parameters:
+    summaries (list): The per-domain summaries.
+    """
+    print()
+    print(f"{'Domain':40} {'Status':10} {'Services':>8} {'Seconds':>8}")
+    for summary in sorted(summaries, key=lambda s: s['domain']):
+        print(f"{summary['domain']:40} {summary['status']:10} {summary['services']:>8} {summary.get('seconds', 0):>8}")
+    counts = {}
+    for summary in summaries:
+        counts[summary['status']] = counts.get(summary['status'], 0) + 1
+    print()
+    print(f"{len(summaries)} domains: " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    print(f"{sum(s['services'] for s in summaries)} support services extracted.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract and publish support services for many institutions.")
+    parser.add_argument('domains_file', help="Text file with one domain per line, or JSON Lines with a 'domain' key")
+    parser.add_argument('--publish-method', choices=['api', 'bulk'], default='bulk',
+                        help="Publish method for domains that do not set one (default: bulk)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                        help="Number of domains processed at once (default: CPU count)")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR,
+                        help="Directory for per-domain outputs (default: uploads/batch)")
+    parser.add_argument('--keywords', default=KEYWORDS_FILE, help="Keywords file (default: config/keywords.txt)")
+    parser.add_argument('--force', action='store_true', help="Re-run domains that already completed")
+    args = parser.parse_args(argv)
+
+    domains = read_domains(args.domains_file, args.publish_method)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    summaries = []
+    pending = []
+    for domain, publish_method in domains:
+        previous = None if args.force else load_result(args.output_dir, domain)
+        if previous:
+            print(f"Skipping {domain}: already completed.")
+            summaries.append(dict(previous, status='skipped'))
+        else:
+            pending.append((domain, publish_method))
+
+    workers = max(args.workers, 1)
+    if workers > max_workers_for_quota():
+        workers = max_workers_for_quota()
+        print(f"Using {workers} workers, since the Gemini quota cannot be split between more.")
+    quota = worker_quota(workers)
+    print(f"Processing {len(pending)} of {len(domains)} domains with {workers} workers "
+          f"({quota['GEMINI_REQUESTS_PER_MINUTE']} Gemini requests per minute each)...")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(quota,)) as executor:
+        futures = {
+            executor.submit(run_domain, domain, publish_method, args.keywords, args.output_dir): domain
+            for domain, publish_method in pending
+        }
+        for future in as_completed(futures):
+            try:
+                summary = future.result()
+            except Exception as e:
+                summary = {'domain': futures[future], 'status': 'failed', 'services': 0, 'error': str(e)}
+            print(f"{summary['domain']}: {summary['status']} ({summary['services']} services)")
+            summaries.append(summary)
+
+    with open(os.path.join(args.output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summaries, f, indent=2)
+    print_summary(summaries)
+    return 1 if any(summary['status'] == 'failed' for summary in summaries) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
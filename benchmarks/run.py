@@ -0,0 +1,272 @@
+"""
+Offline benchmarks for app startup, the crawl, extract, validate and CSV stages, and the end-to-end pipeline.
+
+Everything runs against a synthetic website served from localhost, a deterministic stub in place of Gemini and
+a stub Registry Assistant endpoint, so results are reproducible without network access or API keys.
+
+Usage:
+    python -m benchmarks.run --pages 500 --repeat 3
+    python -m benchmarks.run --compare benchmarks/results/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+from benchmarks.site import SiteServer, SERVICE_KEYWORDS
+from benchmarks.stubs import RegistryStub, offline_pipeline
+from src.crawler import crawl_site, create_session
+from src.page_store import PageStore
+from src.sinks import MemorySink
+from src.keyword_matcher import KeywordMatcher
+from src.extract import ContentExtractor
+from src.url_check import UrlChecker
+from src.convert_csv import write_bulk_csv
+from src.pipeline import run_pipeline
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+
+# Benchmark name -> (unit, whether higher is better)
+BENCHMARKS = {
+    'startup': ('s', False),
+    'crawl': ('pages/s', True),
+    'extract': ('MB/s', True),
+    'validate': ('URLs/s', True),
+    'csv': ('rows/s', True),
+    'pipeline_api': ('s', False),
+    'pipeline_bulk': ('s', False)
+}
+# Changes smaller than this fraction are reported as noise by --compare
+COMPARE_THRESHOLD = 0.10
+
+
+def _best(values, higher_is_better):
+    return max(values) if higher_is_better else min(values)
+
+
+def bench_startup():
+    # Imports the web app in a fresh interpreter and reads the app_startup_seconds it measured
+    code = ("import app\n"
+            "print(next(value for name, _, value in app.METRICS.samples() if name == 'app_startup_seconds'))")
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-W', 'ignore', '-c', code], capture_output=True, text=True, cwd=REPO_DIR,
+                            check=True).stdout
+    seconds = time.perf_counter() - started
+    app_seconds = float(output.strip().splitlines()[-1])
+    return app_seconds, {'process_seconds': round(seconds, 3)}
+
+
+def bench_crawl(site, keywords):
+    # Crawls the whole site from the home page with a fresh in-memory page store
+    started = time.perf_counter()
+    sink = MemorySink()
+    crawl_site([site.url + '/'], keywords, max_depth=100, page_store=PageStore(), sink=sink,
+               session=create_session())
+    seconds = time.perf_counter() - started
+    pages = len(site.page_urls())
+    return pages / seconds, {'pages': pages, 'matches': len(sink.records), 'seconds': round(seconds, 3)}
+
+
+def bench_extract(site):
+    # Extracts the main content of every page with one extractor, as the scrape stage does
+    extractor = ContentExtractor()
+    pages = [(url, site.pages[url[len(site.url):]]) for url in site.page_urls()]
+    started = time.perf_counter()
+    for url, html in pages:
+        extractor.extract(html, url)
+    seconds = time.perf_counter() - started
+    return extractor.bytes_in / 1e6 / seconds, {'pages': extractor.pages, 'bytes_in': extractor.bytes_in,
+                                               'bytes_out': extractor.bytes_out, 'seconds': round(seconds, 3)}
+
+
+def bench_validate(site):
+    # Checks every page URL plus missing pages with the cache disabled
+    urls = site.page_urls() + [f"{site.url}/missing-{i}/" for i in range(len(site.page_urls()) // 10)]
+    started = time.perf_counter()
+    results = UrlChecker(cache_path=None).check_many(urls)
+    seconds = time.perf_counter() - started
+    valid = sum(1 for result in results.values() if result['valid'])
+    return len(urls) / seconds, {'urls': len(urls), 'valid': valid, 'seconds': round(seconds, 3)}
+
+
+def bench_csv(records, folder):
+    # Writes Bulk Upload Template rows for synthetic records
+    started = time.perf_counter()
+    rows = write_bulk_csv(records, os.path.join(folder, 'bench.csv'))
+    seconds = time.perf_counter() - started
+    return rows / seconds, {'records': rows, 'seconds': round(seconds, 3)}
+
+
+def bench_pipeline(site, publish_method, keywords_file, llm_latency):
+    # Runs the whole pipeline against the local site in a fresh upload folder, so no caches carry over
+    with tempfile.TemporaryDirectory() as upload_folder, RegistryStub() as registry, \
+            offline_pipeline(registry.url, llm_latency=llm_latency):
+        started = time.perf_counter()
+        result = run_pipeline(site.url, publish_method, keywords_file, upload_folder, save_artifacts=False)
+        seconds = time.perf_counter() - started
+    return seconds, {'stage_seconds': result['metrics']['stage_seconds'],
+                     'relevant_pages': result['metrics'].get('relevant_pages'),
+                     'services_published': registry.services,
+                     'messages': [message for _, message in result['messages']]}
+
+
+def synthetic_records(count):
+    """
+    Builds Bulk Upload Template records shaped like the Gemini output, with every list field filled.
+
+    Parameters:
+    count (int): The number of records.
+
+    Returns:
+    list: The records.
+    """
+    return [{
+        'ExternalIdentifier': f"bench_ss_{i:05d}",
+        'ResourceName': f"Support Service {i}",
+        'Description': "Free one-on-one tutoring for undergraduate students in math, writing and science. " * 3,
+        'SubjectWebpage': f"https://example.edu/services/{i}/",
+        'LifeCycleStatusType': 'Active',
+        'Language': 'english',
+        'SupportServiceType': 'Tutoring',
+        'Keywords': ['tutoring', 'students', 'academic support'],
+        'AvailableAt': ['123 University Ave, Springfield, IL 62701'],
+        'ConditionProfile': [{'Description': 'Enrolled students', 'Condition': ['Current enrollment']}],
+        'Cost': [{'Description': 'Free', 'Price': 0}]
+    } for i in range(count)]
+
+
+def run_benchmarks(pages=200, fanout=8, keyword_density=0.3, seed=0, repeat=3, llm_latency=0.0):
+    """
+    Runs every benchmark `repeat` times and keeps the best result of each.
+
+    Parameters:
+    pages (int, optional): The number of pages of the synthetic site. Default is 200.
+    fanout (int, optional): The number of child links per page. Default is 8.
+    keyword_density (float, optional): The fraction of support service pages. Default is 0.3.
+    seed (int, optional): The site's random seed. Default is 0.
+    repeat (int, optional): The number of runs of each benchmark. Default is 3.
+    llm_latency (float, optional): The simulated Gemini response time in seconds. Default is 0.
+
+    Returns:
+    dict: The benchmark results, by name, each with 'value', 'unit', 'runs' and the details of the best run.
+    """
+    keywords = KeywordMatcher(SERVICE_KEYWORDS)
+    records = synthetic_records(pages * 10)
+    runs = {name: [] for name in BENCHMARKS}
+    with SiteServer(pages, fanout, keyword_density, seed) as site, tempfile.TemporaryDirectory() as folder:
+        keywords_file = os.path.join(folder, 'keywords.txt')
+        with open(keywords_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(SERVICE_KEYWORDS))
+        for attempt in range(repeat):
+            print(f"Run {attempt + 1} of {repeat}...")
+            runs['startup'].append(bench_startup())
+            runs['crawl'].append(bench_crawl(site, keywords))
+            runs['extract'].append(bench_extract(site))
+            runs['validate'].append(bench_validate(site))
+            runs['csv'].append(bench_csv(records, folder))
+            runs['pipeline_api'].append(bench_pipeline(site, 'api', keywords_file, llm_latency))
+            runs['pipeline_bulk'].append(bench_pipeline(site, 'bulk', keywords_file, llm_latency))
+
+    results = {}
+    for name, (unit, higher_is_better) in BENCHMARKS.items():
+        best = _best([value for value, _ in runs[name]], higher_is_better)
+        details = next(details for value, details in runs[name] if value == best)
+        results[name] = {'value': round(best, 3), 'unit': unit, 'runs': [round(value, 3) for value, _ in runs[name]],
+                         'details': details}
+    return results
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=BENCHMARKS_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """
+    Prints each benchmark next to a baseline and flags changes larger than 10%.
+
+    Parameters:
+    results (dict): The current results from `run_benchmarks`.
+    baseline (dict): The 'results' of an earlier results file.
+
+    Returns:
+    int: The number of regressions.
+    """
+    regressions = 0
+    for name, (unit, higher_is_better) in BENCHMARKS.items():
+        if name not in results or name not in baseline:
+            continue
+        current, previous = results[name]['value'], baseline[name]['value']
+        change = (current - previous) / previous if previous else 0.0
+        improved = change > 0 if higher_is_better else change < 0
+        if abs(change) < COMPARE_THRESHOLD:
+            verdict = 'no change'
+        elif improved:
+            verdict = 'faster'
+        else:
+            verdict = 'SLOWER'
+            regressions += 1
+        print(f"{name:<15} {previous:>12.3f} -> {current:>12.3f} {unit:<8} {change:+7.1%}  {verdict}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmarks.")
+    parser.add_argument('--pages', type=int, default=200, help="Pages of the synthetic site (default 200).")
+    parser.add_argument('--fanout', type=int, default=8, help="Child links per page (default 8).")
+    parser.add_argument('--keyword-density', type=float, default=0.3,
+                        help="Fraction of support service pages (default 0.3).")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed of the site (default 0).")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs of each benchmark; the best is kept (default 3).")
+    parser.add_argument('--llm-latency', type=float, default=0.0,
+                        help="Simulated Gemini response time in seconds (default 0).")
+    parser.add_argument('--output', help="Results file (default benchmarks/results/<timestamp>-<commit>.json).")
+    parser.add_argument('--compare', help="An earlier results file to compare against.")
+    args = parser.parse_args(argv)
+
+    parameters = {'pages': args.pages, 'fanout': args.fanout, 'keyword_density': args.keyword_density,
+                  'seed': args.seed, 'repeat': args.repeat, 'llm_latency': args.llm_latency}
+    results = run_benchmarks(**parameters)
+    commit = _commit()
+    timestamp = datetime.now(timezone.utc)
+    report = {
+        'commit': commit,
+        'timestamp': timestamp.isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': parameters,
+        'results': results
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{timestamp:%Y%m%dT%H%M%S}-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print()
+    for name, result in results.items():
+        print(f"{name:<15} {result['value']:>12.3f} {result['unit']}")
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('parameters') != parameters:
+            print("Warning: the baseline was run with different parameters.")
+        print(f"\nCompared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+        return 1 if compare(results, baseline['results']) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
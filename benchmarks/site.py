@@ -0,0 +1,171 @@
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+SERVICE_NAMES = [
+    'Writing Center', 'Tutoring Center', 'Counseling Center', 'Career Services Office', 'Disability Resources Office',
+    'Academic Advising Center', 'Health Center', 'Financial Aid Office', 'Veterans Center', 'Food Pantry',
+    'Learning Center', 'International Student Office', 'Legal Services Office', 'Childcare Center', 'Library Help Desk'
+]
+SERVICE_KEYWORDS = [
+    'Tutoring', 'Writing center', 'Academic advising', 'Counseling', 'Mental health', 'Career counseling',
+    'Financial aid', 'Disability services', 'Peer mentoring', 'Study groups'
+]
+FILLER_WORDS = (
+    'campus students faculty research semester department program community event lecture building '
+    'university college course library schedule office news alumni athletics parking housing dining '
+    'graduate undergraduate spring fall summer registration calendar committee policy report'
+).split()
+
+NAV = ''.join(f'<li><a href="/dept-{i}/">Department {i}</a></li>' for i in range(8))
+HEADER = f'<header><div class="logo">State University</div><nav><ul>{NAV}</ul></nav></header>'
+FOOTER = ('<footer><p>State University, 1 University Ave. Phone 555-0100.</p>'
+          '<div class="cookie-banner">We use cookies.</div></footer>')
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
+          'November', 'December']
+# Event listings repeated across pages with different dates, which only near-duplicate detection removes
+EVENT = ('<div class="event">Open house on {month} {day} at {hour}am in the Student Union ballroom. Prospective '
+         'students, families and faculty are welcome to meet advisors and tour the campus.</div>')
+CONTACT_BOX = '<div class="contact">Questions? Contact the Student Affairs office, Monday to Friday 9am-5pm.</div>'
+
+
+def _slug(name):
+    return name.lower().replace(' ', '-')
+
+
+def _paragraph(rng, words=60):
+    return ' '.join(rng.choice(FILLER_WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def generate_site(pages=200, fanout=8, keyword_density=0.3, seed=0, base_url=''):
+    """
+    Generates a synthetic university website.
+
+    Pages form a tree with `fanout` links per page, plus a few cross links, and every page repeats the same
+    header, navigation, footer and contact box. Filler pages also carry an event listing whose date varies. A `keyword_density` fraction of the pages are support service
+    pages under '/services/', each describing one uniquely named service with a support keyword; the rest are
+    filler news and department pages.
+
+    Parameters:
+    pages (int, optional): The number of HTML pages. Default is 200.
+    fanout (int, optional): The number of child links per page. Default is 8.
+    keyword_density (float, optional): The fraction of pages that describe a support service. Default is 0.3.
+    seed (int, optional): The random seed; the same parameters always produce the same site. Default is 0.
+    base_url (str, optional): The site URL, used in the absolute links of service pages. Default is ''.
+
+    Returns:
+    dict: A mapping of path to page HTML, plus 'robots.txt' and 'sitemap.xml' entries.
+    """
+    rng = random.Random(seed)
+    service_pages = set(rng.sample(range(1, pages), min(int(pages * keyword_density), pages - 1))) if pages > 1 else set()
+
+    paths = ['/']
+    services = {}
+    for i in range(1, pages):
+        if i in service_pages:
+            count = len(services)
+            name = SERVICE_NAMES[count % len(SERVICE_NAMES)]
+            if count >= len(SERVICE_NAMES):
+                name = f"{name} {count // len(SERVICE_NAMES) + 1}"
+            services[i] = (name, SERVICE_KEYWORDS[count % len(SERVICE_KEYWORDS)])
+            paths.append(f"/services/{_slug(name)}/")
+        else:
+            paths.append(f"/dept-{i % 8}/page-{i}/")
+
+    site = {}
+    for i, path in enumerate(paths):
+        children = [paths[c] for c in range(i * fanout + 1, min(i * fanout + fanout + 1, pages))]
+        cross = [paths[rng.randrange(pages)] for _ in range(2)]
+        links = ''.join(f'<li><a href="{link}">{link.strip("/") or "Home"}</a></li>' for link in children + cross)
+        if i in services:
+            name, keyword = services[i]
+            title = name
+            body = (f'<h1>{name}</h1><p>The {name} offers {keyword.lower()} support for students. '
+                    f'Visit {base_url}{path} for details.</p><p>{_paragraph(rng)}</p>')
+        else:
+            title = f"Page {i}"
+            event = EVENT.format(month=rng.choice(MONTHS), day=rng.randint(1, 28), hour=rng.randint(8, 11))
+            body = f'<h1>Page {i}</h1>' + ''.join(f'<p>{_paragraph(rng)}</p>' for _ in range(3)) + event
+        site[path] = (f'<html><head><title>{title}</title></head><body>{HEADER}<main>{body}{CONTACT_BOX}'
+                      f'<ul class="related">{links}</ul></main>{FOOTER}</body></html>')
+
+    site['robots.txt'] = f"User-agent: *\nDisallow: /private/\nSitemap: {base_url}/sitemap.xml\n"
+    urls = ''.join(f'<url><loc>{base_url}{path}</loc><lastmod>2026-01-01</lastmod></url>' for path in paths)
+    site['sitemap.xml'] = f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+    return site
+
+
+class _SiteHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self, send_body):
+        pages = self.server.pages
+        path = self.path.split('?', 1)[0]
+        if path in ('/robots.txt', '/sitemap.xml'):
+            body, content_type = pages[path.lstrip('/')], 'text/plain' if path == '/robots.txt' else 'application/xml'
+        elif path in pages:
+            body, content_type = pages[path], 'text/html; charset=utf-8'
+        else:
+            body, content_type = None, None
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(data)
+
+    def do_GET(self):
+        self._respond(True)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SiteServer:
+    """
+    Serves a generated synthetic site on a local port in a background thread.
+
+    Parameters:
+    pages (int, optional): The number of HTML pages. Default is 200.
+    fanout (int, optional): The number of child links per page. Default is 8.
+    keyword_density (float, optional): The fraction of support service pages. Default is 0.3.
+    seed (int, optional): The random seed. Default is 0.
+
+    Example:
+    >>> with SiteServer(pages=500) as site:
+    ...     crawl_site([site.url], keywords)
+    """
+
+    def __init__(self, pages=200, fanout=8, keyword_density=0.3, seed=0):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _SiteHandler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self.pages = generate_site(pages, fanout, keyword_density, seed, base_url=self.url)
+        self.httpd.pages = self.pages
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def page_urls(self):
+        """
+        Returns the absolute URLs of the HTML pages.
+
+        Returns:
+        list: The page URLs.
+        """
+        return [f"{self.url}{path}" for path in self.pages if path.startswith('/')]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,178 @@
+import re
+import json
+import time
+import threading
+from contextlib import contextmanager
+from functools import partial
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Matches the service sentence of the synthetic service pages in benchmarks/site.py
+SERVICE_SENTENCE = re.compile(r"The (.+?) offers (.+?) support for students\. Visit (\S+) for details\.")
+
+
+def _services_in(text):
+    services = {}
+    for name, keyword, url in SERVICE_SENTENCE.findall(text):
+        services.setdefault(name, (keyword, url))
+    return services
+
+
+def stub_generate_json(instructions, text, retries=3, initial_delay=1, cache_key=None, latency=0.0):
+    """
+    Deterministic stand-in for `src.gemini_query._generate_json`.
+
+    It finds the service sentences of the synthetic site in the text and returns them as a CTDL payload
+    (for the API instructions) or as Bulk Upload Template records, after sleeping `latency` seconds.
+
+    Parameters:
+    instructions (Instructions): The task's instructions from `src.gemini_query`.
+    text (str): The scraped text.
+    latency (float, optional): The simulated response time in seconds. Default is 0.
+
+    Returns:
+    str: The JSON text of the response.
+    """
+    if latency:
+        time.sleep(latency)
+    services = _services_in(text)
+    if instructions.name == 'api':
+        return json.dumps({
+            'PublishForOrganizationIdentifier': 'ce-00000000-0000-4000-8000-000000000000',
+            'DefaultLanguage': 'en-US',
+            'SupportServices': [{
+                'CTID': f"ce-00000000-0000-4000-8000-{index:012d}",
+                'Name': name,
+                'Description': f"{name} offers {keyword} support.",
+                'SubjectWebpage': url,
+                'SupportServiceType': ['support:Tutoring']
+            } for index, (name, (keyword, url)) in enumerate(sorted(services.items()))]
+        })
+    return json.dumps([{
+        'ExternalIdentifier': f"bench_ss_{index:02d}",
+        'ResourceName': name,
+        'Description': f"{name} offers {keyword} support.",
+        'SubjectWebpage': url,
+        'LifeCycleStatusType': 'Active',
+        'Language': 'english',
+        'SupportServiceType': 'Tutoring',
+        'Keywords': [keyword, 'students']
+    } for index, (name, (keyword, url)) in enumerate(sorted(services.items()))])
+
+
+class _RegistryHandler(BaseHTTPRequestHandler):
+
+    def _respond(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        services = payload.get('SupportServices') or []
+        names = [service.get('Name') for service in services]
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.batches.append(names)
+            transient = next((name for name in names if server.transient.get(name, 0) > 0), None)
+            if transient is not None:
+                server.transient[transient] -= 1
+            elif not server.invalid.intersection(names):
+                server.services += sum(1 for name in names if name not in server.rejected)
+        if transient is not None:
+            self._respond(server.transient_status, {'Successful': False, 'Messages': ["Try again later."]})
+        elif server.invalid.intersection(names):
+            self._respond(400, {'Successful': False, 'Messages': ["The request is invalid."]})
+        else:
+            self._respond(200, [{'Successful': name not in server.rejected,
+                                 'Messages': [f"{name} was rejected."] if name in server.rejected else []}
+                                for name in names])
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RegistryStub:
+    """
+    Local stand-in for the Registry Assistant bulk publish endpoint.
+
+    By default every service is accepted. Services can be set up to fail by name. A batch holding a service
+    from `transient` gets a `transient_status` response for as many requests as the count given for that name.
+    A batch holding a service from `invalid` is rejected as a whole with 400. A service in `rejected` gets its
+    own unsuccessful result in an otherwise successful batch. Each request's service names are kept in `batches`.
+
+    Parameters:
+    transient (dict, optional): Service name -> the number of requests to fail. Default is None.
+    transient_status (int, optional): The status of a transient failure, e.g. 429 or 503. Default is 503.
+    invalid (iterable, optional): Service names whose batch is rejected with 400. Default is None.
+    rejected (iterable, optional): Service names rejected individually. Default is None.
+
+    Example:
+    >>> with RegistryStub(transient={'Writing Center': 1}) as registry:
+    ...     post_bulk_publish(payload, url=registry.url)
+    >>> registry.services
+    12
+    """
+
+    def __init__(self, transient=None, transient_status=503, invalid=None, rejected=None):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _RegistryHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.requests = 0
+        self.httpd.services = 0
+        self.httpd.batches = []
+        self.httpd.transient = dict(transient or {})
+        self.httpd.transient_status = transient_status
+        self.httpd.invalid = set(invalid or ())
+        self.httpd.rejected = set(rejected or ())
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/assistant/SupportService/bulkpublish"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    @property
+    def services(self):
+        return self.httpd.services
+
+    @property
+    def batches(self):
+        return self.httpd.batches
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@contextmanager
+def offline_pipeline(registry_url, llm_latency=0.0):
+    """
+    Points the pipeline at local stubs for the duration of the block.
+
+    Gemini is replaced by `stub_generate_json`, bulk publishing goes to `registry_url`, and URL checks do not
+    read or write the shared URL cache.
+
+    Parameters:
+    registry_url (str): The URL of a `RegistryStub`.
+    llm_latency (float, optional): The simulated Gemini response time in seconds. Default is 0.
+    """
+    import src.gemini_query as gemini_query
+    import src.publish as publish
+    import src.validate as validate
+
+    saved = (gemini_query._generate_json, publish.BULK_PUBLISH_URL, validate.UrlChecker)
+    gemini_query._generate_json = partial(stub_generate_json, latency=llm_latency)
+    publish.BULK_PUBLISH_URL = registry_url
+    validate.UrlChecker = partial(validate.UrlChecker, cache_path=None)
+    try:
+        yield
+    finally:
+        gemini_query._generate_json, publish.BULK_PUBLISH_URL, validate.UrlChecker = saved
@@ -0,0 +1,66 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ArtifactWriter:
+    """
+    Writes intermediate pipeline outputs to disk in the background.
+
+    Pipeline stages hand their results to each other in memory; the artifacts written here are only a
+    side output for debugging and inspection, so writing them never blocks the next stage. Writes run in
+    order on one background thread. A write error is printed and does not fail the run.
+
+    Parameters:
+    folder (str): Directory the artifacts are written to.
+    enabled (bool, optional): Whether artifacts are written at all. Default is True.
+
+    Example:
+    >>> artifacts = ArtifactWriter("uploads")
+    >>> artifacts.write_text("scraped_content.txt", text)
+    >>> artifacts.write_json("support_services_but.json", records)
+    >>> artifacts.close()
+    """
+
+    def __init__(self, folder, enabled=True):
+        self.folder = folder
+        self.enabled = enabled
+        self._executor = ThreadPoolExecutor(max_workers=1) if enabled else None
+
+    def _write(self, name, serialize, value):
+        path = os.path.join(self.folder, name)
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                serialize(value, f)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error writing artifact {path}: {e}")
+
+    def write_text(self, name, text):
+        """
+        Queues a text artifact.
+
+        Parameters:
+        name (str): The file name inside the artifact folder.
+        text (str): The text to write.
+        """
+        if self.enabled:
+            self._executor.submit(self._write, name, lambda value, f: f.write(value), text)
+
+    def write_json(self, name, data):
+        """
+        Queues a JSON artifact. The data must not be modified after it is queued.
+
+        Parameters:
+        name (str): The file name inside the artifact folder.
+        data: The JSON-serializable data to write.
+        """
+        if self.enabled:
+            self._executor.submit(self._write, name, lambda value, f: json.dump(value, f, indent=2), data)
+
+    def close(self):
+        """
+        Waits for the queued artifacts to be written.
+        """
+        if self.enabled:
+            self._executor.shutdown(wait=True)
@@ -0,0 +1,229 @@
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+# Pages in scraped_content.txt are separated by a blank line
+PAGE_SEPARATOR = "\n\n"
+
+# Rough size of one token in characters of English text
+CHARS_PER_TOKEN = 4
+
+# Default input budget per extraction call
+DEFAULT_CHUNK_TOKENS = 24000
+DEFAULT_MAX_WORKERS = 4
+
+
+def estimate_tokens(text):
+    """
+    Estimates the number of tokens in a text.
+
+    Parameters:
+    text (str): The text to measure.
+
+    Returns:
+    int: The estimated token count.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_into_chunks(text, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """
+    Splits scraped text into chunks that each fit a token budget, cutting only on page boundaries.
+
+    Pages are packed into a chunk in order until the next page would exceed the budget. A single page that
+    is larger than the budget on its own is split on line boundaries instead.
+
+    Parameters:
+    text (str): The scraped text, with pages separated by a blank line.
+    max_tokens (int, optional): The token budget per chunk. Default is 24000.
+
+    Returns:
+    list: A list of text chunks. An empty text returns a list with one empty chunk.
+
+    Example:
+    >>> chunks = split_into_chunks(open("uploads/scraped_content.txt").read(), max_tokens=8000)
+    >>> len(chunks)
+    5
+    """
+    pages = [page for page in text.split(PAGE_SEPARATOR) if page.strip()]
+    units = []
+    for page in pages:
+        if estimate_tokens(page) <= max_tokens:
+            units.append(page)
+            continue
+        # Oversized page: fall back to packing its lines
+        part = []
+        part_tokens = 0
+        for line in page.split("\n"):
+            line_tokens = estimate_tokens(line)
+            if part and part_tokens + line_tokens > max_tokens:
+                units.append("\n".join(part))
+                part, part_tokens = [], 0
+            part.append(line)
+            part_tokens += line_tokens
+        if part:
+            units.append("\n".join(part))
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for unit in units:
+        unit_tokens = estimate_tokens(unit)
+        if current and current_tokens + unit_tokens > max_tokens:
+            chunks.append(PAGE_SEPARATOR.join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += unit_tokens
+    if current:
+        chunks.append(PAGE_SEPARATOR.join(current))
+    return chunks or [""]
+
+
+def map_chunks(query, chunks, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Runs an extraction function on every chunk in parallel.
+
+    Parameters:
+    query (callable): A function that takes a chunk of text and returns a JSON string.
+    chunks (list): The text chunks.
+    max_workers (int, optional): The maximum number of chunks queried at once. Default is 4.
+
+    Returns:
+    list: The JSON strings returned for each chunk, in chunk order. Chunks whose query failed are None.
+    """
+    def run(chunk):
+        try:
+            return query(chunk)
+        except Exception as e:
+            print(f"Error extracting chunk: {e}")
+            return None
+
+    if len(chunks) == 1:
+        return [run(chunks[0])]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(run, chunks))
+
+
+def _parse(json_string):
+    if not json_string:
+        return None
+    try:
+        return json.loads(json_string)
+    except json.JSONDecodeError:
+        print("Error: Could not parse a chunk response as valid JSON. Skipping it.")
+        return None
+
+
+def _service_key(name, webpage):
+    return (re.sub(r"\s+", " ", str(name or "")).strip().lower(), str(webpage or "").strip().rstrip("/").lower())
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _merge_lists(existing, new):
+    # A model sometimes returns a single string where a list is expected; it is kept as one value
+    merged = list(_as_list(existing))
+    for value in _as_list(new):
+        if value not in merged:
+            merged.append(value)
+    return merged
+
+
+def merge_api_results(json_strings):
+    """
+    Merges per-chunk CTDL payloads into one payload, deduplicating services by name and webpage.
+
+    When a service appears in several chunks, the first occurrence is kept and the SupportServiceType,
+    AccommodationType and AvailableAt lists of later occurrences are added to it.
+
+    Parameters:
+    json_strings (list): The JSON strings returned for each chunk.
+
+    Returns:
+    str: A JSON string in the CTDL bulk publish shape, or None if no chunk returned valid JSON.
+    """
+    payload = None
+    services = {}
+    found = False
+    for parsed in map(_parse, json_strings):
+        # A chunk that returned an empty list or object is valid, it just found no services
+        if parsed is None:
+            continue
+        found = True
+        documents = parsed if isinstance(parsed, list) else [parsed]
+        for document in documents:
+            if not isinstance(document, dict):
+                continue
+            chunk_services = document.get("SupportServices", [document] if "Name" in document else [])
+            if payload is None and "SupportServices" in document:
+                payload = {key: value for key, value in document.items() if key != "SupportServices"}
+            for service in chunk_services:
+                if not isinstance(service, dict):
+                    continue
+                key = _service_key(service.get("Name"), service.get("SubjectWebpage"))
+                if key not in services:
+                    services[key] = dict(service)
+                    continue
+                merged = services[key]
+                for field in ("SupportServiceType", "AccommodationType", "AvailableAt"):
+                    if field in service:
+                        merged[field] = _merge_lists(merged.get(field), service[field])
+
+    if not found:
+        return None
+    payload = payload or {}
+    payload["SupportServices"] = list(services.values())
+    return json.dumps(payload, indent=2)
+
+
+def _unique_identifier(identifier, used):
+    if identifier not in used:
+        return identifier
+    match = re.match(r"^(.*?)(\d+)$", identifier)
+    prefix, width = (match.group(1), len(match.group(2))) if match else (f"{identifier}_", 2)
+    number = 1
+    while f"{prefix}{number:0{width}d}" in used:
+        number += 1
+    return f"{prefix}{number:0{width}d}"
+
+
+def merge_but_results(json_strings):
+    """
+    Merges per-chunk bulk upload records into one list, deduplicating services by name and webpage.
+
+    Every chunk numbers its ExternalIdentifiers from the start, so identifiers that collide after the
+    merge are renumbered with the same prefix.
+
+    Parameters:
+    json_strings (list): The JSON strings returned for each chunk.
+
+    Returns:
+    str: A JSON string holding a list of bulk upload records, or None if no chunk returned valid JSON.
+    """
+    services = {}
+    found = False
+    for parsed in map(_parse, json_strings):
+        if parsed is None:
+            continue
+        found = True
+        records = parsed if isinstance(parsed, list) else [parsed]
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            key = _service_key(record.get("ResourceName"), record.get("SubjectWebpage"))
+            services.setdefault(key, record)
+
+    if not found:
+        return None
+    used = set()
+    merged = []
+    for record in services.values():
+        if record.get("ExternalIdentifier"):
+            record["ExternalIdentifier"] = _unique_identifier(str(record["ExternalIdentifier"]), used)
+            used.add(record["ExternalIdentifier"])
+        merged.append(record)
+    return json.dumps(merged, indent=2)
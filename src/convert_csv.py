@@ -1,12 +1,195 @@
+import re
 import csv
 import json
 
+# Bulk Upload Template columns: (header, JSON field)
+SERVICE_COLUMNS = [
+    ("External Identifier", "ExternalIdentifier"),
+    ("Resource Name", "ResourceName"),
+    ("Description", "Description"),
+    ("Subject Webpage", "SubjectWebpage"),
+    ("Life Cycle Status Type", "LifeCycleStatusType"),
+    ("Language", "Language"),
+    ("Accommodation Type", "AccommodationType"),
+    ("Support Service Type", "SupportServiceType"),
+    ("Delivery Type", "DeliveryType"),
+    ("Keywords", "Keywords"),
+    ("Offered By", "OfferedBy")
+]
+
+# Nested profiles: (JSON field, header prefix, profile fields). A service with several profiles of a kind is
+# written as several rows; rows after the first repeat only the External Identifier and the profile columns.
+PROFILE_COLUMNS = [
+    ("ConditionProfile", "Condition Profile", [
+        "ExternalIdentifier", "Description", "SubjectWebpage", "AudienceType", "ConditionItems",
+        "SubmissionOfItems", "SubmissionOfDescription"
+    ]),
+    ("FinancialAssistance", "Financial Assistance", [
+        "ExternalIdentifier", "Name", "Description", "SubjectWebpage", "Type", "Value"
+    ]),
+    ("Cost", "Cost", [
+        "ExternalIdentifier", "Description", "DetailsUrl", "CurrencyType", "TypesList"
+    ])
+]
+
+LIST_SEPARATOR = " | "
+READ_CHUNK_SIZE = 64 * 1024
+
+_WORD_BOUNDARY = re.compile(r'(?<=[a-z])(?=[A-Z])')
+
+
+def _title(field):
+    return _WORD_BOUNDARY.sub(' ', field)
+
+
+def csv_headers():
+    """
+    Returns the CSV header row of the Bulk Upload Template.
+
+    Returns:
+    list: The service columns followed by the columns of each nested profile.
+    """
+    headers = [header for header, _ in SERVICE_COLUMNS]
+    for _, prefix, fields in PROFILE_COLUMNS:
+        headers.extend(f"{prefix}: {_title(field)}" for field in fields)
+    return headers
+
+
+def flatten_value(value):
+    """
+    Converts a JSON value to the text of one CSV cell.
+
+    Lists are written pipe-separated ('a | b'), as the Bulk Upload Template expects, and None becomes an
+    empty cell.
+
+    Parameters:
+    value: The JSON value.
+
+    Returns:
+    str: The cell text.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return LIST_SEPARATOR.join(cell for cell in (flatten_value(item) for item in value) if cell)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def service_rows(service):
+    """
+    Converts one service to its Bulk Upload Template rows.
+
+    Parameters:
+    service (dict): A bulk upload record.
+
+    Returns:
+    list: The CSV rows; one, or more when the service has several nested profiles of a kind.
+    """
+    profiles = []
+    for field, _, _ in PROFILE_COLUMNS:
+        value = service.get(field) or []
+        profiles.append([value] if isinstance(value, dict) else [item for item in value if isinstance(item, dict)])
+
+    rows = []
+    for index in range(max([1] + [len(items) for items in profiles])):
+        if index == 0:
+            row = [flatten_value(service.get(field)) for _, field in SERVICE_COLUMNS]
+        else:
+            row = [flatten_value(service.get("ExternalIdentifier"))] + [""] * (len(SERVICE_COLUMNS) - 1)
+        for (_, _, fields), items in zip(PROFILE_COLUMNS, profiles):
+            profile = items[index] if index < len(items) else {}
+            row.extend(flatten_value(profile.get(field)) for field in fields)
+        rows.append(row)
+    return rows
+
+
+def iter_json_records(file, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yields the records of a JSON or JSON Lines file one at a time, without loading the whole file.
+
+    The file may hold a JSON array of records, a single record, or one record per line. The text is read
+    in chunks and each record is decoded as soon as it is complete.
+
+    Parameters:
+    file (file object): The open text file.
+    chunk_size (int, optional): The number of characters read at a time. Default is 64 KB.
+
+    Returns:
+    generator: The decoded records.
+
+    Raises:
+    ValueError: If the file is not valid JSON or JSON Lines.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    in_array = None
+
+    while True:
+        # Skip whitespace, and the brackets and commas of a top-level array
+        while True:
+            while position < len(buffer) and (buffer[position].isspace() or (in_array and buffer[position] == ',')):
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            chunk = file.read(chunk_size)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+        if position >= len(buffer):
+            return
+        if in_array is None:
+            in_array = buffer[position] == '['
+            if in_array:
+                position += 1
+                continue
+        if in_array and buffer[position] == ']':
+            return
+
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(chunk_size)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+            continue
+        yield record
+        buffer, position = buffer[end:], 0
+
+
+def write_bulk_csv(records, output_filename):
+    """
+    Writes bulk upload records to a Bulk Upload Template CSV file as they arrive.
+
+    Parameters:
+    records (iterable): The bulk upload records; non-object entries are skipped.
+    output_filename (str): The path to the output CSV file.
+
+    Returns:
+    int: The number of services written.
+    """
+    count = 0
+    with open(output_filename, mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(csv_headers())  # Write the header row
+        for service in records:
+            if not isinstance(service, dict):
+                continue
+            writer.writerows(service_rows(service))
+            count += 1
+    return count
+
+
 def json_file_to_csv(json_filepath, output_filename):
     """
     Converts a JSON file to a CSV file.
 
-    This function reads a JSON file containing support service data, extracts the relevant fields,
-    and writes them to a CSV file. The CSV file will contain headers corresponding to the fields in the Bulk Upload Template.
+    This function streams the support service records of a JSON or JSON Lines file and writes them to a CSV
+    file with headers corresponding to the fields in the Bulk Upload Template, so memory use does not grow
+    with the number of services. List values are written pipe-separated, and nested ConditionProfile,
+    FinancialAssistance and Cost profiles are written to their own columns, one row per profile.
 
     Parameters:
     json_filepath (str): The path to the JSON file to be converted.
@@ -18,39 +201,6 @@ def json_file_to_csv(json_filepath, output_filename):
     >>> json_file_to_csv(json_filepath, output_filename)
     Bulk Upload Template has been created successfully!
     """
-
-    # Read the JSON file
     with open(json_filepath, "r", encoding="utf-8") as file:
-        ctdl_json = json.load(file)  # Load JSON data
-        
-    if isinstance(ctdl_json, dict):
-        ctdl_json = [ctdl_json]
-    
-    # Define CSV headers
-    headers = [
-        "External Identifier", "Resource Name", "Description", "Subject Webpage",
-        "Life Cycle Status Type", "Language", "Accommodation Type", 
-        "Support Service Type", "Delivery Type", "Keywords", "Offered By"
-    ]
-
-    # Open CSV file for writing
-    with open(output_filename, mode="w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        writer.writerow(headers)  # Write the header row
-
-        for service in ctdl_json:
-            row = [
-                service.get("ExternalIdentifier", ""),
-                service.get("ResourceName", ""),
-                service.get("Description", ""),
-                service.get("SubjectWebpage", ""),
-                service.get("LifeCycleStatusType", ""),
-                service.get("Language", ""),
-                service.get("AccommodationType", ""),
-                service.get("SupportServiceType", ""),
-                service.get("DeliveryType", ""),
-                service.get("Keywords", ""),
-                service.get("OfferedBy", "")
-            ]
-            writer.writerow(row)
-    print("Bulk Upload Template has been created successfully!")
\ No newline at end of file
+        write_bulk_csv(iter_json_records(file), output_filename)
+    print("Bulk Upload Template has been created successfully!")
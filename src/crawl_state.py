@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+from src.metrics import METRICS
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_STATE_PATH = os.path.join(BASE_DIR, 'uploads', 'crawl_state.sqlite3')
+# A checkpoint is written when either limit is reached since the last one
+DEFAULT_CHECKPOINT_SECONDS = 5
+DEFAULT_CHECKPOINT_URLS = 200
+# A crawl whose owner has not checkpointed for this long is taken to be abandoned, e.g. by a killed process
+DEFAULT_LEASE_SECONDS = 60
+
+QUEUED = 'queued'
+FETCHED = 'fetched'
+FAILED = 'failed'
+
+
+class CrawlState:
+    """
+    Persists the progress of a crawl in SQLite so an interrupted crawl can resume where it stopped.
+
+    Every URL the crawler queues is stored with its depth, the host it was discovered from and its status
+    ('queued', 'fetched' or 'failed'), and fetched pages with the keywords they matched. Together these rows are
+    the visited set, the frontier and the results. Updates are buffered and written in one transaction at each
+    checkpoint, every `checkpoint_seconds` or `checkpoint_urls` updates. URLs that were in flight when the
+    process died are still 'queued' and are fetched again on resume.
+
+    `on_checkpoint` is called before each checkpoint is written, so files the checkpointed rows rely on (such as
+    the page cache index) are saved first, whichever update triggered the checkpoint.
+
+    A crawl is identified by `crawl_id` (usually the domain). `start` resumes the stored crawl if it was not
+    finished and was started with the same parameters, and starts over otherwise. While a crawl runs it is
+    owned by its `CrawlState`, and the checkpoints renew the claim. A crawl with the same `crawl_id` that is
+    started in the meantime, by another run in this or another process, neither resumes nor replaces it: it
+    runs as a separate, private crawl (`<crawl_id>:<owner>`) whose state is removed on `close`. The claim is
+    released on `close`, or lapses `lease_seconds` after the owner's last checkpoint if its process died.
+
+    Parameters:
+    path (str, optional): Path of the SQLite database. Default is 'uploads/crawl_state.sqlite3'.
+    crawl_id (str, optional): The identity of the crawl. Default is 'default'.
+    checkpoint_seconds (float, optional): The longest time between checkpoints. Default is 5.
+    checkpoint_urls (int, optional): The most buffered updates between checkpoints. Default is 200.
+    on_checkpoint (callable, optional): Called with no arguments before each checkpoint is written. Default is None.
+    owner (str, optional): The identity of the run, e.g. its run ID. Default is a new random ID.
+    lease_seconds (float, optional): How long a crawl stays claimed without a checkpoint. Default is 60.
+
+    Example:
+    >>> state = CrawlState(crawl_id="illinois.edu")
+    >>> results = crawl_site(["https://illinois.edu"], keywords, state=state)  # Killed halfway through
+    >>> results = crawl_site(["https://illinois.edu"], keywords, state=CrawlState(crawl_id="illinois.edu"))
+    Resuming the crawl of illinois.edu: 1840 URLs visited, 2210 queued, 37 matches.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH, crawl_id='default', checkpoint_seconds=DEFAULT_CHECKPOINT_SECONDS,
+                 checkpoint_urls=DEFAULT_CHECKPOINT_URLS, on_checkpoint=None, owner=None,
+                 lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.path = path
+        self.crawl_id = crawl_id
+        self.owner = owner or uuid.uuid4().hex
+        self.lease_seconds = lease_seconds
+        self._private = False
+        self.checkpoint_seconds = checkpoint_seconds
+        self.checkpoint_urls = checkpoint_urls
+        self.on_checkpoint = on_checkpoint
+        self._lock = threading.Lock()
+        self._queued = []
+        self._completed = []
+        self._last_checkpoint = time.monotonic()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS crawls ("
+            "crawl_id TEXT PRIMARY KEY, params TEXT, started_at REAL NOT NULL, checkpoint_at REAL, finished_at REAL, "
+            "owner TEXT)"
+        )
+        try:
+            self._conn.execute("ALTER TABLE crawls ADD COLUMN owner TEXT")
+        except sqlite3.OperationalError:
+            pass  # Already there; databases created before crawls were claimed lack it
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, crawl_id TEXT NOT NULL, url TEXT NOT NULL, depth INTEGER, "
+            "root TEXT, status TEXT NOT NULL, matched_keywords TEXT, updated_at REAL, UNIQUE (crawl_id, url))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS urls_status ON urls (crawl_id, status)")
+        self._conn.commit()
+
+    def start(self, params):
+        """
+        Starts the crawl, or resumes it if an unfinished crawl with the same parameters is stored.
+
+        If the stored crawl is claimed by another live run, a private crawl is started instead and `crawl_id`
+        is changed to its ID.
+
+        Parameters:
+        params (dict): The crawl parameters (JSON serializable), e.g. the start URLs and maximum depth.
+
+        Returns:
+        bool: True if the stored crawl is resumed, False if the crawl starts from scratch.
+        """
+        encoded = json.dumps(params, sort_keys=True)
+        with self._lock, self._conn:
+            # Claimed in one write transaction, so two processes starting the same crawl cannot both own it
+            self._conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = self._conn.execute(
+                "SELECT params, finished_at, owner, COALESCE(checkpoint_at, started_at) FROM crawls WHERE crawl_id = ?",
+                (self.crawl_id,)
+            ).fetchone()
+            if (row is not None and row[1] is None and row[2] not in (None, self.owner)
+                    and now - row[3] < self.lease_seconds):
+                print(f"The crawl of {self.crawl_id} is in progress in another run; crawling it separately.")
+                self.crawl_id = f"{self.crawl_id}:{self.owner}"
+                self._private = True
+                row = None
+            if row is not None and row[0] == encoded and row[1] is None:
+                self._conn.execute("UPDATE crawls SET owner = ?, checkpoint_at = ? WHERE crawl_id = ?",
+                                   (self.owner, now, self.crawl_id))
+                return True
+            self._conn.execute("DELETE FROM urls WHERE crawl_id = ?", (self.crawl_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO crawls (crawl_id, params, started_at, checkpoint_at, finished_at, owner) "
+                "VALUES (?, ?, ?, NULL, NULL, ?)", (self.crawl_id, encoded, now, self.owner)
+            )
+            self._queued, self._completed = [], []
+        return False
+
+    def visited(self):
+        """
+        Returns every URL the crawl has queued, fetched or failed to fetch.
+
+        Returns:
+        set: The URLs.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT url FROM urls WHERE crawl_id = ?", (self.crawl_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def frontier(self):
+        """
+        Returns the URLs still waiting to be fetched, in the order they were queued.
+
+        Returns:
+        list: (url, depth, root) tuples.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT url, depth, root FROM urls WHERE crawl_id = ? AND status = ? ORDER BY seq",
+                (self.crawl_id, QUEUED)
+            ).fetchall()
+
+    def matches(self):
+        """
+        Returns the pages fetched so far that matched at least one keyword.
+
+        Returns:
+        list: Dicts with 'url' and 'matched_keywords', in the order they were fetched.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, matched_keywords FROM urls WHERE crawl_id = ? AND status = ? "
+                "AND matched_keywords != '[]' ORDER BY updated_at, seq", (self.crawl_id, FETCHED)
+            ).fetchall()
+        return [{'url': url, 'matched_keywords': json.loads(matched)} for url, matched in rows]
+
+    def queue(self, url, depth, root):
+        """
+        Records a URL added to the frontier.
+
+        Parameters:
+        url (str): The URL.
+        depth (int): Its crawl depth.
+        root (str): The host of the start URL it was discovered from.
+
+        Returns:
+        bool: True if a checkpoint was written.
+        """
+        with self._lock:
+            self._queued.append((self.crawl_id, url, depth, root, QUEUED, time.time()))
+        return self.checkpoint(force=False)
+
+    def complete(self, url, matched_keywords=None, failed=False):
+        """
+        Records the outcome of a fetch.
+
+        Parameters:
+        url (str): The URL.
+        matched_keywords (list, optional): The keywords the page matched. Default is None.
+        failed (bool, optional): Whether the page could not be fetched. Default is False.
+
+        Returns:
+        bool: True if a checkpoint was written.
+        """
+        with self._lock:
+            self._completed.append((FAILED if failed else FETCHED, json.dumps(matched_keywords or []), time.time(),
+                                    self.crawl_id, url))
+        return self.checkpoint(force=False)
+
+    def checkpoint(self, force=True):
+        """
+        Writes the buffered updates in one transaction.
+
+        Parameters:
+        force (bool, optional): Whether to write even if no checkpoint limit has been reached. Default is True.
+
+        Returns:
+        bool: True if a checkpoint was written.
+        """
+        with self._lock:
+            pending = len(self._queued) + len(self._completed)
+            elapsed = time.monotonic() - self._last_checkpoint
+            due = pending >= self.checkpoint_urls or elapsed >= self.checkpoint_seconds
+            if not pending or not (force or due):
+                return False
+            queued, completed = self._queued, self._completed
+            self._queued, self._completed = [], []
+            if self.on_checkpoint is not None:
+                self.on_checkpoint()
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO urls (crawl_id, url, depth, root, status, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", queued
+                )
+                self._conn.executemany(
+                    "UPDATE urls SET status = ?, matched_keywords = ?, updated_at = ? WHERE crawl_id = ? AND url = ?",
+                    completed
+                )
+                # Also renews this run's claim on the crawl
+                self._conn.execute("UPDATE crawls SET checkpoint_at = ? WHERE crawl_id = ? AND owner = ?",
+                                   (time.time(), self.crawl_id, self.owner))
+            self._last_checkpoint = time.monotonic()
+        METRICS.inc('crawl_checkpoints_total')
+        return True
+
+    def finish(self):
+        """
+        Writes the last checkpoint and marks the crawl as finished, so the next crawl starts from scratch.
+        """
+        self.checkpoint()
+        with self._lock:
+            self._conn.execute("UPDATE crawls SET finished_at = ? WHERE crawl_id = ? AND owner = ?",
+                               (time.time(), self.crawl_id, self.owner))
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Returns the number of stored URLs by status, as of the last checkpoint.
+
+        Returns:
+        dict: A mapping of status to URL count.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM urls WHERE crawl_id = ? GROUP BY status",
+                                      (self.crawl_id,)).fetchall()
+        return dict(rows)
+
+    def close(self):
+        """
+        Writes the buffered updates, releases the claim on the crawl and closes the database.
+
+        A private crawl is removed, since no later run can resume it.
+        """
+        self.checkpoint()
+        with self._lock:
+            with self._conn:
+                if self._private:
+                    self._conn.execute("DELETE FROM urls WHERE crawl_id = ?", (self.crawl_id,))
+                    self._conn.execute("DELETE FROM crawls WHERE crawl_id = ?", (self.crawl_id,))
+                else:
+                    self._conn.execute("UPDATE crawls SET owner = NULL WHERE crawl_id = ? AND owner = ?",
+                                       (self.crawl_id, self.owner))
+            self._conn.close()
@@ -0,0 +1,251 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urljoin, urlparse, urldefrag
+
+import time
+
+import requests
+import lxml.html
+from lxml import etree
+from requests.adapters import HTTPAdapter
+
+from src.keyword_matcher import KeywordMatcher
+from src.page_store import PageStore
+from src.sinks import MemorySink
+from src.metrics import METRICS
+
+# Default crawl limits
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_PER_HOST_LIMIT = 4
+DEFAULT_TIMEOUT = 10
+# Longer robots.txt Crawl-delay values are capped to this many seconds
+MAX_CRAWL_DELAY = 10
+
+
+def create_session(max_workers=DEFAULT_MAX_WORKERS, per_host_limit=DEFAULT_PER_HOST_LIMIT):
+    """
+    Creates a requests session with keep-alive connection pooling sized for the crawler.
+
+    Parameters:
+    max_workers (int, optional): The number of concurrent fetchers. Used to size the number of host pools. Default is 8.
+    per_host_limit (int, optional): The maximum number of open connections kept per host. Default is 4.
+
+    Returns:
+    requests.Session: A session whose HTTP and HTTPS adapters reuse connections across requests.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max(max_workers, 1), pool_maxsize=max(per_host_limit, 1))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _fetch_and_match(session, url, keywords, timeout, page_store, lastmod=None):
+    """
+    Fetches a single page and returns the keywords it matches and the links it contains.
+
+    Parameters:
+    session (requests.Session): The pooled session used for the request.
+    url (str): The URL to fetch.
+    keywords (KeywordMatcher): The compiled matcher for the keywords to search for in the page content.
+    timeout (int): The request timeout in seconds.
+    page_store (PageStore): The store that fetches the page and keeps its HTML for later stages.
+    lastmod (str, optional): The page's sitemap <lastmod>, used to skip fetching unchanged pages.
+
+    Returns:
+    tuple: A (matched_keywords, links) tuple, or None if the page could not be fetched.
+    """
+    html = page_store.fetch(session, url, timeout=timeout, lastmod=lastmod)
+    if html is None:
+        return None
+
+    with METRICS.timer('html_parse_seconds', stage='crawl'):
+        try:
+            root = lxml.html.document_fromstring(html)
+        except ValueError:
+            # Strings with an XML encoding declaration must be parsed as bytes
+            root = lxml.html.document_fromstring(html.encode('utf-8'))
+        except etree.ParserError:  # An empty document
+            return [], []
+        matched_keywords = keywords.match(root.text_content())
+        links = [urljoin(url, href) for href in root.xpath('//a/@href')]
+    return matched_keywords, links
+
+
+def crawl_site(start_urls, keywords, max_depth=2, visited=None, max_workers=DEFAULT_MAX_WORKERS,
+               per_host_limit=DEFAULT_PER_HOST_LIMIT, timeout=DEFAULT_TIMEOUT, session=None, page_store=None,
+               sink=None, cancel_event=None, seed_urls=None, lastmods=None, robots=None, crawl_delays=None,
+               state=None):
+    """
+    Crawls one or more websites breadth-first with a bounded pool of concurrent fetchers.
+
+    This function keeps an explicit frontier queue of (url, depth) pairs and hands URLs to a thread pool,
+    never running more than `max_workers` requests at once and never more than `per_host_limit` requests
+    against the same host. All requests share one pooled session so connections are kept alive between pages.
+    Links are followed only while they stay on the host of the start URL they were discovered from, up to
+    `max_depth` levels.
+
+    Pages found in sitemaps (see `src.discovery`) can be added as `seed_urls`. They are fetched and matched
+    but their links are not followed, since the sitemap already lists the site's pages. URLs disallowed by
+    the host's robots.txt are skipped, and requests to a host are spaced by its Crawl-delay.
+
+    With a `CrawlState` (see `src.crawl_state`), the frontier, visited set and matches are checkpointed to
+    SQLite as the crawl runs. If an earlier crawl with the same start URLs and depth was interrupted, it resumes
+    from its last checkpoint: pages already fetched are not fetched again, and their matches are returned and
+    written to the sink again.
+
+    Parameters:
+    start_urls (str or list): The URL or URLs to start crawling from.
+    keywords (list or KeywordMatcher): The keywords to search for in the page content, either as a list
+    or already compiled with `load_keyword_matcher`.
+    max_depth (int, optional): The maximum depth to crawl. Default is 2.
+    visited (set, optional): A set of URLs that have already been visited. Default is None.
+    max_workers (int, optional): The global number of concurrent fetchers. Default is 8.
+    per_host_limit (int, optional): The maximum number of concurrent requests per host. Default is 4.
+    timeout (int, optional): The request timeout in seconds. Default is 10.
+    session (requests.Session, optional): A session to reuse. A pooled session is created if not given.
+    page_store (PageStore, optional): A store that keeps fetched pages so `scrape_page` can reuse them.
+    An in-memory store is created if not given.
+    sink (optional): A results sink from `src.sinks` that receives each match as it is found. If not given,
+    matches are only collected in memory and returned. A sink passed in by the caller is flushed but left open.
+    cancel_event (threading.Event, optional): When set, no new pages are fetched and the crawl returns
+    the matches found so far once in-flight requests finish.
+    seed_urls (list, optional): Additional URLs to fetch without following their links, e.g. from sitemaps.
+    lastmods (dict, optional): Sitemap <lastmod> values by URL; pages whose <lastmod> has not changed since
+    the last run are served from the page store's disk cache without a request.
+    robots (dict, optional): RobotFileParser rules by host; disallowed URLs are not fetched.
+    crawl_delays (dict, optional): The minimum number of seconds between requests, by host (capped at 10).
+    state (CrawlState, optional): The durable crawl state to checkpoint to and resume from. Default is None.
+
+    Returns:
+    list: A list of dictionaries containing URLs and matched keywords.
+
+    Example:
+    >>> results = crawl_site(["https://example.com"], ["support", "service"], max_workers=16)
+    >>> print(results)
+    [{'url': 'https://example.com/page1', 'matched_keywords': ['support']}]
+    """
+    if isinstance(start_urls, str):
+        start_urls = [start_urls]
+    if not isinstance(keywords, KeywordMatcher):
+        keywords = KeywordMatcher(keywords)
+    if visited is None:
+        visited = set()
+    if session is None:
+        session = create_session(max_workers, per_host_limit)
+    if page_store is None:
+        page_store = PageStore()
+    owns_sink = sink is None
+    if owns_sink:
+        sink = MemorySink()
+
+    lastmods = lastmods or {}
+    robots = robots or {}
+    crawl_delays = {host: min(delay, MAX_CRAWL_DELAY) for host, delay in (crawl_delays or {}).items() if delay}
+
+    def allowed(url):
+        rules = robots.get(urlparse(url).netloc)
+        return rules is None or rules.can_fetch('*', url)
+
+    links_with_keywords = []
+    frontier = deque()
+
+    def enqueue(url, depth, root_netloc):
+        visited.add(url)
+        frontier.append((url, depth, root_netloc))
+        if state is not None:
+            state.queue(url, depth, root_netloc)
+
+    if state is not None:
+        # The page index is saved before every checkpoint, however it was triggered, so after a resume
+        # `PageStore.get` reads the pages fetched before the interruption from disk instead of refetching them
+        state.on_checkpoint = page_store.save_index
+    if state is not None and state.start({'start_urls': sorted(start_urls), 'max_depth': max_depth}):
+        visited.update(state.visited())
+        frontier.extend(tuple(item) for item in state.frontier())
+        links_with_keywords = state.matches()
+        for entry in links_with_keywords:
+            sink.write(entry)
+        METRICS.inc('crawl_resumed_total')
+        print(f"Resuming the crawl of {state.crawl_id}: {len(visited)} URLs visited, {len(frontier)} queued, "
+              f"{len(links_with_keywords)} matches.")
+    for url, depth in [(url, 0) for url in start_urls] + [(url, max_depth - 1) for url in seed_urls or []]:
+        url = urldefrag(url)[0]
+        if url not in visited and max_depth > 0 and allowed(url):
+            enqueue(url, depth, urlparse(url).netloc)
+
+    host_in_flight = {}
+    host_ready_at = {}
+
+    def next_ready():
+        # Pick the first queued URL whose host has a free connection slot and is past its crawl delay
+        now = time.monotonic()
+        for _ in range(len(frontier)):
+            item = frontier.popleft()
+            host = urlparse(item[0]).netloc
+            if host_in_flight.get(host, 0) < per_host_limit and host_ready_at.get(host, 0) <= now:
+                host_in_flight[host] = host_in_flight.get(host, 0) + 1
+                if host in crawl_delays:
+                    host_ready_at[host] = now + crawl_delays[host]
+                return item
+            frontier.append(item)
+        return None
+
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while frontier or in_flight:
+            if cancel_event is not None and cancel_event.is_set():
+                frontier.clear()
+            while frontier and len(in_flight) < max_workers:
+                item = next_ready()
+                if item is None:
+                    break
+                future = executor.submit(_fetch_and_match, session, item[0], keywords, timeout, page_store,
+                                         lastmods.get(item[0]))
+                in_flight[future] = item
+
+            if not in_flight:
+                if not frontier:
+                    break
+                time.sleep(0.1)  # Every queued host is waiting out its crawl delay
+                continue
+            done, _ = wait(in_flight, timeout=0.1 if frontier and crawl_delays else None,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                url, depth, root_netloc = in_flight.pop(future)
+                host_in_flight[urlparse(url).netloc] -= 1
+                result = future.result()
+                if result is None:
+                    if state is not None:
+                        state.complete(url, failed=True)
+                    continue
+
+                matched_keywords, links = result
+                if matched_keywords:
+                    entry = {
+                        'url': url,
+                        'matched_keywords': matched_keywords
+                    }
+                    links_with_keywords.append(entry)
+                    sink.write(entry)
+
+                if depth + 1 < max_depth:
+                    for href in links:
+                        href = urldefrag(href)[0]
+                        if urlparse(href).netloc.endswith(root_netloc) and href not in visited and allowed(href):
+                            enqueue(href, depth + 1, root_netloc)
+                # Recorded after the page's links, so a checkpoint never holds a fetched page without them
+                if state is not None:
+                    state.complete(url, matched_keywords)
+
+    page_store.save_index()
+    if state is not None:
+        if cancel_event is not None and cancel_event.is_set():
+            state.checkpoint()  # Left unfinished, so the next crawl resumes it
+        else:
+            state.finish()
+    if owns_sink:
+        sink.close()
+    else:
+        sink.flush()
+    return links_with_keywords
@@ -0,0 +1,212 @@
+import re
+import hashlib
+
+from src.chunking import PAGE_SEPARATOR
+from src.metrics import METRICS
+
+SIMHASH_BITS = 64
+# Blocks whose SimHashes differ in at most this many bits are near duplicates. Unrelated paragraphs are
+# typically 20 or more bits apart; a long paragraph with a few words reworded is often within 7.
+DEFAULT_MAX_DISTANCE = 7
+# SimHash is only compared for blocks with at least this many words. Short blocks built from one template
+# (e.g. the hours of two different offices) differ in a few words only, which is within the distance above.
+DEFAULT_SIMHASH_MIN_WORDS = 40
+# Blocks with fewer words (headings, names, short labels) are always kept, since they are cheap and give
+# the blocks around them their context
+DEFAULT_MIN_WORDS = 8
+SHINGLE_WORDS = 3
+
+_WORD = re.compile(r'\w+|#')
+_MONTH = (r'(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sept?(?:ember)?|'
+          r'oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)')
+_WEEKDAY = r'(?:mon|tues?|wed(?:nes)?|thu(?:rs)?|fri|sat(?:ur)?|sun)(?:day)?'
+# Dates, times and weekdays vary between otherwise identical listings and are replaced by a placeholder.
+# Other numbers are kept, since they often tell services apart (e.g. 'Computer Lab 2').
+_VOLATILE = re.compile(
+    rf'\b(?:{_MONTH}\.?\s+\d{{1,2}}(?:st|nd|rd|th)?(?:,?\s+\d{{4}})?|\d{{1,2}}(?::\d{{2}})?\s*(?:am|pm|a\.m|p\.m)'
+    rf'|\d{{1,2}}:\d{{2}}|\d{{1,2}}/\d{{1,2}}(?:/\d{{2,4}})?|(?!may\b){_MONTH}|{_WEEKDAY}|noon|midnight)\b'
+)
+
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def normalize_words(text):
+    """
+    Splits a text into lowercase words, replacing each date, time or weekday with '#'.
+
+    Parameters:
+    text (str): The text.
+
+    Returns:
+    list: The normalized words.
+
+    Example:
+    >>> normalize_words("Open house on May 21 at 10am in Room 2")
+    ['open', 'house', 'on', '#', 'at', '#', 'in', 'room', '2']
+    """
+    return _WORD.findall(_VOLATILE.sub('#', text.lower()))
+
+
+def simhash(words, shingle_words=SHINGLE_WORDS):
+    """
+    Computes the 64-bit SimHash of a text from its overlapping word shingles.
+
+    Texts that share most of their shingles get hashes that differ in only a few bits.
+
+    Parameters:
+    words (list): The normalized words of the text.
+    shingle_words (int, optional): The number of words per shingle. Default is 3.
+
+    Returns:
+    int: The SimHash.
+
+    Example:
+    >>> a = simhash(normalize_words(paragraph))
+    >>> b = simhash(normalize_words(paragraph.replace("by video", "by phone")))
+    >>> bin(a ^ b).count('1')  # The Hamming distance
+    4
+    """
+    if len(words) < shingle_words:
+        shingles = [' '.join(words)]
+    else:
+        shingles = [' '.join(words[i:i + shingle_words]) for i in range(len(words) - shingle_words + 1)]
+    # Count the set bits of every position across the shingle hashes, most significant bit first
+    rows = [format(_hash64(shingle), '064b').encode('ascii') for shingle in shingles]
+    threshold = len(rows) * ord('0') + len(rows) / 2
+    return int(''.join('1' if sum(column) > threshold else '0' for column in zip(*rows)), 2)
+
+
+class ContentDeduplicator:
+    """
+    Drops exact and near-duplicate text blocks across the pages of scraped content.
+
+    Each block is one line of the scraped text. A block whose lowercase words were already seen, on an earlier
+    page or earlier in the same page, is an exact duplicate. A block that only differs from an earlier one in
+    dates, times or weekdays (see `normalize_words`), such as the same event listing or office hours on another
+    day, is a near duplicate. So is a block of at least `simhash_min_words` words whose SimHash is within
+    `max_distance` bits of a kept block, such as a long paragraph with a sentence reworded. Shorter blocks are
+    never compared by SimHash, since a few changed words (e.g. another office's name) are a different service.
+    SimHashes are indexed by `max_distance + 1` bands, so a lookup only compares blocks that share a band. The
+    first occurrence of every block is kept, and blocks shorter than `min_words` words are never dropped.
+
+    One deduplicator should be shared by all pages of a run. The totals are kept on the deduplicator.
+
+    Parameters:
+    max_distance (int, optional): The largest SimHash Hamming distance treated as a near duplicate. Default is 7.
+    min_words (int, optional): Blocks with fewer words are always kept. Default is 8.
+    simhash_min_words (int, optional): Blocks with fewer words are only matched exactly or after date and time
+    normalization. Default is 40.
+
+    Example:
+    >>> deduplicator = ContentDeduplicator()
+    >>> deduplicator.classify("Open house on March 3 in the Student Union. Students and families are welcome.")
+    'kept'
+    >>> deduplicator.classify("Open house on May 21 in the Student Union. Students and families are welcome.")
+    'near'
+    >>> text, stats = deduplicator.dedupe(scraped_text)
+    >>> stats
+    {'blocks_in': 812, 'exact': 95, 'near': 41, 'bytes_in': 120394, 'bytes_out': 88123}
+    """
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE, min_words=DEFAULT_MIN_WORDS,
+                 simhash_min_words=DEFAULT_SIMHASH_MIN_WORDS):
+        self.max_distance = max_distance
+        self.min_words = min_words
+        self.simhash_min_words = simhash_min_words
+        self._band_bits = SIMHASH_BITS // (max_distance + 1)
+        self._bands = [{} for _ in range(max_distance + 1)]
+        self._exact = set()
+        self._normalized = set()
+        self.blocks_in = 0
+        self.exact = 0
+        self.near = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _band_keys(self, fingerprint):
+        mask = (1 << self._band_bits) - 1
+        return [fingerprint >> (band * self._band_bits) & mask for band in range(len(self._bands))]
+
+    def _is_near_duplicate(self, fingerprint):
+        # Two hashes within max_distance bits agree on at least one of the max_distance + 1 bands
+        for band, key in zip(self._bands, self._band_keys(fingerprint)):
+            for candidate in band.get(key, ()):
+                if bin(fingerprint ^ candidate).count('1') <= self.max_distance:
+                    return True
+        return False
+
+    def _remember(self, fingerprint):
+        for band, key in zip(self._bands, self._band_keys(fingerprint)):
+            band.setdefault(key, []).append(fingerprint)
+
+    def classify(self, block):
+        """
+        Classifies one block against the blocks seen so far and remembers it if it is kept.
+
+        Parameters:
+        block (str): The text block.
+
+        Returns:
+        str: 'kept', 'exact' or 'near'.
+        """
+        words = _WORD.findall(block.lower())
+        if len(words) < self.min_words:
+            return 'kept'
+        key = _hash64(' '.join(words))
+        if key in self._exact:
+            return 'exact'
+        self._exact.add(key)
+        normalized = normalize_words(block)
+        normalized_key = _hash64(' '.join(normalized))
+        if normalized_key in self._normalized:
+            return 'near'
+        self._normalized.add(normalized_key)
+        if len(words) < self.simhash_min_words:
+            return 'kept'
+        fingerprint = simhash(normalized)
+        if self._is_near_duplicate(fingerprint):
+            return 'near'
+        self._remember(fingerprint)
+        return 'kept'
+
+    def dedupe(self, text):
+        """
+        Removes duplicate blocks from scraped text, keeping pages separated by a blank line.
+
+        Pages left without any block are dropped.
+
+        Parameters:
+        text (str): The scraped text, one block per line and pages separated by a blank line.
+
+        Returns:
+        tuple: The deduplicated text and a stats dict with 'blocks_in', 'exact', 'near' (the blocks removed),
+        'bytes_in' and 'bytes_out'.
+        """
+        stats = {'blocks_in': 0, 'exact': 0, 'near': 0, 'bytes_in': len(text.encode('utf-8')), 'bytes_out': 0}
+        pages = []
+        for page in text.split(PAGE_SEPARATOR):
+            kept = []
+            for block in page.split('\n'):
+                if not block.strip():
+                    continue
+                stats['blocks_in'] += 1
+                result = self.classify(block)
+                METRICS.inc('dedupe_blocks_total', result=result)
+                if result == 'kept':
+                    kept.append(block)
+                else:
+                    stats[result] += 1
+            if kept:
+                pages.append('\n'.join(kept))
+        deduped = ''.join(page + PAGE_SEPARATOR for page in pages)
+        stats['bytes_out'] = len(deduped.encode('utf-8'))
+        METRICS.inc('dedupe_bytes_removed_total', stats['bytes_in'] - stats['bytes_out'])
+
+        self.blocks_in += stats['blocks_in']
+        self.exact += stats['exact']
+        self.near += stats['near']
+        self.bytes_in += stats['bytes_in']
+        self.bytes_out += stats['bytes_out']
+        return deduped, stats
@@ -0,0 +1,211 @@
+import io
+import re
+import gzip
+from urllib.parse import urljoin, urlparse, urldefrag, unquote
+from urllib.robotparser import RobotFileParser
+import xml.etree.ElementTree as ET
+
+import requests
+
+from src.keyword_matcher import KeywordMatcher
+
+DEFAULT_TIMEOUT = 10
+# Sitemaps are read until this many page URLs have been found
+DEFAULT_MAX_URLS = 50000
+DEFAULT_MAX_SITEMAPS = 50
+DEFAULT_MAX_SEEDS = 500
+# The sitemap protocol limits a sitemap to 50 MB uncompressed
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+
+_PATH_SEPARATORS = re.compile(r'[/_\-.+]+')
+
+
+def _local_name(tag):
+    # Strips the XML namespace from a tag name
+    return tag.rsplit('}', 1)[-1]
+
+
+def read_robots(session, base_url, timeout=DEFAULT_TIMEOUT):
+    """
+    Fetches and parses the robots.txt of a site.
+
+    Missing robots.txt files allow everything; 401 and 403 responses disallow everything, like
+    `urllib.robotparser` does.
+
+    Parameters:
+    session (requests.Session): The session used for the request.
+    base_url (str): Any URL on the site.
+    timeout (int, optional): The request timeout in seconds. Default is 10.
+
+    Returns:
+    RobotFileParser: The parsed rules, or None if robots.txt could not be fetched.
+    """
+    parsed = urlparse(base_url)
+    robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
+    parser = RobotFileParser(robots_url)
+    try:
+        response = session.get(robots_url, timeout=timeout)
+    except requests.RequestException:
+        return None
+    if response.status_code in (401, 403):
+        parser.disallow_all = True
+    elif response.status_code >= 400:
+        parser.allow_all = True
+    else:
+        parser.parse(response.text.splitlines())
+    parser.modified()  # crawl_delay() and can_fetch() only answer once the rules are marked as read
+    return parser
+
+
+def _fetch_sitemap(session, url, timeout):
+    # Returns the XML of a sitemap, decompressing gzipped sitemaps, or None if it could not be read
+    try:
+        response = session.get(url, timeout=timeout, stream=True)
+    except requests.RequestException:
+        return None
+    with response:
+        if response.status_code != 200:
+            return None
+        data = bytearray()
+        try:
+            for chunk in response.iter_content(64 * 1024):
+                data.extend(chunk)
+                if len(data) > MAX_SITEMAP_BYTES:
+                    print(f"Sitemap {url} is larger than {MAX_SITEMAP_BYTES} bytes; skipping.")
+                    return None
+        except requests.RequestException:
+            return None
+    data = bytes(data)
+    if data[:2] == b'\x1f\x8b':
+        try:
+            with gzip.GzipFile(fileobj=io.BytesIO(data)) as f:
+                data = f.read(MAX_SITEMAP_BYTES + 1)
+        except (OSError, EOFError):
+            return None
+        if len(data) > MAX_SITEMAP_BYTES:
+            print(f"Sitemap {url} is larger than {MAX_SITEMAP_BYTES} bytes uncompressed; skipping.")
+            return None
+    return data
+
+
+def read_sitemaps(session, sitemap_urls, timeout=DEFAULT_TIMEOUT, max_urls=DEFAULT_MAX_URLS,
+                  max_sitemaps=DEFAULT_MAX_SITEMAPS):
+    """
+    Reads sitemaps and sitemap indexes, following nested indexes, and collects their page URLs.
+
+    Parameters:
+    session (requests.Session): The session used for the requests.
+    sitemap_urls (list): The sitemap URLs to start from.
+    timeout (int, optional): The request timeout in seconds. Default is 10.
+    max_urls (int, optional): Reading stops once this many page URLs have been found. Default is 50,000.
+    max_sitemaps (int, optional): The maximum number of sitemap files read. Default is 50.
+
+    Returns:
+    tuple: (urls, sitemaps_read), where urls maps each page URL to its <lastmod> value (or None).
+    """
+    urls = {}
+    queue = list(dict.fromkeys(sitemap_urls))
+    seen = set(queue)
+    sitemaps_read = 0
+    while queue and sitemaps_read < max_sitemaps and len(urls) < max_urls:
+        sitemap_url = queue.pop(0)
+        data = _fetch_sitemap(session, sitemap_url, timeout)
+        if data is None:
+            continue
+        try:
+            root = ET.fromstring(data)
+        except ET.ParseError:
+            print(f"Could not parse sitemap {sitemap_url}")
+            continue
+        sitemaps_read += 1
+
+        is_index = _local_name(root.tag) == 'sitemapindex'
+        for entry in root:
+            fields = {_local_name(child.tag): (child.text or '').strip() for child in entry}
+            loc = fields.get('loc')
+            if not loc:
+                continue
+            loc = urldefrag(urljoin(sitemap_url, loc))[0]
+            if is_index:
+                if loc not in seen:
+                    seen.add(loc)
+                    queue.append(loc)
+            elif len(urls) < max_urls:
+                urls[loc] = fields.get('lastmod') or None
+    return urls, sitemaps_read
+
+
+def url_text(url):
+    """
+    Turns the path of a URL into words, e.g. '/student-life/writing_center/' into 'student life writing center'.
+
+    Parameters:
+    url (str): The URL.
+
+    Returns:
+    str: The words of the URL path.
+    """
+    return _PATH_SEPARATORS.sub(' ', unquote(urlparse(url).path)).strip()
+
+
+def discover_site(url, keywords=None, session=None, timeout=DEFAULT_TIMEOUT, max_urls=DEFAULT_MAX_URLS,
+                  max_sitemaps=DEFAULT_MAX_SITEMAPS, max_seeds=DEFAULT_MAX_SEEDS):
+    """
+    Discovers the pages of a site from its robots.txt and sitemaps.
+
+    The robots.txt rules, Crawl-delay and Sitemap directives are read first; if robots.txt lists no sitemaps,
+    '/sitemap.xml' is tried. Sitemap indexes are expanded, including gzipped sitemaps. Page URLs whose path
+    matches one of the keywords (e.g. '/writing-center/') become crawl seeds, so deep support pages are
+    reached without crawling down to them.
+
+    Parameters:
+    url (str): The site's start URL.
+    keywords (list or KeywordMatcher, optional): The keywords URL paths are matched against. If None,
+    every sitemap URL is a seed.
+    session (requests.Session, optional): The session used for the requests. A new session is created if not given.
+    timeout (int, optional): The request timeout in seconds. Default is 10.
+    max_urls (int, optional): The maximum number of sitemap URLs read. Default is 50,000.
+    max_sitemaps (int, optional): The maximum number of sitemap files read. Default is 50.
+    max_seeds (int, optional): The maximum number of seeds returned. Default is 500.
+
+    Returns:
+    dict: A dict with 'host', 'robots' (a RobotFileParser or None), 'crawl_delay' (seconds or None),
+    'sitemaps' (the number of sitemap files read), 'urls' (every sitemap URL mapped to its <lastmod>)
+    and 'seeds' (the sitemap URLs that match the keywords).
+
+    Example:
+    >>> site = discover_site("https://illinois.edu", ["Tutoring", "Writing center"])
+    >>> site['seeds'][:2]
+    ['https://illinois.edu/academics/tutoring/', 'https://illinois.edu/student-life/writing-center/']
+    """
+    if session is None:
+        session = requests.Session()
+    if keywords is not None and not isinstance(keywords, KeywordMatcher):
+        keywords = KeywordMatcher(keywords)
+    parsed = urlparse(url)
+
+    robots = read_robots(session, url, timeout=timeout)
+    crawl_delay = None
+    sitemap_urls = []
+    if robots is not None:
+        crawl_delay = robots.crawl_delay('*')
+        sitemap_urls = robots.site_maps() or []
+    if not sitemap_urls:
+        sitemap_urls = [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"]
+
+    urls, sitemaps_read = read_sitemaps(session, sitemap_urls, timeout=timeout, max_urls=max_urls,
+                                        max_sitemaps=max_sitemaps)
+    seeds = [
+        page_url for page_url in urls
+        if (robots is None or robots.can_fetch('*', page_url))
+        and (keywords is None or keywords.match(url_text(page_url)))
+    ][:max_seeds]
+    print(f"Discovered {len(urls)} URLs in {sitemaps_read} sitemaps for {parsed.netloc}; {len(seeds)} match the keywords.")
+    return {
+        'host': parsed.netloc,
+        'robots': robots,
+        'crawl_delay': float(crawl_delay) if crawl_delay is not None else None,
+        'sitemaps': sitemaps_read,
+        'urls': urls,
+        'seeds': seeds
+    }
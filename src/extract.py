@@ -0,0 +1,190 @@
+import re
+import time
+import hashlib
+import threading
+
+import lxml.html
+from lxml import etree
+
+from src.metrics import METRICS
+
+# Tags that never hold main content
+BOILERPLATE_TAGS = {
+    'script', 'style', 'noscript', 'template', 'svg', 'iframe', 'canvas',
+    'nav', 'aside', 'form', 'button', 'select'
+}
+# Page-level headers and footers are chrome, but those inside an article usually hold its title or byline
+CHROME_TAGS = {'header', 'footer'}
+CONTENT_TAGS = {'main', 'article'}
+BOILERPLATE_ROLES = {'navigation', 'banner', 'contentinfo', 'search', 'complementary', 'dialog', 'alertdialog'}
+BOILERPLATE_PATTERN = re.compile(
+    r'cookie|consent|gdpr|banner|breadcrumb|skip-?(link|nav|to)|navbar|(^|[-_ ])nav([-_ ]|$)|menu|'
+    r'site-?(header|footer)|social|share|sidebar|modal|popup|newsletter|alert-bar',
+    re.IGNORECASE
+)
+BLOCK_TAGS = {
+    'p', 'div', 'section', 'li', 'ul', 'ol', 'dl', 'dt', 'dd', 'tr', 'td', 'th', 'table', 'br', 'hr',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'address', 'article', 'main', 'figcaption'
+}
+BLOCK_BREAK = '\x1e'
+# XPath equivalents of main, [role=main], article, #main-content, #main, #content and .main-content, in order
+MAIN_CONTENT_XPATHS = [etree.XPath(path) for path in (
+    '//main', '//*[@role="main"]', '//article', '//*[@id="main-content"]', '//*[@id="main"]', '//*[@id="content"]',
+    '//*[contains(concat(" ", normalize-space(@class), " "), " main-content ")]'
+)]
+WHITESPACE = re.compile(r'\s+')
+
+
+class ContentExtractor:
+    """
+    Extracts the main content of HTML pages as plain text, leaving out boilerplate.
+
+    Pages are parsed with lxml.html. Scripts, styles, navigation, headers, footers,
+    cookie banners and similar elements are removed, and the text is taken from the page's main content
+    region (`<main>`, `<article>`, `#content`, ...) when one exists. The extractor also remembers which text
+    blocks it has seen on earlier pages: a block that appears on `chrome_threshold` or more pages is treated as
+    repeated site chrome and dropped from later pages. One extractor should be shared by all pages of a site.
+
+    Each call reports the bytes of HTML in and text out, and the totals (and the time spent parsing) are kept
+    on the extractor.
+
+    Parameters:
+    chrome_threshold (int, optional): The number of pages a block must appear on to count as site chrome. Default is 3.
+
+    Example:
+    >>> extractor = ContentExtractor()
+    >>> text, stats = extractor.extract(html, url="https://example.edu/tutoring")
+    >>> stats
+    {'url': 'https://example.edu/tutoring', 'bytes_in': 48213, 'bytes_out': 2210}
+    """
+
+    def __init__(self, chrome_threshold=3):
+        self.chrome_threshold = chrome_threshold
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.pages = 0
+        self.parse_seconds = 0.0
+        self._block_pages = {}
+        self._lock = threading.Lock()
+
+    def _strip_boilerplate(self, root):
+        # One walk over the tree that skips the subtree of every element it drops
+        stack = [(root, False)]
+        while stack:
+            element, in_content = stack.pop()
+            for child in list(element):
+                tag = child.tag
+                # Comments and processing instructions are dropped too, keeping the text that follows them
+                if not isinstance(tag, str) or tag in BOILERPLATE_TAGS or (tag in CHROME_TAGS and not in_content):
+                    child.drop_tree()
+                    continue
+                attrib = child.attrib
+                if attrib.get('role', '').lower() in BOILERPLATE_ROLES or attrib.get('aria-hidden') == 'true':
+                    child.drop_tree()
+                    continue
+                names = f"{attrib.get('id', '')} {attrib.get('class', '')}".strip()
+                if names and tag not in CONTENT_TAGS and tag != 'body' and BOILERPLATE_PATTERN.search(names):
+                    child.drop_tree()
+                    continue
+                stack.append((child, in_content or tag in CONTENT_TAGS))
+
+    def _main_region(self, root):
+        for xpath in MAIN_CONTENT_XPATHS:
+            for region in xpath(root)[:1]:
+                if region.text_content().strip():
+                    return region
+        body = root.find('body')
+        return body if body is not None else root
+
+    @staticmethod
+    def _region_text(region):
+        # Block boundaries are marked so inline links and emphasis stay on the same line as their sentence
+        parts = []
+        for event, element in etree.iterwalk(region, events=('start', 'end')):
+            is_element = isinstance(element.tag, str)
+            if event == 'start':
+                if is_element:
+                    if element.tag in BLOCK_TAGS:
+                        parts.append(BLOCK_BREAK)
+                    if element.text:
+                        parts.append(element.text)
+            else:
+                if is_element and element.tag in BLOCK_TAGS:
+                    parts.append(BLOCK_BREAK)
+                if element.tail and element is not region:
+                    parts.append(element.tail)
+        return ''.join(parts)
+
+    @staticmethod
+    def _parse(html):
+        try:
+            return lxml.html.document_fromstring(html)
+        except ValueError:
+            # Strings with an XML encoding declaration must be parsed as bytes
+            return lxml.html.document_fromstring(html.encode('utf-8'))
+
+    def extract(self, html, url=None):
+        """
+        Extracts the main-content text of one page.
+
+        Parameters:
+        html (str): The page HTML.
+        url (str, optional): The page URL, included in the returned stats.
+
+        Returns:
+        tuple: The extracted text (one block per line) and a stats dict with 'url', 'bytes_in' and 'bytes_out'.
+        """
+        started = time.perf_counter()
+        try:
+            root = self._parse(html)
+        except etree.ParserError:  # An empty document
+            text_blocks = ''
+        else:
+            self._strip_boilerplate(root)
+            text_blocks = self._region_text(self._main_region(root))
+
+        blocks = []
+        seen = set()
+        for line in text_blocks.split(BLOCK_BREAK):
+            block = WHITESPACE.sub(' ', line).strip()
+            if block and block not in seen:
+                seen.add(block)
+                blocks.append(block)
+
+        kept = []
+        with self._lock:
+            for block in blocks:
+                key = hashlib.blake2b(block.encode('utf-8'), digest_size=8).digest()
+                count = self._block_pages.get(key, 0) + 1
+                self._block_pages[key] = count
+                if count < self.chrome_threshold:
+                    kept.append(block)
+
+        text = '\n'.join(kept)
+        parse_seconds = time.perf_counter() - started
+        METRICS.observe('html_parse_seconds', parse_seconds, stage='scrape')
+        stats = {
+            'url': url,
+            'bytes_in': len(html.encode('utf-8')),
+            'bytes_out': len(text.encode('utf-8'))
+        }
+        with self._lock:
+            self.pages += 1
+            self.bytes_in += stats['bytes_in']
+            self.bytes_out += stats['bytes_out']
+            self.parse_seconds += parse_seconds
+        return text, stats
+
+
+def extract_main_text(html, url=None):
+    """
+    Extracts the main-content text of a single page without cross-page chrome detection.
+
+    Parameters:
+    html (str): The page HTML.
+    url (str, optional): The page URL, included in the returned stats.
+
+    Returns:
+    tuple: The extracted text and a stats dict with 'url', 'bytes_in' and 'bytes_out'.
+    """
+    return ContentExtractor().extract(html, url=url)
@@ -1,88 +1,73 @@
 import os
 import json
-import google.generativeai as genai
 import time
+import random
+import hashlib
+import threading
 import re
-from google.api_core.exceptions import ResourceExhausted
-from google.generativeai.types import GenerateContentResponse
 from dotenv import load_dotenv
+from src.chunking import (DEFAULT_CHUNK_TOKENS, DEFAULT_MAX_WORKERS, estimate_tokens, split_into_chunks, map_chunks,
+                          merge_api_results, merge_but_results)
+from src.llm_cache import get_llm_cache, make_cache_key
+from src.gemini_scheduler import get_scheduler
+from src.metrics import METRICS
 
 # Load environment variables from .env file
 load_dotenv()
 API_KEY = os.getenv('GEMINI_API_KEY')
 ORG_ID = os.getenv('ORGANIZATION_IDENTIFIER')
 
-# Configure Google Gemini 
-genai.configure(api_key=API_KEY)
+MODEL_NAME = "gemini-2.0-flash"
+# Context caching needs a pinned model version
+CACHED_MODEL_NAME = f"models/{MODEL_NAME}-001"
 
-def gemini_query_api(text, retries=3, initial_delay=1):
-    """
-    Queries the Google Gemini API to generate a CTDL JSON structure based on the provided text.
+# Bump these whenever the meaning of the matching instructions changes. The instruction text is also hashed
+# into the version, so any edit to it stops cached responses from being reused.
+API_PROMPT_VERSION = "api-v2"
+BUT_PROMPT_VERSION = "but-v2"
 
-    This function uses the Google Gemini API to generate content based on a predefined prompt. 
-    It attempts to extract a JSON structure from the API response. If the API rate limit is exceeded, 
-    the function will retry the request with exponential backoff.
+# Opt-in server-side caching of the system instructions, and how long each cached context lives
+CONTEXT_CACHE = os.getenv('GEMINI_CONTEXT_CACHE', '0') == '1'
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv('GEMINI_CONTEXT_CACHE_TTL_SECONDS', '3600'))
 
-    Parameters:
-    text (str): The input text to be used in the prompt for the Google Gemini API.
-    retries (int, optional): The number of times to retry the request in case of a rate limit error. Default is 3.
-    initial_delay (int, optional): The initial delay in seconds before retrying the request. 
-    The delay will be doubled with each retry. Default is 1.
+# Debug logging of prompts and responses: the fraction of requests logged, and the characters shown of each
+LOG_SAMPLE_RATE = float(os.getenv('GEMINI_LOG_SAMPLE_RATE', '0'))
+LOG_MAX_CHARS = int(os.getenv('GEMINI_LOG_MAX_CHARS', '1000'))
 
-    Returns:
-    str: A JSON string extracted from the API response.
 
-    Raises:
-    ValueError: If no JSON structure is found in the API response.
-    ResourceExhausted: If the API rate limit is exceeded and all retries fail.
+_genai = None
+_genai_lock = threading.Lock()
 
-    Example:
-    >>> text = "Generate a CTDL JSON structure for a support service."
-    >>> json_string = gemini_query_api(text)
-    >>> print(json_string)
-    {{
-    "PublishForOrganizationIdentifier": "ce-3508747f-4ca5-412f-bd38-6b0fb2d1132c",
-	"DefaultLanguage": "en-US",
-    "SupportServices": [{{
-            "CTID": "ce-3508747f-4ca5-412f-bd38-6b0fb2d1132c",
-            "Name": "My Support Service One",
-            "Description": "This is some text that describes my Support Service.",
-            "OwnedBy": [{{
-                    "CTID": "ce-3508747f-4ca5-412f-bd38-6b0fb2d1132c"
-                }}
-            ],
-            "InLanguage": [
-                "en-US"
-            ],
-            "LifeCycleStatusType": "Active",
-            "AvailableAt": [{{
-                    "Name": "Office of Student Financial Aid",
-                    "Address1": "One University Plaza",
-                    "City": "Springfield",
-                    "AddressRegion": "IL",
-                    "PostalCode": "62703",
-                    "Country": "United States"
-                }}
-            ],
-            "SupportServiceType": [
-                "support:Counseling",
-                "support:BenefitsSupport",
-                "support:CareerAdvising",
-                "support:PeerService"
-            ]
-            ...
-            
-        }}   
-    ]    
-    }}
+
+def _get_genai():
+    """
+    Returns the `google.generativeai` module, importing and configuring it on first use.
+
+    The SDK takes most of a second to import, so it is only loaded when the first Gemini request is made
+    rather than when the app starts.
+
+    Returns:
+    module: The configured `google.generativeai` module.
     """
+    global _genai
+    with _genai_lock:
+        if _genai is None:
+            import google.generativeai as genai
+            genai.configure(api_key=API_KEY)
+            _genai = genai
+    return _genai
 
-    model = genai.GenerativeModel("gemini-2.0-flash")
-    #model = genai.GenerativeModel("gemini-1.5-flash")
 
-    prompt = f"""You are a helpful assistant that specializes in generating structured data in the CTDL (Credential Transparency Description Language) format. 
+def _api_instructions():
+    """
+    Builds the system instruction that extracts support services in the CTDL bulk publish format.
+
+    Returns:
+    str: The instruction text. The scraped text is sent separately as the user message.
+    """
+    return f"""You are a helpful assistant that specializes in generating structured data in the CTDL (Credential Transparency Description Language) format. 
     Your task is to extract support service information from text and structure it in JSON format.
-    For the support services you find in {text}, return in JSON format. 
+    For the support services you find in the text the user sends, return in JSON format. 
 
     Here's an example:
     
@@ -206,65 +191,19 @@ def gemini_query_api(text, retries=3, initial_delay=1):
         10. Only use values for SupportServiceType and AccommodationType that EXACTLY match the predefined categories provided above. Do NOT use synonyms, paraphrases, or related terms. 
         11. If a value does not match any of the predefined categories for either SupportServiceType or AccommodationType, you MUST omit it entirely. Do NOT attempt to create new categories.
 
-    """ 
-    for i in range(retries):
-        try:
-            delay = initial_delay * (2 ** i)
-            print(f"Attempting request. Delay: {delay} seconds...")
-            time.sleep(delay) 
-            print(f"prompt: {prompt}") 
-            
-            response = model.generate_content(prompt)
-            print(f"response: {response}")
-            print(f"response text: {response.text}")
-            
-            json_string = re.sub(r"```(?:json)?", "", response.text).strip()
-            return json_string
-        
-        except ResourceExhausted as e:
-            if i < retries - 1:
-                print(f"Rate limit exceeded. Retrying...")
-                time.sleep(delay)
-            else:
-                print("Max retries reached. Please try again later.")
-                raise e  # Reraise if all retries fail 
-
-def gemini_query_but(text, retries=3, initial_delay=1):
     """
-    Queries the Google Gemini API to generate a CTDL JSON structure based on the provided text.
 
-    This function uses the Google Gemini API to generate content based on a predefined prompt. It attempts to extract a JSON structure from the API response. If the API rate limit is exceeded, the function will retry the request with exponential backoff.
 
-    Parameters:
-    text (str): The input text to be used in the prompt for the Google Gemini API.
-    retries (int, optional): The number of times to retry the request in case of a rate limit error. Default is 3.
-    initial_delay (int, optional): The initial delay in seconds before retrying the request. The delay will be doubled with each retry. Default is 1.
+def _but_instructions():
+    """
+    Builds the system instruction that extracts support services in the Bulk Upload Template format.
 
     Returns:
-    str: A JSON string extracted from the API response.
-
-    Raises:
-    ValueError: If no JSON structure is found in the API response.
-    ResourceExhausted: If the API rate limit is exceeded and all retries fail.
-
-    Example:
-    >>> text = "Generate a CTDL JSON structure for a support service."
-    >>> json_string = gemini_query_api(text)
-    >>> print(json_string)
-	{
-        "ExternalIdentifier": "example-id",
-        "ResourceName": "Example Support Service",
-        "Description": "This is an example support service.",
-        ...
-    }
+    str: The instruction text. The scraped text is sent separately as the user message.
     """
-
-    model = genai.GenerativeModel("gemini-2.0-flash")
-    #model = genai.GenerativeModel("gemini-1.5-flash")
-    
-    prompt = f"""You are a helpful assistant that specializes in generating data in structed JSON format. 
+    return f"""You are a helpful assistant that specializes in generating data in structed JSON format. 
     Your task is to extract support service information from text and structure it in JSON format.
-    For the support services you find in {text}, return in JSON format. 
+    For the support services you find in the text the user sends, return in JSON format. 
     
     Here's an example:
 
@@ -343,26 +282,300 @@ def gemini_query_but(text, retries=3, initial_delay=1):
         10. If you encounter a field that is not applicable to a particular service, leave it as a blank space.
         11. The delivery type for each service can not be In-Person and OnlineOnly at the same time. If a service is offered both in-person and online, select the appropriate delivery type: BlendedDelivery or Variable Site.
 
-    """ 
-    for i in range(retries):
+    """
+
+
+class Instructions:
+    """
+    The static system instruction of one extraction task, with a version that identifies its exact text.
+
+    The version combines the task's prompt version with a hash of the text, so it can be used in LLM cache
+    keys and in the names of cached contexts.
+
+    Parameters:
+    name (str): The task name, 'api' or 'but'.
+    version (str): The prompt version, e.g. 'api-v2'.
+    text (str): The instruction text.
+    """
+
+    def __init__(self, name, version, text):
+        self.name = name
+        self.text = text
+        self.version = f"{version}:{hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]}"
+        self.tokens = estimate_tokens(text)
+
+
+# Built once per process; the CTDL instructions embed the organization identifier
+API_INSTRUCTIONS = Instructions('api', API_PROMPT_VERSION, _api_instructions())
+BUT_INSTRUCTIONS = Instructions('but', BUT_PROMPT_VERSION, _but_instructions())
+
+# Instructions version -> (model, expiry time or None), kept for the life of the process
+_models = {}
+_models_lock = threading.Lock()
+
+
+def _create_cached_model(genai, instructions):
+    # Stores the instructions as a server-side cached context and returns a model that reads from it
+    cached = genai.caching.CachedContent.create(
+        model=CACHED_MODEL_NAME, display_name=f"support-services-{instructions.version}".replace(':', '-'),
+        system_instruction=instructions.text, ttl=CONTEXT_CACHE_TTL_SECONDS)
+    print(f"Cached the {instructions.name} instructions ({instructions.tokens} tokens) as {cached.name}.")
+    return genai.GenerativeModel.from_cached_content(cached)
+
+
+def _get_model(instructions):
+    """
+    Returns the Gemini model for an extraction task, creating it on first use and reusing it afterwards.
+
+    The model carries the task's instructions as its system instruction, so each request only sends the
+    scraped text. With GEMINI_CONTEXT_CACHE=1 the instructions are stored as a cached context instead, which is
+    recreated shortly before it expires. If the context cannot be cached (for example because the instructions
+    are shorter than the API's minimum), the plain system instruction is used.
+
+    Parameters:
+    instructions (Instructions): The task's instructions.
+
+    Returns:
+    genai.GenerativeModel: The model.
+    """
+    with _models_lock:
+        model, expires_at = _models.get(instructions.version, (None, None))
+        if model is not None and (expires_at is None or time.time() < expires_at):
+            return model
+        genai = _get_genai()
+        model, expires_at = None, None
+        if CONTEXT_CACHE:
+            try:
+                model = _create_cached_model(genai, instructions)
+                expires_at = time.time() + CONTEXT_CACHE_TTL_SECONDS * 0.9
+            except Exception as e:
+                print(f"Could not cache the {instructions.name} instructions, sending them with each request: {e}")
+        if model is None:
+            model = genai.GenerativeModel(MODEL_NAME, system_instruction=instructions.text)
+        _models[instructions.version] = (model, expires_at)
+        return model
+
+
+def _log_sample(label, text):
+    # Prints the start of a sampled prompt or response
+    more = f" ... ({len(text) - LOG_MAX_CHARS} more characters)" if len(text) > LOG_MAX_CHARS else ""
+    print(f"[debug] {label}: {text[:LOG_MAX_CHARS]}{more}")
+
+
+def _generate_json(instructions, text, retries=3, initial_delay=1, cache_key=None):
+    """
+    Sends scraped text to Google Gemini under a task's instructions and returns the JSON text of the response.
+
+    Only the text is sent as the request content; the instructions are the system instruction (or cached
+    context) of the task's model, which is reused across calls.
+
+    The call goes through the process-wide Gemini scheduler, which enforces the request and token quotas,
+    caps concurrent calls and retries rate-limit errors with jittered backoff. No delay is added before the
+    first attempt. If a cache key is given, the response is looked up in the persistent LLM cache first and stored there
+    after a successful call whose response parses as JSON, so unchanged input text skips the API call entirely.
+
+    Request counts, latency and token usage are recorded in the metrics registry. Prompts and responses are
+    only printed for a GEMINI_LOG_SAMPLE_RATE fraction of requests, cut to GEMINI_LOG_MAX_CHARS characters.
+
+    Parameters:
+    instructions (Instructions): The task's instructions, API_INSTRUCTIONS or BUT_INSTRUCTIONS.
+    text (str): The scraped text to extract support services from.
+    retries (int, optional): The number of times to retry the request in case of a rate limit error. Default is 3.
+    initial_delay (int, optional): The backoff base in seconds, doubled after each rate-limit error. Default is 1.
+    cache_key (str, optional): The key from `make_cache_key` for this request. Default is None (no caching).
+
+    Returns:
+    str: The response text with Markdown code fences removed.
+
+    Raises:
+    ResourceExhausted: If the API rate limit is exceeded and all retries fail.
+    """
+    cache = get_llm_cache() if cache_key else None
+    if cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print("Using cached Gemini response.")
+            METRICS.inc('llm_requests_total', result='cached')
+            return cached
+
+    model = _get_model(instructions)
+
+    # Only a sample of requests is logged, so full prompts do not flood the output
+    sampled = LOG_SAMPLE_RATE > 0 and random.random() < LOG_SAMPLE_RATE
+    if sampled:
+        _log_sample("prompt", text)
+
+    # The system instruction still counts towards the token quota
+    prompt_tokens = instructions.tokens + estimate_tokens(text)
+    started = time.perf_counter()
+    try:
+        response = get_scheduler().call(lambda: model.generate_content(text), estimated_tokens=prompt_tokens,
+                                        retries=retries, base_delay=initial_delay)
+    except Exception:
+        METRICS.inc('llm_requests_total', result='error')
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        METRICS.observe('llm_request_seconds', seconds)
+    if response is None:
+        METRICS.inc('llm_requests_total', result='empty')
+        return None
+
+    usage = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(usage, 'prompt_token_count', None) or prompt_tokens
+    cached_tokens = getattr(usage, 'cached_content_token_count', None) or 0
+    response_tokens = getattr(usage, 'candidates_token_count', None) or estimate_tokens(response.text)
+    METRICS.inc('llm_requests_total', result='ok')
+    METRICS.inc('llm_prompt_tokens_total', prompt_tokens)
+    METRICS.inc('llm_cached_tokens_total', cached_tokens)
+    METRICS.inc('llm_response_tokens_total', response_tokens)
+    print(f"Gemini responded in {seconds:.1f} seconds ({prompt_tokens} prompt tokens of which {cached_tokens} cached, "
+          f"{response_tokens} response tokens).")
+    if sampled:
+        _log_sample("response", response.text)
+    json_string = re.sub(r"```(?:json)?", "", response.text).strip()
+    if cache:
+        # A malformed answer is not cached, so the next run asks again instead of replaying it
         try:
-            delay = initial_delay * (2 ** i)
-            print(f"Attempting request. Delay: {delay} seconds...")
-            time.sleep(delay) 
-            print(f"prompt: {prompt}") 
-            response = model.generate_content(prompt)
-            print(f"response: {response}")
-            print(f"response text: {response.text}")
-            json_string = re.sub(r"```(?:json)?", "", response.text).strip()
-            return json_string
-        
-        except ResourceExhausted as e:
-            if i < retries - 1:
-                print(f"Rate limit exceeded. Retrying...")
-                time.sleep(delay)
-            else:
-                print("Max retries reached. Please try again later.")
-                raise e  # Reraise if all retries fail 
+            json.loads(json_string)
+        except ValueError:
+            print("Gemini returned invalid JSON; the response was not cached.")
+        else:
+            cache.set(cache_key, json_string)
+    return json_string
+
+def gemini_query_api(text, retries=3, initial_delay=1, max_chunk_tokens=DEFAULT_CHUNK_TOKENS,
+                     max_workers=DEFAULT_MAX_WORKERS, use_cache=True):
+    """
+    Queries the Google Gemini API to generate a CTDL JSON structure based on the provided text.
+
+    This function uses the Google Gemini API to generate content based on a predefined prompt. 
+    It attempts to extract a JSON structure from the API response. If the API rate limit is exceeded, 
+    the function will retry the request with exponential backoff.
+    Text larger than `max_chunk_tokens` is split into chunks on page boundaries, the chunks are queried
+    in parallel, and the per-chunk services are merged and deduplicated by name and webpage.
+
+    Parameters:
+    text (str): The input text to be used in the prompt for the Google Gemini API.
+    retries (int, optional): The number of times to retry the request in case of a rate limit error. Default is 3.
+    initial_delay (int, optional): The initial delay in seconds before retrying the request. 
+    The delay will be doubled with each retry. Default is 1.
+    max_chunk_tokens (int, optional): The token budget of scraped text per request. Default is 24000.
+    max_workers (int, optional): The maximum number of chunk requests in flight at once. Default is 4.
+    use_cache (bool, optional): Whether to reuse cached responses for unchanged chunks. Default is True.
+
+    Returns:
+    str: A JSON string extracted from the API response, or None if the text is empty.
+
+    Raises:
+    ValueError: If no JSON structure is found in the API response.
+    ResourceExhausted: If the API rate limit is exceeded and all retries fail.
+
+    Example:
+    >>> text = "Generate a CTDL JSON structure for a support service."
+    >>> json_string = gemini_query_api(text)
+    >>> print(json_string)
+    {{
+    "PublishForOrganizationIdentifier": "ce-3508747f-4ca5-412f-bd38-6b0fb2d1132c",
+	"DefaultLanguage": "en-US",
+    "SupportServices": [{{
+            "CTID": "ce-3508747f-4ca5-412f-bd38-6b0fb2d1132c",
+            "Name": "My Support Service One",
+            "Description": "This is some text that describes my Support Service.",
+            "OwnedBy": [{{
+                    "CTID": "ce-3508747f-4ca5-412f-bd38-6b0fb2d1132c"
+                }}
+            ],
+            "InLanguage": [
+                "en-US"
+            ],
+            "LifeCycleStatusType": "Active",
+            "AvailableAt": [{{
+                    "Name": "Office of Student Financial Aid",
+                    "Address1": "One University Plaza",
+                    "City": "Springfield",
+                    "AddressRegion": "IL",
+                    "PostalCode": "62703",
+                    "Country": "United States"
+                }}
+            ],
+            "SupportServiceType": [
+                "support:Counseling",
+                "support:BenefitsSupport",
+                "support:CareerAdvising",
+                "support:PeerService"
+            ]
+            ...
+            
+        }}   
+    ]    
+    }}
+    """
+
+    def query(chunk):
+        cache_key = make_cache_key(MODEL_NAME, API_INSTRUCTIONS.version, chunk) if use_cache else None
+        return _generate_json(API_INSTRUCTIONS, chunk, retries, initial_delay, cache_key=cache_key)
+
+    # Gemini rejects an empty prompt, and there is nothing to extract when the crawl found no pages
+    if not text or not text.strip():
+        return None
+    chunks = split_into_chunks(text, max_chunk_tokens)
+    if len(chunks) == 1:
+        return query(chunks[0])
+
+    print(f"Splitting scraped content into {len(chunks)} chunks for extraction.")
+    results = map_chunks(query, chunks, max_workers=max_workers)
+    return merge_api_results(results)
+
+def gemini_query_but(text, retries=3, initial_delay=1, max_chunk_tokens=DEFAULT_CHUNK_TOKENS,
+                     max_workers=DEFAULT_MAX_WORKERS, use_cache=True):
+    """
+    Queries the Google Gemini API to generate a CTDL JSON structure based on the provided text.
+
+    This function uses the Google Gemini API to generate content based on a predefined prompt. It attempts to extract a JSON structure from the API response. If the API rate limit is exceeded, the function will retry the request with exponential backoff.
+    Text larger than `max_chunk_tokens` is split into chunks on page boundaries, the chunks are queried in parallel, and the per-chunk records are merged and deduplicated by name and webpage.
+
+    Parameters:
+    text (str): The input text to be used in the prompt for the Google Gemini API.
+    retries (int, optional): The number of times to retry the request in case of a rate limit error. Default is 3.
+    initial_delay (int, optional): The initial delay in seconds before retrying the request. The delay will be doubled with each retry. Default is 1.
+    max_chunk_tokens (int, optional): The token budget of scraped text per request. Default is 24000.
+    max_workers (int, optional): The maximum number of chunk requests in flight at once. Default is 4.
+    use_cache (bool, optional): Whether to reuse cached responses for unchanged chunks. Default is True.
+
+    Returns:
+    str: A JSON string extracted from the API response, or None if the text is empty.
+
+    Raises:
+    ValueError: If no JSON structure is found in the API response.
+    ResourceExhausted: If the API rate limit is exceeded and all retries fail.
+
+    Example:
+    >>> text = "Generate a CTDL JSON structure for a support service."
+    >>> json_string = gemini_query_api(text)
+    >>> print(json_string)
+	{
+        "ExternalIdentifier": "example-id",
+        "ResourceName": "Example Support Service",
+        "Description": "This is an example support service.",
+        ...
+    }
+    """
+
+    def query(chunk):
+        cache_key = make_cache_key(MODEL_NAME, BUT_INSTRUCTIONS.version, chunk) if use_cache else None
+        return _generate_json(BUT_INSTRUCTIONS, chunk, retries, initial_delay, cache_key=cache_key)
+
+    # Gemini rejects an empty prompt, and there is nothing to extract when the crawl found no pages
+    if not text or not text.strip():
+        return None
+    chunks = split_into_chunks(text, max_chunk_tokens)
+    if len(chunks) == 1:
+        return query(chunks[0])
+
+    print(f"Splitting scraped content into {len(chunks)} chunks for extraction.")
+    results = map_chunks(query, chunks, max_workers=max_workers)
+    return merge_but_results(results)
 
 def save_ctdl_to_json(data, filepath):
     """
@@ -388,7 +601,7 @@ def save_ctdl_to_json(data, filepath):
     """
     
     try:
-        if isinstance(data, GenerateContentResponse):
+        if not isinstance(data, str):  # A GenerateContentResponse
             json_string = data.text
         else:
             json_string = data
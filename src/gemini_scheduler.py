@@ -0,0 +1,212 @@
+import os
+import time
+import random
+import threading
+
+from src.metrics import METRICS
+
+# Default quota, matching the Gemini free tier for gemini-2.0-flash
+DEFAULT_REQUESTS_PER_MINUTE = 15
+DEFAULT_TOKENS_PER_MINUTE = 1000000
+DEFAULT_MAX_CONCURRENT = 4
+DEFAULT_MAX_BACKOFF = 30
+
+
+class TokenBucket:
+    """
+    Token bucket that refills continuously at a per-minute rate.
+
+    `reserve()` takes tokens immediately and returns how long the caller must wait before using them, so
+    concurrent callers are served in the order they reserve instead of racing for the next refill.
+
+    Parameters:
+    rate_per_minute (float): Tokens added per minute. None or 0 disables the limit.
+    capacity (float, optional): The maximum burst size. Default is one minute's worth of tokens.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = (rate_per_minute or 0) / 60.0
+        self.capacity = capacity or rate_per_minute or 0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """
+        Reserves tokens and returns the number of seconds to wait before they are available.
+
+        Parameters:
+        amount (float, optional): The number of tokens to take. Default is 1.
+
+        Returns:
+        float: The wait in seconds, 0 if the tokens are available now.
+        """
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class GeminiScheduler:
+    """
+    Process-wide scheduler for Gemini API calls.
+
+    Every call first waits for a free in-flight slot, then for the requests-per-minute and tokens-per-minute
+    buckets, and only then runs. Rate-limit errors are retried with exponential backoff and full jitter; no delay
+    is added before a first attempt. The scheduler keeps queue depth, wait-time and retry statistics.
+
+    Parameters:
+    requests_per_minute (int, optional): The request quota. Default is 15.
+    tokens_per_minute (int, optional): The input token quota. Default is 1,000,000.
+    max_concurrent (int, optional): The maximum number of calls in flight at once. Default is 4.
+    max_backoff (float, optional): The upper bound of a single backoff sleep in seconds. Default is 30.
+    retry_on (tuple, optional): Exception types that are retried. Default is (ResourceExhausted,), imported
+    from google.api_core only when the scheduler is created.
+
+    Example:
+    >>> scheduler = get_scheduler()
+    >>> response = scheduler.call(lambda: model.generate_content(prompt), estimated_tokens=12000)
+    >>> scheduler.stats()['avg_wait_seconds']
+    0.0
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 max_concurrent=DEFAULT_MAX_CONCURRENT, max_backoff=DEFAULT_MAX_BACKOFF, retry_on=None):
+        if retry_on is None:
+            # Imported here so that importing the app does not load google.api_core and grpc
+            from google.api_core.exceptions import ResourceExhausted
+            retry_on = (ResourceExhausted,)
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrent = max_concurrent
+        self.max_backoff = max_backoff
+        self.retry_on = retry_on
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._queue_depth = 0
+        self._in_flight = 0
+        self._calls = 0
+        self._retries = 0
+        self._failures = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _acquire(self, estimated_tokens):
+        started = time.monotonic()
+        with self._lock:
+            self._queue_depth += 1
+        self._slots.acquire()
+        wait = max(self.request_bucket.reserve(1), self.token_bucket.reserve(estimated_tokens))
+        if wait > 0:
+            time.sleep(wait)
+        waited = time.monotonic() - started
+        with self._lock:
+            self._queue_depth -= 1
+            self._in_flight += 1
+            self._calls += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def call(self, fn, estimated_tokens=0, retries=3, base_delay=1):
+        """
+        Runs a Gemini call under the rate limits, retrying rate-limit errors with jittered backoff.
+
+        Parameters:
+        fn (callable): A function with no arguments that makes the API call.
+        estimated_tokens (int, optional): The estimated input tokens of the call. Default is 0.
+        retries (int, optional): The total number of attempts. Default is 3.
+        base_delay (float, optional): The backoff base in seconds, doubled after each failure. Default is 1.
+
+        Returns:
+        The return value of `fn`.
+
+        Raises:
+        ResourceExhausted: If the call is still rate limited after all attempts.
+        """
+        for attempt in range(retries):
+            self._acquire(estimated_tokens)
+            try:
+                return fn()
+            except self.retry_on:
+                with self._lock:
+                    if attempt == retries - 1:
+                        self._failures += 1
+                    else:
+                        self._retries += 1
+                if attempt == retries - 1:
+                    print("Max retries reached. Please try again later.")
+                    raise
+            finally:
+                self._release()
+
+            delay = random.uniform(0, min(self.max_backoff, base_delay * (2 ** attempt)))
+            print(f"Rate limit exceeded. Retrying in {delay:.1f} seconds...")
+            time.sleep(delay)
+
+    def stats(self):
+        """
+        Returns scheduler statistics.
+
+        Returns:
+        dict: Queue depth, in-flight calls, attempt/retry/failure counts and total, average and maximum wait times.
+        """
+        with self._lock:
+            return {
+                'queue_depth': self._queue_depth,
+                'in_flight': self._in_flight,
+                'calls': self._calls,
+                'retries': self._retries,
+                'failures': self._failures,
+                'total_wait_seconds': round(self._total_wait, 3),
+                'avg_wait_seconds': round(self._total_wait / self._calls, 3) if self._calls else 0.0,
+                'max_wait_seconds': round(self._max_wait, 3)
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _collect_metrics():
+    # Exports the shared scheduler's statistics on /metrics
+    if _scheduler is None:
+        return []
+    stats = _scheduler.stats()
+    return [
+        ('llm_scheduler_queue_depth', {}, stats['queue_depth']),
+        ('llm_scheduler_in_flight', {}, stats['in_flight']),
+        ('llm_retries_total', {}, stats['retries'])
+    ]
+
+
+def get_scheduler():
+    """
+    Returns the process-wide Gemini scheduler, creating it on first use.
+
+    The limits are read from the environment: GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE and
+    GEMINI_MAX_CONCURRENT.
+
+    Returns:
+    GeminiScheduler: The shared scheduler.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = GeminiScheduler(
+                requests_per_minute=int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', DEFAULT_REQUESTS_PER_MINUTE)),
+                tokens_per_minute=int(os.getenv('GEMINI_TOKENS_PER_MINUTE', DEFAULT_TOKENS_PER_MINUTE)),
+                max_concurrent=int(os.getenv('GEMINI_MAX_CONCURRENT', DEFAULT_MAX_CONCURRENT))
+            )
+            METRICS.add_collector(_collect_metrics)
+        return _scheduler
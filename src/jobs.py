@@ -0,0 +1,269 @@
+import os
+import time
+import uuid
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.pipeline import PIPELINE_STAGES, PipelineCancelled
+
+DEFAULT_JOB_WORKERS = 2
+DEFAULT_MAX_RETAINED_JOBS = 200
+
+# Job statuses
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class Job:
+    """
+    One pipeline run submitted through `/scrape`.
+
+    Parameters:
+    domain (str): The school domain.
+    publish_method (str): 'api' or 'bulk'.
+    on_change (callable, optional): Called as on_change(job) after each stage transition. Default is None.
+    """
+
+    def __init__(self, domain, publish_method, on_change=None):
+        self.id = uuid.uuid4().hex
+        self.domain = domain
+        self.publish_method = publish_method
+        self.status = QUEUED
+        self.stages = OrderedDict((stage, {'status': 'pending'}) for stage in PIPELINE_STAGES)
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.on_change = on_change
+
+    @classmethod
+    def from_dict(cls, data, result=None):
+        """
+        Rebuilds a job from `to_dict` output, e.g. a job run by another worker process.
+
+        The job is a snapshot: it is not running in this process, so cancelling it only sets its cancel event.
+
+        Parameters:
+        data (dict): The job status from `to_dict`.
+        result (dict, optional): The job result. Default is None.
+
+        Returns:
+        Job: The job.
+        """
+        job = cls(data['domain'], data['publish_method'])
+        job.id = data['id']
+        job.status = data['status']
+        job.stages = OrderedDict((name, dict(info)) for name, info in data['stages'].items())
+        job.error = data.get('error')
+        job.created_at = data.get('created_at')
+        job.started_at = data.get('started_at')
+        job.finished_at = data.get('finished_at')
+        job.result = result
+        return job
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    def update_stage(self, stage, status):
+        """
+        Records a stage transition reported by `run_pipeline`.
+
+        Parameters:
+        stage (str): The stage name.
+        status (str): 'running', 'done' or 'failed'.
+        """
+        info = self.stages.setdefault(stage, {})
+        info['status'] = status
+        if status == 'running':
+            info['started_at'] = time.time()
+        else:
+            info['finished_at'] = time.time()
+            if 'started_at' in info:
+                info['seconds'] = round(info['finished_at'] - info['started_at'], 3)
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def to_dict(self):
+        """
+        Returns the job status as a JSON-serializable dict, without the result payload.
+
+        Returns:
+        dict: The job id, domain, publish method, status, per-stage status, error, timestamps and, once the
+        job has succeeded, its timing summary.
+        """
+        return {
+            'id': self.id,
+            'domain': self.domain,
+            'publish_method': self.publish_method,
+            'status': self.status,
+            'stages': {name: dict(info) for name, info in self.stages.items()},
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'metrics': self.result.get('metrics') if self.result else None
+        }
+
+
+class JobManager:
+    """
+    Runs pipeline jobs on a pool of worker threads and keeps their status in memory.
+
+    Finished jobs are kept for polling until more than `max_retained` jobs exist, then the oldest finished
+    jobs are dropped.
+
+    With `workspaces` (a `WorkspaceManager`), each job gets a workspace when it is submitted, and its status,
+    stages and result are written to the workspace's run.json whenever they change. `get` then also finds jobs
+    that run in other processes sharing the workspace folder, e.g. the other workers of a WSGI server, or jobs
+    that were pruned from memory. `cancel` on such a job creates a cancel request in its workspace (see
+    `WorkspaceManager.request_cancel`), and the process running the job stops it at its next stage boundary.
+
+    Parameters:
+    run (callable): Called as run(job) on a worker thread; returns the job result.
+    max_workers (int, optional): The number of jobs run at once. Default is the JOB_WORKERS environment variable, or 2.
+    max_retained (int, optional): The maximum number of jobs kept in memory. Default is 200.
+    workspaces (WorkspaceManager, optional): Where the job status is shared between processes. Default is None.
+
+    Example:
+    >>> manager = JobManager(lambda job: run_pipeline(job.domain, job.publish_method, ...))
+    >>> job = manager.submit("illinois.edu", "bulk")
+    >>> manager.get(job.id).status
+    'running'
+    """
+
+    def __init__(self, run, max_workers=None, max_retained=DEFAULT_MAX_RETAINED_JOBS, workspaces=None):
+        self.run = run
+        self.max_workers = max_workers or int(os.getenv('JOB_WORKERS', DEFAULT_JOB_WORKERS))
+        self.max_retained = max_retained
+        self.workspaces = workspaces
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, domain, publish_method):
+        """
+        Queues a pipeline run and returns its job immediately.
+
+        Parameters:
+        domain (str): The school domain.
+        publish_method (str): 'api' or 'bulk'.
+
+        Returns:
+        Job: The queued job.
+        """
+        job = Job(domain, publish_method, on_change=self._save)
+        if self.workspaces is not None:
+            self.workspaces.create(job.id, domain=domain)
+            self._save(job)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(self._execute, job)
+        return job
+
+    def _save(self, job):
+        # Shares the job status through its workspace and picks up cancellations made by other processes
+        if self.workspaces is None:
+            return
+        self.workspaces.update(job.id, job=job.to_dict(), result=job.result if job.finished else None)
+        if self.workspaces.cancel_requested(job.id):
+            job.cancel_event.set()
+
+    def _execute(self, job):
+        self._save(job)
+        if job.cancel_event.is_set():
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            self._finish(job)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        self._save(job)
+        try:
+            job.result = self.run(job)
+            job.status = SUCCEEDED
+        except PipelineCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            self._finish(job)
+
+    def _finish(self, job):
+        self._save(job)
+        if self.workspaces is not None:
+            self.workspaces.finish(job.id)
+
+    def _prune(self):
+        excess = len(self._jobs) - self.max_retained
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """
+        Returns a job by id, or None if it is unknown or has been pruned.
+
+        Jobs not held by this manager are read from their workspace, if there is one.
+
+        Parameters:
+        job_id (str): The job id.
+
+        Returns:
+        Job: The job, or None.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.workspaces is not None:
+            run = self.workspaces.read(job_id)
+            if run and run.get('job'):
+                job = Job.from_dict(run['job'], run.get('result'))
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancels a job. A queued job never starts; a running job stops at its next stage boundary.
+
+        Parameters:
+        job_id (str): The job id.
+
+        Returns:
+        Job: The job, or None if it is unknown.
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_event.set()
+        if job.future is None and self.workspaces is not None:
+            # The job runs in another process, which checks for the request at its next stage boundary
+            self.workspaces.request_cancel(job_id)
+        elif job.future is not None and job.future.cancel():
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            self._finish(job)
+        return job
+
+    def stats(self):
+        """
+        Returns the number of jobs in each status.
+
+        Returns:
+        dict: A mapping of status to job count.
+        """
+        counts = {status: 0 for status in (QUEUED, RUNNING) + FINISHED_STATUSES}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return counts
@@ -0,0 +1,152 @@
+import os
+import threading
+from collections import deque
+
+
+class KeywordMatcher:
+    """
+    Finds every keyword from a fixed list in a single pass over a text.
+
+    The keywords are compiled once into an Aho-Corasick automaton (a trie of the lowercased keywords with
+    failure links), so matching a page costs one scan of its text no matter how many keywords there are.
+    Matching is case-insensitive. With `word_boundaries=True`, a keyword only counts when it is not
+    directly preceded or followed by a letter or digit, so "Exam" no longer matches inside "Example".
+
+    Parameters:
+    keywords (list): The keywords to search for. Blank entries are ignored.
+    word_boundaries (bool, optional): Whether matches must fall on word boundaries. Default is False.
+
+    Example:
+    >>> matcher = KeywordMatcher(["Tutoring", "Writing center", "Exam"])
+    >>> matcher.match("Visit the writing center for tutoring and exam prep.")
+    ['Tutoring', 'Writing center', 'Exam']
+    >>> matcher.count("Tutoring, tutoring and more tutoring.")
+    {'Tutoring': 3}
+    """
+
+    def __init__(self, keywords, word_boundaries=False):
+        self.keywords = [keyword for keyword in keywords if keyword and keyword.strip()]
+        self.word_boundaries = word_boundaries
+
+        # Node 0 is the root. Each node has a goto table, a failure link and the keyword indexes ending there.
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._lengths = []
+        for index, keyword in enumerate(self.keywords):
+            pattern = keyword.lower()
+            self._lengths.append(len(pattern))
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[node][char] = next_node
+                node = next_node
+            self._output[node].append(index)
+
+        # Breadth-first pass to set failure links and merge the outputs of suffix states
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self._goto[node].items():
+                queue.append(next_node)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_node] = self._goto[fail].get(char, 0)
+                self._output[next_node] = self._output[next_node] + self._output[self._fail[next_node]]
+
+    def _iter_matches(self, text):
+        # Yields (keyword_index, end_position) for every occurrence in the already lowercased text
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                for index in output[node]:
+                    yield index, position + 1
+
+    def _on_boundary(self, text, index, end):
+        start = end - self._lengths[index]
+        if start > 0 and text[start - 1].isalnum():
+            return False
+        if end < len(text) and text[end].isalnum():
+            return False
+        return True
+
+    def count(self, text):
+        """
+        Counts the occurrences of each keyword in the text.
+
+        Parameters:
+        text (str): The text to search.
+
+        Returns:
+        dict: A mapping of keyword to hit count, containing only keywords that occur at least once.
+        """
+        text = text.lower()
+        hits = {}
+        for index, end in self._iter_matches(text):
+            if self.word_boundaries and not self._on_boundary(text, index, end):
+                continue
+            keyword = self.keywords[index]
+            hits[keyword] = hits.get(keyword, 0) + 1
+        return hits
+
+    def match(self, text):
+        """
+        Returns the keywords that occur in the text, in the order of the keyword list.
+
+        Parameters:
+        text (str): The text to search.
+
+        Returns:
+        list: The matched keywords.
+        """
+        hits = self.count(text)
+        return [keyword for keyword in self.keywords if keyword in hits]
+
+
+_matcher_cache = {}
+_matcher_lock = threading.Lock()
+
+
+def load_keyword_matcher(keywords_file, word_boundaries=False):
+    """
+    Returns the compiled matcher for a keywords file, building it only when the file changes.
+
+    The matcher is cached per file path and rebuilt when the file's modification time or size changes,
+    so every crawl against the same keywords file shares one automaton.
+
+    Parameters:
+    keywords_file (str): Path to a text file with one keyword per line.
+    word_boundaries (bool, optional): Whether matches must fall on word boundaries. Default is False.
+
+    Returns:
+    KeywordMatcher: The compiled matcher.
+
+    Raises:
+    FileNotFoundError: If the keywords file does not exist.
+    """
+    stat = os.stat(keywords_file)
+    cache_key = (os.path.abspath(keywords_file), word_boundaries)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _matcher_lock:
+        cached = _matcher_cache.get(cache_key)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    with open(keywords_file, 'r', encoding='utf-8') as f:
+        keywords = [line.strip() for line in f]
+    matcher = KeywordMatcher(keywords, word_boundaries=word_boundaries)
+    with _matcher_lock:
+        _matcher_cache[cache_key] = (version, matcher)
+    return matcher
@@ -0,0 +1,184 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, 'uploads', 'llm_cache.sqlite3')
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def make_cache_key(model_name, prompt_version, text):
+    """
+    Builds the cache key for one LLM request.
+
+    Parameters:
+    model_name (str): The model name, e.g. 'gemini-2.0-flash'.
+    prompt_version (str): The version of the prompt template the text is inserted into.
+    text (str): The variable input text.
+
+    Returns:
+    str: A SHA-256 hex digest identifying the request.
+    """
+    digest = hashlib.sha256()
+    for part in (model_name, prompt_version, text):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """
+    Persistent cache of LLM responses stored in SQLite.
+
+    Entries expire after `ttl_seconds`. When the stored responses grow past `max_bytes` or `max_entries`,
+    the least recently used entries are evicted. With `bypass=True` lookups always miss, but fresh responses
+    are still written so the cache stays current.
+
+    Parameters:
+    path (str, optional): Path of the SQLite database. Default is 'uploads/llm_cache.sqlite3'.
+    ttl_seconds (int, optional): How long an entry stays valid. Default is 7 days.
+    max_bytes (int, optional): The maximum total size of cached responses. Default is 64 MB.
+    max_entries (int, optional): The maximum number of cached responses. Default is None (no limit).
+    bypass (bool, optional): Whether to skip cache lookups. Default is False.
+
+    Example:
+    >>> cache = LLMCache()
+    >>> key = make_cache_key("gemini-2.0-flash", "but-v1", text)
+    >>> cache.get(key) is None
+    True
+    >>> cache.set(key, json_string)
+    >>> cache.stats()
+    {'hits': 0, 'misses': 1, 'entries': 1, 'bytes': 5120}
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES,
+                 max_entries=None, bypass=False):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        """
+        Returns the cached response for a key, or None on a miss, an expired entry or when bypassed.
+
+        Parameters:
+        key (str): The cache key from `make_cache_key`.
+
+        Returns:
+        str: The cached response text, or None.
+        """
+        with self._lock:
+            if self.bypass:
+                self.misses += 1
+                return None
+            now = time.time()
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        """
+        Stores a response and evicts the least recently used entries if the cache is over its limits.
+
+        Parameters:
+        key (str): The cache key from `make_cache_key`.
+        value (str): The response text.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode('utf-8')), now, now)
+            )
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+        def over_limits():
+            over_entries = self.max_entries is not None and count > self.max_entries
+            over_bytes = self.max_bytes is not None and total > self.max_bytes
+            return count > 1 and (over_entries or over_bytes)
+
+        if not over_limits():
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC").fetchall():
+            if not over_limits():
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+
+    def clear(self):
+        """
+        Removes every cached response.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Returns hit/miss counters and the current size of the cache.
+
+        Returns:
+        dict: A dict with 'hits', 'misses', 'entries' and 'bytes'.
+        """
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            return {'hits': self.hits, 'misses': self.misses, 'entries': count, 'bytes': total}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """
+    Returns the process-wide LLM cache, creating it on first use.
+
+    The cache is configured from the environment: LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_BYTES,
+    and LLM_CACHE_BYPASS (set to 1 or true to skip lookups).
+
+    Returns:
+    LLMCache: The shared cache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(
+                path=os.getenv('LLM_CACHE_PATH', DEFAULT_CACHE_PATH),
+                ttl_seconds=int(os.getenv('LLM_CACHE_TTL_SECONDS', DEFAULT_TTL_SECONDS)),
+                max_bytes=int(os.getenv('LLM_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+                bypass=os.getenv('LLM_CACHE_BYPASS', '').lower() in ('1', 'true', 'yes')
+            )
+        return _cache
@@ -0,0 +1,171 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Metric name -> (type, help text). Summaries are exported as <name>_count and <name>_sum.
+METRIC_HELP = {
+    'pipeline_runs_total': ('counter', "Pipeline runs by publish method and outcome."),
+    'pipeline_stage_seconds': ('summary', "Wall time of each pipeline stage."),
+    'crawl_pages_total': ('counter', "Pages requested by the crawler, by result."),
+    'crawl_bytes_downloaded_total': ('counter', "Bytes of HTML downloaded by the crawler."),
+    'crawl_checkpoints_total': ('counter', "Crawl state checkpoints written."),
+    'crawl_resumed_total': ('counter', "Crawls resumed from a checkpoint."),
+    'html_parse_seconds': ('summary', "Time spent parsing HTML, by stage."),
+    'relevance_pages_total': ('counter', "Scraped pages by selection result: selected, over_budget or not_relevant."),
+    'dedupe_blocks_total': ('counter', "Scraped text blocks by deduplication result."),
+    'dedupe_bytes_removed_total': ('counter', "Bytes of scraped text removed as duplicates."),
+    'llm_requests_total': ('counter', "Gemini requests by result."),
+    'llm_request_seconds': ('summary', "Wall time of Gemini requests, including rate-limit waits and retries."),
+    'llm_prompt_tokens_total': ('counter', "Prompt tokens sent to Gemini."),
+    'llm_cached_tokens_total': ('counter', "Prompt tokens served from a cached Gemini context."),
+    'llm_response_tokens_total': ('counter', "Response tokens received from Gemini."),
+    'llm_retries_total': ('counter', "Gemini requests retried after a rate-limit error."),
+    'llm_scheduler_queue_depth': ('gauge', "Gemini calls waiting for a slot or quota."),
+    'llm_scheduler_in_flight': ('gauge', "Gemini calls in flight."),
+    'url_checks_total': ('counter', "SubjectWebpage URL checks by result."),
+    'url_check_seconds': ('summary', "Latency of uncached URL checks."),
+    'publish_requests_total': ('counter', "Bulk publish requests by HTTP status."),
+    'publish_request_seconds': ('summary', "Latency of bulk publish requests."),
+    'publish_services_total': ('counter', "Support services handled by the publisher, by result."),
+    'jobs': ('gauge', "Jobs by status."),
+    'workspaces_removed_total': ('counter', "Run workspaces removed by the cleanup policy, by reason (age or size)."),
+    'process_start_time_seconds': ('gauge', "Start time of the process since the epoch in seconds."),
+    'app_startup_seconds': ('gauge', "Time taken to import and set up the web app, in seconds.")
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """
+    In-process registry of counters, gauges and summaries, exported in the Prometheus text format.
+
+    Metrics are identified by name and keyword labels. Values that belong to another component (such as
+    the number of queued jobs) can be read at export time through collectors.
+
+    Example:
+    >>> metrics = MetricsRegistry()
+    >>> metrics.inc('crawl_pages_total', result='fetched')
+    >>> with metrics.timer('pipeline_stage_seconds', stage='crawl'):
+    ...     crawl()
+    >>> print(metrics.render())
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """
+        Adds to a counter.
+
+        Parameters:
+        name (str): The metric name.
+        value (float, optional): The amount to add. Default is 1.
+        **labels: The metric labels.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """
+        Sets a gauge.
+
+        Parameters:
+        name (str): The metric name.
+        value (float): The current value.
+        **labels: The metric labels.
+        """
+        with self._lock:
+            self._values[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, **labels):
+        """
+        Records one observation of a summary, such as a duration in seconds.
+
+        Parameters:
+        name (str): The metric name.
+        value (float): The observed value.
+        **labels: The metric labels.
+        """
+        label_items = tuple(sorted(labels.items()))
+        with self._lock:
+            count_key = (f"{name}_count", label_items)
+            sum_key = (f"{name}_sum", label_items)
+            self._values[count_key] = self._values.get(count_key, 0) + 1
+            self._values[sum_key] = self._values.get(sum_key, 0) + value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Observes the wall time of the enclosed block, in seconds.
+
+        Parameters:
+        name (str): The summary name.
+        **labels: The metric labels.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def add_collector(self, collector):
+        """
+        Registers a function that returns (name, labels, value) samples at export time.
+
+        Parameters:
+        collector (callable): Called without arguments; returns an iterable of (name, labels dict, value).
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def samples(self):
+        """
+        Returns every current sample, including those of the collectors.
+
+        Returns:
+        list: A sorted list of (name, labels tuple, value) samples.
+        """
+        with self._lock:
+            values = dict(self._values)
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                for name, labels, value in collector():
+                    values[(name, tuple(sorted(labels.items())))] = value
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        return sorted((name, labels, value) for (name, labels), value in values.items())
+
+    def render(self):
+        """
+        Renders the metrics in the Prometheus text exposition format.
+
+        Returns:
+        str: The metrics text.
+        """
+        lines = []
+        described = set()
+        for name, labels, value in self.samples():
+            family = name
+            for suffix in ('_count', '_sum'):
+                if name.endswith(suffix) and name[:-len(suffix)] in METRIC_HELP:
+                    family = name[:-len(suffix)]
+            if family not in described and family in METRIC_HELP:
+                metric_type, help_text = METRIC_HELP[family]
+                lines.append(f"# HELP {family} {help_text}")
+                lines.append(f"# TYPE {family} {metric_type}")
+                described.add(family)
+            label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels)
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+# The process-wide registry exported by the /metrics endpoint
+METRICS = MetricsRegistry()
+METRICS.set('process_start_time_seconds', time.time())
@@ -0,0 +1,229 @@
+import os
+import json
+import uuid
+import sqlite3
+import hashlib
+import threading
+
+import requests
+
+from src.metrics import METRICS
+
+
+class PageStore:
+    """
+    Holds the HTML of pages fetched during a crawl so later stages can reuse it without refetching.
+
+    Pages are kept in memory for the lifetime of the store. When a cache directory is given, page bodies are
+    also written to a content-addressed layer on disk (one file per SHA-256 digest) together with an index of
+    each URL's digest, ETag and Last-Modified headers, kept in SQLite (index.sqlite3). `save_index` only writes
+    the entries this store changed, so stores in concurrent runs and processes can share one cache directory.
+    On later runs those validators are sent back as
+    If-None-Match / If-Modified-Since, so an unchanged page costs a single 304 round trip. When the sitemap
+    <lastmod> of a page is known and matches the one recorded on the last fetch, the page is served from disk
+    without any request.
+
+    Parameters:
+    cache_dir (str, optional): Directory for the on-disk layer. If None, the store is memory only.
+
+    Example:
+    >>> store = PageStore(cache_dir="uploads/page_cache")
+    >>> html = store.fetch(session, "https://example.com/tutoring")
+    >>> store.get("https://example.com/tutoring") == html
+    True
+    >>> store.save_index()
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self._pages = {}
+        self._index = {}
+        self._lock = threading.Lock()
+        # Per-store counters: pages downloaded, bytes downloaded, 304 responses and fetches skipped by <lastmod>
+        self.fetched = 0
+        self.bytes_downloaded = 0
+        self.not_modified = 0
+        self.skipped = 0
+        self._changed = set()
+        self._conn = None
+        if cache_dir:
+            os.makedirs(os.path.join(cache_dir, 'objects'), exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite3'), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT PRIMARY KEY, sha256 TEXT NOT NULL, etag TEXT, last_modified TEXT, lastmod TEXT)"
+            )
+            self._conn.commit()
+            rows = self._conn.execute("SELECT url, sha256, etag, last_modified, lastmod FROM pages").fetchall()
+            self._index = {url: {'sha256': sha256, 'etag': etag, 'last_modified': last_modified, 'lastmod': lastmod}
+                           for url, sha256, etag, last_modified, lastmod in rows}
+            if not self._index:
+                self._import_json_index()
+
+    def _import_json_index(self):
+        # Carries over the index.json written by earlier versions, once
+        index_path = os.path.join(self.cache_dir, 'index.json')
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._changed.update(self._index)
+        self.save_index()
+        os.replace(index_path, f"{index_path}.imported")
+
+    def _object_path(self, digest):
+        return os.path.join(self.cache_dir, 'objects', digest[:2], digest)
+
+    def _read_object(self, digest):
+        try:
+            with open(self._object_path(digest), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_object(self, html):
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def get(self, url):
+        """
+        Returns the stored HTML for a URL, or None if the page has not been fetched.
+
+        Pages not held in memory are read from the on-disk layer if it has them, e.g. pages fetched before a
+        resumed crawl was interrupted.
+
+        Parameters:
+        url (str): The URL to look up.
+
+        Returns:
+        str: The page HTML, or None.
+        """
+        with self._lock:
+            html = self._pages.get(url)
+            entry = self._index.get(url) if html is None else None
+        if entry is not None:
+            html = self._read_object(entry['sha256'])
+            if html is not None:
+                with self._lock:
+                    self._pages[url] = html
+        return html
+
+    def put(self, url, html, etag=None, last_modified=None, lastmod=None):
+        """
+        Stores the HTML for a URL in memory and, if enabled, in the on-disk layer.
+
+        Parameters:
+        url (str): The page URL.
+        html (str): The page HTML.
+        etag (str, optional): The ETag response header.
+        last_modified (str, optional): The Last-Modified response header.
+        lastmod (str, optional): The page's sitemap <lastmod> value.
+        """
+        digest = self._write_object(html) if self.cache_dir else None
+        with self._lock:
+            self._pages[url] = html
+            if digest:
+                self._index[url] = {'sha256': digest, 'etag': etag, 'last_modified': last_modified,
+                                    'lastmod': lastmod}
+                self._changed.add(url)
+
+    def fetch(self, session, url, timeout=10, lastmod=None):
+        """
+        Returns the HTML for a URL, fetching it only if it is not already held in memory.
+
+        If the on-disk layer knows the URL, the request is made conditional and a 304 response is served
+        from disk. If `lastmod` equals the <lastmod> recorded when the page was last fetched, the page is
+        served from disk without a request. Any non-200 response or request error returns None.
+
+        Parameters:
+        session (requests.Session): The session used for the request.
+        url (str): The URL to fetch.
+        timeout (int, optional): The request timeout in seconds. Default is 10.
+        lastmod (str, optional): The page's current sitemap <lastmod> value. Default is None.
+
+        Returns:
+        str: The page HTML, or None if the page could not be fetched.
+        """
+        # Only pages fetched by this store are served as they are; pages on disk are revalidated below
+        with self._lock:
+            html = self._pages.get(url)
+            entry = self._index.get(url)
+        if html is not None:
+            return html
+
+        headers = {}
+        if entry and lastmod and entry.get('lastmod') == lastmod:
+            html = self._read_object(entry['sha256'])
+            if html is not None:
+                with self._lock:
+                    self._pages[url] = html
+                    self.skipped += 1
+                METRICS.inc('crawl_pages_total', result='skipped')
+                return html
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            response = session.get(url, headers=headers, timeout=timeout)
+        except requests.RequestException:
+            METRICS.inc('crawl_pages_total', result='error')
+            return None
+
+        if response.status_code == 304 and entry:
+            html = self._read_object(entry['sha256'])
+            if html is not None:
+                with self._lock:
+                    self._pages[url] = html
+                    self.not_modified += 1
+                    if lastmod:
+                        self._index[url] = dict(entry, lastmod=lastmod)
+                        self._changed.add(url)
+                METRICS.inc('crawl_pages_total', result='not_modified')
+                return html
+            # The blob is gone; fetch the page unconditionally
+            try:
+                response = session.get(url, timeout=timeout)
+            except requests.RequestException:
+                METRICS.inc('crawl_pages_total', result='error')
+                return None
+
+        if response.status_code != 200:
+            METRICS.inc('crawl_pages_total', result='error')
+            return None
+
+        html = response.text
+        with self._lock:
+            self.fetched += 1
+            self.bytes_downloaded += len(response.content)
+        METRICS.inc('crawl_pages_total', result='fetched')
+        METRICS.inc('crawl_bytes_downloaded_total', len(response.content))
+        self.put(url, html, response.headers.get('ETag'), response.headers.get('Last-Modified'), lastmod)
+        return html
+
+    def save_index(self):
+        """
+        Writes the index entries changed by this store, so the next run can revalidate cached pages.
+        """
+        if self._conn is None:
+            return
+        with self._lock:
+            changed = [(url, *(self._index[url].get(key) for key in ('sha256', 'etag', 'last_modified', 'lastmod')))
+                       for url in self._changed]
+            self._changed = set()
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO pages (url, sha256, etag, last_modified, lastmod) VALUES (?, ?, ?, ?, ?)",
+                    changed
+                )
@@ -0,0 +1,285 @@
+import io
+import os
+import json
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from src.scraper import extract_subdomains, scrape_page
+from src.crawler import crawl_site, create_session
+from src.crawl_state import CrawlState
+from src.discovery import discover_site
+from src.page_store import PageStore
+from src.keyword_matcher import load_keyword_matcher
+from src.sinks import JsonlFileSink
+from src.extract import ContentExtractor
+from src.dedupe import ContentDeduplicator
+from src.relevance import DEFAULT_TOKEN_BUDGET, page_title, score_pages, select_pages
+from src.gemini_query import gemini_query_api, gemini_query_but
+from src.convert_csv import write_bulk_csv
+from src.publish import post_bulk_publish
+from src.publish_state import PublishState
+from src.validate import validate_records, validate_payload
+from src.artifacts import ArtifactWriter
+from src.chunking import PAGE_SEPARATOR, estimate_tokens
+from src.metrics import METRICS
+
+# Stages reported by run_pipeline, in order
+PIPELINE_STAGES = ['crawl', 'scrape', 'rank', 'dedupe', 'extract', 'publish']
+
+
+class PipelineCancelled(Exception):
+    """Raised when a pipeline run is cancelled before it finishes."""
+
+
+@contextmanager
+def _stage(name, progress, cancel_event, run_metrics):
+    if cancel_event is not None and cancel_event.is_set():
+        raise PipelineCancelled(f"Cancelled before the {name} stage.")
+    if progress:
+        progress(name, 'running')
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if progress:
+            progress(name, 'failed')
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        run_metrics['stage_seconds'][name] = round(seconds, 3)
+        METRICS.observe('pipeline_stage_seconds', seconds, stage=name)
+    if progress:
+        progress(name, 'done')
+
+
+def _publish(payload, domain, upload_folder, cache_folder, messages):
+    # Publishes new and changed services to the API, reports the outcome in messages and returns the summary
+    try:
+        state = PublishState(os.path.join(cache_folder, "publish_state.sqlite3"))
+        summary = post_bulk_publish(payload, log_path=os.path.join(upload_folder, "publish_log.jsonl"),
+                                    state=state, scope=domain)
+    except Exception as e:
+        messages.append(("error", f"Error publishing to API: {str(e)}"))
+        return None
+    if summary['unchanged']:
+        messages.append(("info", f"{summary['unchanged']} support services are unchanged since the last publish "
+                                 f"and were skipped."))
+    if summary['removed']:
+        names = ", ".join(str(service['name']) for service in summary['removed'])
+        messages.append(("warning", f"{len(summary['removed'])} previously published support services were not "
+                                    f"found on the site: {names}"))
+    if summary['failed']:
+        messages.append(("error", f"{summary['failed']} of {summary['services']} support services failed to "
+                                  f"publish. See publish_log.jsonl."))
+    if summary['published']:
+        messages.append(("success", f"{summary['published']} support services published to API successfully."))
+    return summary
+
+
+def _discover(start_urls, keywords, session):
+    # Reads robots.txt and sitemaps of each distinct host and returns the crawl_site discovery arguments
+    discovered = {'seed_urls': [], 'lastmods': {}, 'robots': {}, 'crawl_delays': {}}
+    hosts = set()
+    for url in start_urls:
+        host = urlparse(url).netloc
+        if host in hosts:
+            continue
+        hosts.add(host)
+        site = discover_site(url, keywords, session=session)
+        discovered['seed_urls'].extend(site['seeds'])
+        discovered['lastmods'].update(site['urls'])
+        if site['robots'] is not None:
+            discovered['robots'][host] = site['robots']
+        if site['crawl_delay']:
+            discovered['crawl_delays'][host] = site['crawl_delay']
+    return discovered
+
+
+def run_pipeline(domain, publish_method, keywords_file, upload_folder, progress=None, cancel_event=None,
+                 save_artifacts=True, use_sitemaps=True, token_budget=DEFAULT_TOKEN_BUDGET, cache_folder=None):
+    """
+    Runs the full crawl, scrape, rank, dedupe, extract and publish pipeline for one domain.
+
+    This is the work behind the `/scrape` endpoint. The domain and its subdomains are crawled for pages that
+    match the keywords (seeded with the sitemap pages whose URLs match them), and the main content of those
+    pages is scraped. Pages are ranked by relevance, text blocks repeated across pages are removed (keeping
+    them on the best ranked page), and the best pages that fit in the token budget are sent to Gemini, most
+    relevant first. Gemini extracts the support services, and the result is either published to the Registry
+    Assistant API or validated and converted to the Bulk Upload Template CSV.
+
+    Stages hand their results to the next stage in memory. The intermediate outputs (scraped_content.txt,
+    page_scores.json, deduplicated_content.txt, support_services_*.json and filtered_output.json) are only
+    written as artifacts in the background.
+
+    Everything a run writes goes to `upload_folder`, except the state shared between runs (the page cache,
+    crawl state and publish state), which goes to `cache_folder`. Runs with different upload folders can
+    therefore execute at the same time.
+
+    Parameters:
+    domain (str): The school domain, e.g. 'illinois.edu', or a start URL such as 'http://localhost:8000'.
+    publish_method (str): 'api' to publish through the API, or 'bulk' to prepare the bulk upload CSV.
+    keywords_file (str): Path to the keywords file.
+    upload_folder (str): Directory where the run's output files and artifacts are written.
+    progress (callable, optional): Called as progress(stage, status) when a stage starts ('running'),
+    finishes ('done') or fails ('failed'). Default is None.
+    cancel_event (threading.Event, optional): When set, the run stops at the next stage boundary. Default is None.
+    save_artifacts (bool, optional): Whether to write the intermediate outputs. Default is True.
+    use_sitemaps (bool, optional): Whether to seed the crawl from robots.txt and sitemaps. Default is True.
+    token_budget (int, optional): The maximum estimated tokens of scraped text sent to Gemini, or 0 for no limit.
+    Default is the EXTRACTION_TOKEN_BUDGET environment variable, or 100,000.
+    cache_folder (str, optional): Directory of the page cache, crawl state and publish state shared between runs.
+    Default is `upload_folder`.
+
+    Returns:
+    dict: A dict with 'ctdl_json' (the extracted JSON string or None), 'publish_method', 'messages', a list
+    of (category, message) tuples for the user, and 'metrics', the run's timing summary: 'stage_seconds'
+    per stage plus page, byte, parse time, duplicate, page selection, token, URL and publish counts.
+
+    Raises:
+    PipelineCancelled: If the run was cancelled.
+    """
+    messages = []
+    ctdl_json = None
+    run_metrics = {'stage_seconds': {}}
+    cache_folder = cache_folder or upload_folder
+    artifacts = ArtifactWriter(upload_folder, enabled=save_artifacts)
+    try:
+        with _stage('crawl', progress, cancel_event, run_metrics):
+            keywords = load_keyword_matcher(keywords_file)
+            LinkTree = domain if domain.startswith(('http://', 'https://')) else f"https://{domain}"
+            urls_to_scrape = extract_subdomains(LinkTree)
+            visited_links = set()
+            session = create_session()
+            discovered = _discover(urls_to_scrape, keywords, session) if use_sitemaps else {}
+            page_store = PageStore(cache_dir=os.path.join(cache_folder, 'page_cache'))
+            links_sink = JsonlFileSink(os.path.join(upload_folder, 'relevant_links.json'))
+            crawl_state = CrawlState(os.path.join(cache_folder, 'crawl_state.sqlite3'), crawl_id=domain)
+            try:
+                filtered_links_with_keywords = crawl_site(urls_to_scrape, keywords, visited=visited_links,
+                                                          session=session, page_store=page_store, sink=links_sink,
+                                                          cancel_event=cancel_event, state=crawl_state,
+                                                          **discovered)
+            finally:
+                crawl_state.close()
+            links_sink.close()
+            if page_store.skipped:
+                print(f"Skipped fetching {page_store.skipped} pages unchanged since the last run.")
+            run_metrics.update(pages_fetched=page_store.fetched, pages_not_modified=page_store.not_modified,
+                               pages_skipped=page_store.skipped, bytes_downloaded=page_store.bytes_downloaded,
+                               relevant_pages=len(filtered_links_with_keywords))
+            print("Relevant links and keywords saved to 'relevant_links.json'.")
+
+        with _stage('scrape', progress, cancel_event, run_metrics):
+            if not filtered_links_with_keywords:
+                messages.append(("error", "No links found with the specified keywords. Please check your input."))
+            extractor = ContentExtractor()
+            pages = []
+            for entry in filtered_links_with_keywords:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise PipelineCancelled("Cancelled during the scrape stage.")
+                scraped = io.StringIO()
+                stats = scrape_page(entry['url'], scraped, page_store=page_store, extractor=extractor)
+                if stats:
+                    print(f"Extracted {stats['bytes_out']} of {stats['bytes_in']} bytes from {stats['url']}")
+                    pages.append({'url': entry['url'], 'title': page_title(page_store.get(entry['url'])),
+                                  'text': scraped.getvalue().strip()})
+            print(f"Extracted {extractor.bytes_out} bytes of main content from {extractor.bytes_in} bytes of HTML "
+                  f"across {extractor.pages} pages.")
+            if filtered_links_with_keywords and not any(page['text'] for page in pages):
+                messages.append(("error", "No content could be extracted from the pages with the specified keywords."))
+            artifacts.write_text("scraped_content.txt", "".join(page['text'] + PAGE_SEPARATOR
+                                                                for page in pages if page['text']))
+            run_metrics.update(pages_scraped=extractor.pages, parse_seconds=round(extractor.parse_seconds, 3),
+                               text_bytes=extractor.bytes_out)
+
+        with _stage('rank', progress, cancel_event, run_metrics):
+            pages = score_pages(pages, keywords)
+            artifacts.write_json("page_scores.json", [{'url': page['url'], 'score': page['score'],
+                                                       'signals': page['signals']} for page in pages])
+
+        with _stage('dedupe', progress, cancel_event, run_metrics):
+            # Pages are deduplicated best first, so a shared block is kept on the most relevant page
+            deduplicator = ContentDeduplicator()
+            for page in pages:
+                page['text'] = deduplicator.dedupe(page['text'])[0].strip()
+            removed = deduplicator.bytes_in - deduplicator.bytes_out
+            if removed > 0:
+                share = removed / deduplicator.bytes_in
+                print(f"Removed {deduplicator.exact} duplicate and {deduplicator.near} near-duplicate blocks "
+                      f"of {deduplicator.blocks_in} ({removed} bytes, {share:.0%} of the text).")
+                messages.append(("info", f"Removed {deduplicator.exact + deduplicator.near} repeated text "
+                                         f"blocks ({share:.0%} of the scraped text) before extraction."))
+
+            selected, skipped = select_pages(pages, token_budget)
+            over_budget = [page for page in skipped if page['score'] > 0 and page['text']]
+            for result, count in (('selected', len(selected)), ('over_budget', len(over_budget)),
+                                  ('not_relevant', len(skipped) - len(over_budget))):
+                METRICS.inc('relevance_pages_total', count, result=result)
+            if over_budget:
+                print(f"Left out {len(over_budget)} lower-ranked pages ({sum(page['tokens'] for page in over_budget)} "
+                      f"tokens) to stay within the budget of {token_budget} tokens.")
+                messages.append(("info", f"The {len(selected)} most relevant pages were sent for extraction; "
+                                         f"{len(over_budget)} lower-ranked pages did not fit in the token budget."))
+            text = "".join(page['text'] + PAGE_SEPARATOR for page in selected)
+            artifacts.write_text("deduplicated_content.txt", text)
+            run_metrics.update(duplicate_blocks=deduplicator.exact, near_duplicate_blocks=deduplicator.near,
+                               deduplicated_bytes=deduplicator.bytes_out, pages_selected=len(selected),
+                               pages_over_budget=len(over_budget))
+
+        with _stage('extract', progress, cancel_event, run_metrics):
+            # Use different API calls based on publish method
+            if publish_method == 'api':
+                ctdl_json = gemini_query_api(text)
+            else:
+                ctdl_json = gemini_query_but(text)
+            run_metrics.update(prompt_tokens=estimate_tokens(text), response_tokens=estimate_tokens(ctdl_json or ''))
+
+        with _stage('publish', progress, cancel_event, run_metrics):
+            if publish_method == 'api':
+                if ctdl_json:
+                    try:
+                        payload = validate_payload(json.loads(ctdl_json)) # Catch bad records before publishing
+                    except ValueError as e:
+                        messages.append(("error", f"The extracted data is not a valid CTDL payload: {str(e)}"))
+                    else:
+                        ctdl_json = json.dumps(payload, indent=2)
+                        artifacts.write_json("support_services_api.json", payload)
+                        summary = _publish(payload, domain, upload_folder, cache_folder, messages)
+                        if summary:
+                            run_metrics.update(services_published=summary['published'],
+                                               services_failed=summary['failed'],
+                                               services_unchanged=summary['unchanged'])
+            else:  # bulk
+                if ctdl_json:
+                    try:
+                        records = json.loads(ctdl_json)
+                    except ValueError as e:
+                        messages.append(("error", f"The extracted data is not valid JSON: {str(e)}"))
+                    else:
+                        artifacts.write_json("support_services_but.json", records)
+                        filtered_records = validate_records(records) # Validate and filter records
+                        run_metrics.update(records_validated=len(records) if isinstance(records, list) else 1,
+                                           records_valid=len(filtered_records))
+                        artifacts.write_json("filtered_output.json", filtered_records)
+                        output_csv = os.path.join(upload_folder, "support_services_but.csv")
+                        write_bulk_csv(filtered_records, output_csv) # Convert records to CSV for bulk upload
+                        print("Bulk Upload Template has been created successfully!")
+                        messages.append(("success", "Support services prepared for bulk upload successfully."))
+    except PipelineCancelled:
+        METRICS.inc('pipeline_runs_total', publish_method=publish_method, result='cancelled')
+        raise
+    except Exception:
+        METRICS.inc('pipeline_runs_total', publish_method=publish_method, result='failed')
+        raise
+    finally:
+        artifacts.close()
+    METRICS.inc('pipeline_runs_total', publish_method=publish_method, result='succeeded')
+    print("Stage timings: " + ", ".join(f"{stage} {seconds:.1f}s"
+                                        for stage, seconds in run_metrics['stage_seconds'].items()))
+
+    # Without any text Gemini is not called, and the crawl or scrape stage has already said why
+    if not ctdl_json and text.strip():
+        messages.append(("error", "No data returned from the Gemini API. Please check your input."))
+
+    return {'ctdl_json': ctdl_json, 'publish_method': publish_method, 'messages': messages, 'metrics': run_metrics}
@@ -1,8 +1,16 @@
 import os
-import requests
+import time
 import json
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 from dotenv import load_dotenv
 
+from src.crawler import create_session
+from src.metrics import METRICS
+
 # Load environment variables from .env file
 load_dotenv()
 api_token = os.getenv('CE_API_TOKEN')
@@ -10,47 +18,180 @@ api_token = os.getenv('CE_API_TOKEN')
 # Get the base directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-def post_bulk_publish(payload):
+# Endpoint URL
+BULK_PUBLISH_URL = os.getenv('CE_BULK_PUBLISH_URL',
+                             "https://sandbox.credentialengine.org/assistant/SupportService/bulkpublish")
+
+DEFAULT_BATCH_SIZE = 25
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RETRIES = 3
+DEFAULT_TIMEOUT = 60
+
+# Statuses worth retrying; other 4xx responses mean the batch itself was rejected
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+_log_lock = threading.Lock()
+
+
+def _service_outcomes(services, status_code, body):
+    """
+    Works out the outcome of each service in a batch from the registry response.
+
+    The registry answers either with one result for the whole batch or with a list holding one result per
+    service. Results carry a 'Successful' flag and 'Messages'.
+    """
+    if isinstance(body, list) and len(body) == len(services):
+        results = body
+    else:
+        results = [body] * len(services)
+
+    outcomes = []
+    for service, result in zip(services, results):
+        successful = 200 <= (status_code or 0) < 300
+        messages = []
+        if isinstance(result, dict):
+            successful = successful and result.get('Successful', True) is not False
+            messages = result.get('Messages') or []
+        elif status_code is not None and not successful and result:
+            messages = [str(result)[:500]]
+        outcomes.append({
+            'name': service.get('Name'),
+            'ctid': service.get('CTID'),
+            'successful': successful,
+            'messages': messages
+        })
+    return outcomes
+
+
+def _append_log(log_path, entries):
+    os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+    with _log_lock, open(log_path, "a", encoding="utf-8") as log_file:
+        for entry in entries:
+            log_file.write(json.dumps(entry) + "\n")
+
+
+def post_bulk_publish(payload, batch_size=DEFAULT_BATCH_SIZE, max_workers=DEFAULT_MAX_WORKERS, retries=DEFAULT_RETRIES,
+                      timeout=DEFAULT_TIMEOUT, url=None, log_path=None, state=None, scope=None):
     """
-    Sends a POST request to the bulk publish endpoint with the given payload.
- 
+    Publishes support services to the bulk publish endpoint in concurrent batches.
+
+    The payload's SupportServices are split into batches of `batch_size`, and each batch is sent as its own bulk
+    publish request over a pooled session, `max_workers` at a time. Batches that fail with a transient error
+    (a timeout, a connection error, 429 or 5xx) are retried with jittered exponential backoff; the other batches
+    are not sent again. Every service's outcome is appended to the publish log, one JSON line per service, so a
+    single bad service or batch no longer fails or hides the whole publish.
+
+    With a `state`, only services that are new or changed since the last publish are sent (see
+    `PublishState.diff`), and the services published successfully are recorded for the next run. Services
+    that disappeared from the payload are returned in 'removed' once and then marked as reported.
+
     Args:
-        payload (dict): The JSON payload to be sent in the POST request.
- 
+        payload (str or dict): The CTDL bulk publish payload, as a JSON string or an already parsed dict.
+        batch_size (int, optional): The number of services per request. Default is 25.
+        max_workers (int, optional): The number of requests sent at once. Default is 4.
+        retries (int, optional): The total number of attempts per batch. Default is 3.
+        timeout (int, optional): The request timeout in seconds. Default is 60.
+        url (str, optional): The bulk publish endpoint. Default is the CE_BULK_PUBLISH_URL environment variable
+            or the sandbox endpoint.
+        log_path (str, optional): The append-only publish log. Default is 'uploads/publish_log.jsonl'.
+        state (PublishState, optional): The publish state used to skip unchanged services. Default is None.
+        scope (str, optional): The scope of the services in the publish state, e.g. the domain. Default is None.
+
     Returns:
-        Response object: The HTTP response object from the server.
+        dict: A summary with 'services', 'published', 'failed', 'batches', 'failed_batches', 'outcomes'
+        (the per-service outcome dicts), 'unchanged' (the number of services skipped) and 'removed' (services
+        published before but missing from the payload).
     """
-    # Endpoint URL
-    url = "https://sandbox.credentialengine.org/assistant/SupportService/bulkpublish"
- 
+    if isinstance(payload, str):
+        payload = json.loads(payload)
+    url = url or BULK_PUBLISH_URL
+    log_path = log_path or os.path.join(BASE_DIR, 'uploads', 'publish_log.jsonl')
+
+    delta = None
+    if state is not None:
+        delta = state.diff(payload, scope=scope)
+        payload = delta['payload']
+        print(f"Publishing {len(delta['new'])} new and {len(delta['changed'])} changed services; "
+              f"{len(delta['unchanged'])} unchanged, {len(delta['removed'])} removed.")
+
     # Headers
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"APIToken {api_token}",
         "PublishForOrganizationIdentifier": "ce-3508747f-4ca5-412f-bd38-6b0fb2d1132c"
     }
- 
-    try:
-        # Make the POST request
-        print(f"{payload}")
-        response = requests.post(url, headers=headers, json=json.loads(payload))
- 
-        # Check response status
-        if response.status_code == 200:
-            print("Request successful!")
-            if not os.path.exists(os.path.join(BASE_DIR, 'uploads')):
-                os.makedirs(os.path.join(BASE_DIR, 'uploads'))
-            
-            # Save the publish log to a file
-            publish_log_path = os.path.join(BASE_DIR, 'uploads', 'publish_log.json')
-            with open(publish_log_path, "w") as json_file:
-                json.dump(response.json(), json_file, indent=2)
-        else:
-            print(f"Request failed with status code {response.status_code}")
-            print("Response:", response.text)
- 
-        return response
- 
-    except Exception as e:
-        print("An error occurred:", e)
-        return None
\ No newline at end of file
+
+    services = payload.get("SupportServices") or []
+    envelope = {key: value for key, value in payload.items() if key != "SupportServices"}
+    batches = [services[i:i + batch_size] for i in range(0, len(services), max(batch_size, 1))]
+    session = create_session(max_workers, max_workers)
+    run_id = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    def send(index):
+        # Returns (index, status_code, body, retryable)
+        started = time.perf_counter()
+        try:
+            response = session.post(url, headers=headers, json=dict(envelope, SupportServices=batches[index]),
+                                    timeout=timeout)
+        except requests.RequestException as e:
+            METRICS.inc('publish_requests_total', status='error')
+            return index, None, str(e), True
+        finally:
+            METRICS.observe('publish_request_seconds', time.perf_counter() - started)
+        METRICS.inc('publish_requests_total', status=str(response.status_code))
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+        retryable = response.status_code in RETRYABLE_STATUSES
+        return index, response.status_code, body, retryable
+
+    results = {}
+    pending = list(range(len(batches)))
+    for attempt in range(retries):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for index, status_code, body, retryable in executor.map(send, pending):
+                results[index] = (status_code, body, attempt + 1)
+                if not retryable:
+                    pending.remove(index)
+        if not pending or attempt == retries - 1:
+            break
+        delay = random.uniform(0, 2 ** attempt)
+        print(f"Retrying {len(pending)} failed batches in {delay:.1f} seconds...")
+        time.sleep(delay)
+
+    outcomes = []
+    failed_batches = 0
+    for index, batch in enumerate(batches):
+        status_code, body, attempts = results[index]
+        batch_outcomes = _service_outcomes(batch, status_code, body)
+        if not all(outcome['successful'] for outcome in batch_outcomes):
+            failed_batches += 1
+            print(f"Batch {index + 1}/{len(batches)} failed with status {status_code}")
+        for outcome in batch_outcomes:
+            outcome.update({'run': run_id, 'batch': index, 'status_code': status_code, 'attempts': attempts})
+        outcomes.extend(batch_outcomes)
+
+    # Save the publish log
+    _append_log(log_path, outcomes)
+    if state is not None:
+        state.record([service for service, outcome in zip(services, outcomes) if outcome['successful']],
+                     payload.get("PublishForOrganizationIdentifier"), scope=scope)
+        state.mark_removed([service['key'] for service in delta['removed']])
+
+    published = sum(1 for outcome in outcomes if outcome['successful'])
+    METRICS.inc('publish_services_total', published, result='published')
+    METRICS.inc('publish_services_total', len(services) - published, result='failed')
+    if delta:
+        METRICS.inc('publish_services_total', len(delta['unchanged']), result='unchanged')
+    print(f"Published {published} of {len(services)} services in {len(batches)} batches.")
+    return {
+        'services': len(services),
+        'published': published,
+        'failed': len(services) - published,
+        'batches': len(batches),
+        'failed_batches': failed_batches,
+        'outcomes': outcomes,
+        'unchanged': len(delta['unchanged']) if delta else 0,
+        'removed': delta['removed'] if delta else []
+    }
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_STATE_PATH = os.path.join(BASE_DIR, 'uploads', 'publish_state.sqlite3')
+
+# Fields left out of the content hash. Gemini generates a fresh CTID on every run and rewords the free-text
+# Description, so hashing them would make every service look changed.
+VOLATILE_FIELDS = ('CTID', 'Description')
+
+
+def _normalize(value):
+    return ' '.join(str(value or '').split()).casefold()
+
+
+def service_key(service, org_id):
+    """
+    Builds the stable identity of a service from its organization, name and subject webpage.
+
+    Parameters:
+    service (dict): A CTDL support service.
+    org_id (str): The PublishForOrganizationIdentifier of the payload.
+
+    Returns:
+    str: A SHA-256 hex digest identifying the service.
+    """
+    webpage = _normalize(service.get('SubjectWebpage')).rstrip('/')
+    parts = (_normalize(org_id), _normalize(service.get('Name')), webpage)
+    return hashlib.sha256('\x00'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _canonical(value):
+    # Lists are compared as sets, since the model does not keep the order of types or locations between runs
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items()}
+    if isinstance(value, list):
+        items = [_canonical(item) for item in value]
+        return sorted(items, key=lambda item: json.dumps(item, sort_keys=True, ensure_ascii=False))
+    return value
+
+
+def content_hash(service):
+    """
+    Hashes the structured content of a service, independent of key order, list order and volatile fields.
+
+    Only the structured fields (name, webpage, types, locations and so on) are hashed. A service whose
+    description alone was reworded counts as unchanged and is not published again.
+
+    Parameters:
+    service (dict): A CTDL support service.
+
+    Returns:
+    str: A SHA-256 hex digest of the service content.
+    """
+    content = {field: _canonical(value) for field, value in service.items() if field not in VOLATILE_FIELDS}
+    encoded = json.dumps(content, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class PublishState:
+    """
+    Remembers what was last published for each service, so unchanged services are not published again.
+
+    Each service is keyed by organization, name and subject webpage, and stored with the hash of its
+    content, its CTID and the scope (usually the domain) it was extracted from. `diff` splits a new payload
+    into services to publish and services to skip; `record` stores the services that were published, and
+    `mark_removed` the removals that were reported, so each removal is reported only once.
+
+    Parameters:
+    path (str, optional): Path of the SQLite database. Default is 'uploads/publish_state.sqlite3'.
+
+    Example:
+    >>> state = PublishState()
+    >>> delta = state.diff(payload, scope="illinois.edu")
+    >>> len(delta['payload']['SupportServices']), len(delta['unchanged']), len(delta['removed'])
+    (2, 40, 1)
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS services ("
+            "key TEXT PRIMARY KEY, scope TEXT, org_id TEXT, name TEXT, webpage TEXT, ctid TEXT, "
+            "content_hash TEXT NOT NULL, published_at REAL NOT NULL, removed_at REAL)"
+        )
+        try:
+            self._conn.execute("ALTER TABLE services ADD COLUMN removed_at REAL")
+        except sqlite3.OperationalError:
+            pass  # Already there; databases created before removals were tracked lack it
+        self._conn.execute("CREATE INDEX IF NOT EXISTS services_scope ON services (scope, org_id)")
+        self._conn.commit()
+
+    def diff(self, payload, scope=None):
+        """
+        Compares a payload with the last published state.
+
+        New and changed services are kept in the returned payload; changed services get the CTID they were
+        published with, so the registry updates them instead of creating duplicates. Services published
+        before for the same scope and organization but missing from the payload are reported as removed, unless
+        they were already reported (see `mark_removed`).
+
+        Parameters:
+        payload (dict): The CTDL payload with a 'SupportServices' list.
+        scope (str, optional): The scope removals are detected in, e.g. the domain. Default is None.
+
+        Returns:
+        dict: A dict with 'payload' (the payload with only new and changed services), 'new', 'changed' and
+        'unchanged' (lists of service names), and 'removed' (dicts with 'key', 'name', 'webpage' and 'ctid').
+        """
+        org_id = payload.get('PublishForOrganizationIdentifier')
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, name, webpage, ctid, content_hash, removed_at FROM services "
+                "WHERE scope IS ? AND org_id IS ?",
+                (scope, org_id)
+            ).fetchall()
+        previous = {row[0]: row for row in rows}
+
+        services = []
+        new, changed, unchanged = [], [], []
+        seen = set()
+        for service in payload.get('SupportServices') or []:
+            key = service_key(service, org_id)
+            seen.add(key)
+            row = previous.get(key)
+            if row is None:
+                new.append(service.get('Name'))
+                services.append(service)
+            elif row[4] != content_hash(service):
+                changed.append(service.get('Name'))
+                services.append(dict(service, CTID=row[3]) if row[3] else service)
+            else:
+                unchanged.append(service.get('Name'))
+
+        removed = [{'key': key, 'name': row[1], 'webpage': row[2], 'ctid': row[3]}
+                   for key, row in previous.items() if key not in seen and row[5] is None]
+        delta = dict(payload)
+        delta['SupportServices'] = services
+        return {'payload': delta, 'new': new, 'changed': changed, 'unchanged': unchanged, 'removed': removed}
+
+    def record(self, services, org_id, scope=None):
+        """
+        Stores the published content of services.
+
+        Parameters:
+        services (list): The CTDL support services that were published successfully.
+        org_id (str): The PublishForOrganizationIdentifier of the payload.
+        scope (str, optional): The scope the services belong to, e.g. the domain. Default is None.
+        """
+        now = time.time()
+        rows = [(service_key(service, org_id), scope, org_id, service.get('Name'), service.get('SubjectWebpage'),
+                 service.get('CTID'), content_hash(service), now) for service in services]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO services (key, scope, org_id, name, webpage, ctid, content_hash, published_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def mark_removed(self, keys):
+        """
+        Marks services as removed once their removal was reported, so later diffs do not report them again.
+
+        The services are kept, so one that reappears is matched to the CTID it was published with. Recording
+        it again clears the mark.
+
+        Parameters:
+        keys (list): The 'key' values of the removed services returned by `diff`.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany("UPDATE services SET removed_at = ? WHERE key = ?", [(now, key) for key in keys])
+            self._conn.commit()
+
+    def forget(self, scope=None):
+        """
+        Removes the stored state of a scope, so its next publish sends every service.
+
+        Parameters:
+        scope (str, optional): The scope to forget. Default is None.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM services WHERE scope IS ?", (scope,))
+            self._conn.commit()
@@ -0,0 +1,117 @@
+import os
+import re
+import math
+
+from src.chunking import estimate_tokens
+from src.discovery import url_text
+
+# Token budget of the scraped text sent to Gemini, across all chunks. 0 means no limit.
+DEFAULT_TOKEN_BUDGET = int(os.getenv('EXTRACTION_TOKEN_BUDGET', '100000'))
+
+# Weights of the relevance signals, each normalized to 0..1 across the site's pages before weighting
+SIGNAL_WEIGHTS = {
+    'tfidf': 0.5,    # Keyword frequency, discounted for keywords that occur on most of the site's pages
+    'density': 0.2,  # Keyword hits per 100 words
+    'url': 0.15,     # Keywords in the URL path
+    'title': 0.15    # Keywords in the <title> or first heading
+}
+
+_TITLE = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+_WORD = re.compile(r'\w+')
+
+
+def page_title(html):
+    """
+    Returns the text of the <title> tag of a page.
+
+    Parameters:
+    html (str): The page HTML.
+
+    Returns:
+    str: The title, or '' if the page has none.
+    """
+    found = _TITLE.search(html or '')
+    return ' '.join(found.group(1).split()) if found else ''
+
+
+def _normalize(values):
+    top = max(values, default=0)
+    return [value / top if top else 0.0 for value in values]
+
+
+def score_pages(pages, keywords, weights=SIGNAL_WEIGHTS):
+    """
+    Scores scraped pages by how much support service content they hold and sorts them best first.
+
+    Four signals are combined:
+    - tfidf: the keyword hits of the page text, each weighted by the keyword's inverse document frequency across
+      the given pages, so a keyword that appears on almost every page (e.g. in a repeated sidebar) counts little.
+    - density: the keyword hits per 100 words, so a page dedicated to a service beats a long page that
+      mentions it once.
+    - url: the number of distinct keywords in the URL path.
+    - title: the number of distinct keywords in the page title and first line of text.
+    Each signal is divided by its maximum over the pages and the weighted sum is the page's score, from 0 to 1.
+    Pages whose text has no keyword get a text score of 0 and only score on their URL and title.
+
+    Parameters:
+    pages (list): Dicts with 'url', 'title' and 'text'. 'score' and the raw 'signals' are added to each.
+    keywords (KeywordMatcher): The compiled keyword matcher.
+    weights (dict, optional): The weight of each signal. Default is SIGNAL_WEIGHTS.
+
+    Returns:
+    list: The pages, sorted by descending score (ties keep the crawl order).
+
+    Example:
+    >>> ranked = score_pages([{'url': url, 'title': title, 'text': text}, ...], load_keyword_matcher(KEYWORDS_FILE))
+    >>> ranked[0]['url'], ranked[0]['score']
+    ('https://illinois.edu/tutoring-center/', 0.93)
+    """
+    hits = [keywords.count(page['text']) for page in pages]
+    document_frequency = {}
+    for page_hits in hits:
+        for keyword in page_hits:
+            document_frequency[keyword] = document_frequency.get(keyword, 0) + 1
+    idf = {keyword: math.log((len(pages) + 1) / (count + 1)) + 1 for keyword, count in document_frequency.items()}
+
+    raw = {'tfidf': [], 'density': [], 'url': [], 'title': []}
+    for page, page_hits in zip(pages, hits):
+        words = max(len(_WORD.findall(page['text'])), 1)
+        first_line = page['text'].split('\n', 1)[0]
+        raw['tfidf'].append(sum(count / words * idf[keyword] for keyword, count in page_hits.items()))
+        raw['density'].append(sum(page_hits.values()) / words * 100)
+        raw['url'].append(len(keywords.match(url_text(page['url']))))
+        raw['title'].append(len(keywords.match(f"{page.get('title', '')}\n{first_line}")))
+    normalized = {signal: _normalize(values) for signal, values in raw.items()}
+
+    for index, page in enumerate(pages):
+        page['signals'] = {signal: round(values[index], 4) for signal, values in raw.items()}
+        page['score'] = round(sum(weights[signal] * normalized[signal][index] for signal in weights), 4)
+    return sorted(pages, key=lambda page: -page['score'])
+
+
+def select_pages(pages, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Picks the best scored pages whose text fits within a token budget.
+
+    Pages are taken in order; a page that does not fit in the remaining budget is skipped, so a smaller page
+    further down can still use the rest. Pages with a score of 0 or no text are never selected. The budget is
+    counted on each page's current 'text', so pages can be deduplicated between scoring and selection.
+
+    Parameters:
+    pages (list): Pages from `score_pages`, best first. 'tokens' is added to each.
+    token_budget (int, optional): The maximum total tokens of the selected pages, or 0 for no limit.
+    Default is the EXTRACTION_TOKEN_BUDGET environment variable, or 100,000.
+
+    Returns:
+    tuple: (selected, skipped) lists of pages, both in score order.
+    """
+    selected, skipped = [], []
+    used = 0
+    for page in pages:
+        page['tokens'] = estimate_tokens(page['text']) if page['text'] else 0
+        if page['score'] <= 0 or not page['text'] or (token_budget and used + page['tokens'] > token_budget):
+            skipped.append(page)
+            continue
+        selected.append(page)
+        used += page['tokens']
+    return selected, skipped
@@ -0,0 +1,155 @@
+import re
+from types import MappingProxyType
+
+# Credential Engine SupportServiceType concepts (support:...)
+SUPPORT_SERVICE_TYPES = frozenset([
+    'AcademicAdvising', 'AssistiveTechnologySupport', 'AudiologicalHealthCare',
+    'BehavioralService', 'BenefitsSupport', 'CareerAdvising', 'CareerAssessment',
+    'CareerExploration', 'CaseManagement', 'ChildcareSupport', 'ClothingAssistance', 'ComputerHub',
+    'Counseling', 'CrisisSupport', 'DiversityEquityInclusion', 'EquipmentProvision', 'FinancialLiteracy',
+    'HealthCare', 'ImmigrationAssistance', 'InternetAccess', 'JobPlacement', 'LearningResourceProvision',
+    'LegalService', 'MentalHealthCounseling', 'Mentoring', 'Networking', 'NeurodivergenceService',
+    'NoteTakingAssistance', 'PeerService', 'PersonalAssistance', 'PostalAddress', 'PsychologicalService',
+    'PublicBenefitsCaseManagement', 'ReaderService', 'Rehabilitation', 'ResidentialLiving', 'RespiteCare',
+    'SignLanguage', 'SkillMapping', 'StudySkills', 'SubstanceAbusePrevention', 'SupportCoordination',
+    'SupportedWork', 'TalentMarketplaceSignaling', 'TechnologyLending', 'TestAssistance', 'Translation',
+    'Transportation', 'Tutoring', 'VisionService'
+])
+
+# Credential Engine AccommodationType concepts (accommodation:...)
+ACCOMMODATION_TYPES = frozenset([
+    'PhysicalAccessibility', 'AccessibleHousing', 'AccessibleParking', 'AccessibleRestroom',
+    'AdjustableLighting', 'AdjustableWorkstations', 'AlternativeFormats', 'AssistiveTechnology',
+    'AudioCaptioning', 'CaptioningAndTranscripts', 'ClearSignage', 'ColorBlindness',
+    'Communication', 'DietaryAccommodation', 'FacilityAccommodation', 'FlexibleSchedule',
+    'HearingLoops', 'MultipleLanguage', 'PlainLanguage',
+    'ResourceAndServiceAccommodation', 'ScreenReader', 'Sensory', 'ServiceAnimal',
+    'TactileSignage'
+])
+
+# Enumerated fields: field name -> (concept scheme prefix, case-insensitive lookup of allowed concepts)
+ENUMERATIONS = MappingProxyType({
+    'SupportServiceType': ('support', MappingProxyType({value.lower(): value for value in SUPPORT_SERVICE_TYPES})),
+    'AccommodationType': ('accommodation', MappingProxyType({value.lower(): value for value in ACCOMMODATION_TYPES}))
+})
+
+# Fields every record must have, per shape
+BULK_REQUIRED_FIELDS = ('ResourceName', 'SubjectWebpage')
+CTDL_REQUIRED_FIELDS = ('Name', 'Description')
+
+_PREFIX = re.compile(r'^\s*(support|accommodation)\s*:\s*', re.IGNORECASE)
+_SEPARATOR = re.compile(r'\s*\|\s*')
+
+
+def _normalize_concepts(values, field):
+    # Returns the allowed concept names in `values`, without scheme prefixes and in canonical case
+    prefix, lookup = ENUMERATIONS[field]
+    concepts = []
+    for value in values:
+        if not isinstance(value, str):
+            continue
+        match = _PREFIX.match(value)
+        if match and match.group(1).lower() != prefix:
+            continue  # A concept from the other scheme; the two are mutually exclusive
+        concept = lookup.get(_PREFIX.sub('', value).strip().replace(' ', '').lower())
+        if concept and concept not in concepts:
+            concepts.append(concept)
+    return concepts
+
+
+def _missing_fields(record, required_fields):
+    return [field for field in required_fields if not str(record.get(field) or '').strip()]
+
+
+def _single_string(value):
+    # A one-item list (a model sometimes wraps the webpage in one) is unwrapped; other non-strings give None
+    if isinstance(value, list) and len(value) == 1:
+        value = value[0]
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def validate_bulk_records(records):
+    """
+    Validates and normalizes Bulk Upload Template records in one pass.
+
+    Pipe-separated SupportServiceType and AccommodationType values are reduced to the allowed concepts, with
+    any 'support:'/'accommodation:' prefixes removed and casing fixed (e.g. 'support:tutoring' becomes
+    'Tutoring'). A SubjectWebpage given as a one-item list is unwrapped. Records missing a required field, or
+    whose SubjectWebpage is not a single URL string, are rejected.
+
+    Parameters:
+    records (list or dict): The bulk upload records.
+
+    Returns:
+    tuple: (valid, rejected), where valid is the list of normalized records and rejected is a list of
+    (record, reason) tuples.
+    """
+    if isinstance(records, dict):
+        records = [records]
+    valid = []
+    rejected = []
+    for record in records:
+        if not isinstance(record, dict):
+            rejected.append((record, 'Not an object'))
+            continue
+        missing = _missing_fields(record, BULK_REQUIRED_FIELDS)
+        if missing:
+            rejected.append((record, f"Missing {', '.join(missing)}"))
+            continue
+        webpage = _single_string(record['SubjectWebpage'])
+        if webpage is None:
+            rejected.append((record, 'SubjectWebpage is not a single URL'))
+            continue
+        new_record = record.copy()
+        new_record['SubjectWebpage'] = webpage
+        for field in ENUMERATIONS:
+            value = new_record.get(field)
+            if isinstance(value, str):
+                new_record[field] = ' | '.join(_normalize_concepts(_SEPARATOR.split(value), field))
+            elif isinstance(value, list):
+                new_record[field] = ' | '.join(_normalize_concepts(value, field))
+        valid.append(new_record)
+    return valid, rejected
+
+
+def validate_ctdl_payload(payload):
+    """
+    Validates and normalizes a CTDL bulk publish payload in one pass over its SupportServices.
+
+    SupportServiceType and AccommodationType lists are reduced to the allowed concepts and written with their
+    scheme prefix ('support:Tutoring', 'accommodation:ScreenReader'). Values from the wrong scheme are dropped.
+    Services missing a required field are rejected and removed from the payload.
+
+    Parameters:
+    payload (dict): The CTDL payload with a 'SupportServices' list.
+
+    Returns:
+    tuple: (payload, rejected), where payload is a normalized copy and rejected is a list of (service, reason) tuples.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("The CTDL payload must be a JSON object with a 'SupportServices' list.")
+    services = []
+    rejected = []
+    for service in payload.get('SupportServices') or []:
+        if not isinstance(service, dict):
+            rejected.append((service, 'Not an object'))
+            continue
+        missing = _missing_fields(service, CTDL_REQUIRED_FIELDS)
+        if missing:
+            rejected.append((service, f"Missing {', '.join(missing)}"))
+            continue
+        new_service = service.copy()
+        for field, (prefix, _) in ENUMERATIONS.items():
+            value = new_service.get(field)
+            if value is None:
+                continue
+            values = _SEPARATOR.split(value) if isinstance(value, str) else value
+            concepts = _normalize_concepts(values, field)
+            if concepts:
+                new_service[field] = [f"{prefix}:{concept}" for concept in concepts]
+            else:
+                del new_service[field]
+        services.append(new_service)
+    normalized = dict(payload)
+    normalized['SupportServices'] = services
+    return normalized, rejected
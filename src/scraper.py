@@ -1,14 +1,40 @@
 import os
 import requests
-import json
+import threading
+from pathlib import Path
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import pandas as pd
-import tldextract
+from urllib.parse import urljoin
+from src.extract import ContentExtractor
 
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Public Suffix List snapshot shipped with the app, so subdomain extraction never downloads the list
+PUBLIC_SUFFIX_LIST = os.path.join(BASE_DIR, 'config', 'public_suffix_list.dat')
+
+_suffix_extractor = None
+_suffix_extractor_lock = threading.Lock()
+
+
+def _get_suffix_extractor():
+    """
+    Returns the process-wide tldextract extractor, importing tldextract and reading the suffix list on first use.
+
+    The list is read from `config/public_suffix_list.dat`, or from the snapshot bundled with tldextract if that
+    file is missing. It is never fetched over the network and nothing is written to tldextract's disk cache.
+
+    Returns:
+    tldextract.TLDExtract: The extractor.
+    """
+    global _suffix_extractor
+    with _suffix_extractor_lock:
+        if _suffix_extractor is None:
+            import tldextract
+            suffix_list_urls = (Path(PUBLIC_SUFFIX_LIST).as_uri(),) if os.path.exists(PUBLIC_SUFFIX_LIST) else ()
+            _suffix_extractor = tldextract.TLDExtract(cache_dir=None, suffix_list_urls=suffix_list_urls,
+                                                      fallback_to_snapshot=True)
+    return _suffix_extractor
+
 # Function to get all links containing the user input domain from a given URL
 """def get_links_containing_domain(url, domain_string):
     
@@ -82,7 +108,8 @@ def extract_subdomains(url):
     """
     Extracts subdomains from a given URL.
 
-    This function uses the tldextract library to parse the given URL and extract the domain and subdomains.
+    This function uses the tldextract library, with the bundled Public Suffix List snapshot, to parse the given
+    URL and extract the domain and subdomains.
     It constructs a list of subdomains in the format "sub.domain.suffix" and returns the original URL
     along with the constructed subdomain URLs.
 
@@ -98,112 +125,49 @@ def extract_subdomains(url):
     >>> print(subdomains)
     ['https://sub.example.com', 'https://sub.example.com']
     """
-    ext = tldextract.extract(url)
+    ext = _get_suffix_extractor()(url)
     domain = f"{ext.domain}.{ext.suffix}"  # e.g., "example.com"
     subdomains = [f"{sub}.{domain}" for sub in ext.subdomain.split('.')] if ext.subdomain else []
     return [url] + [f"https://{sub}" for sub in subdomains]
 
-def crawl_and_filter_content(url, keywords, max_depth=2, visited=None, links_with_keywords=None):
-    """
-    Recursively crawls a website and filters content based on specified keywords.
-
-    This function sends a GET request to the specified URL, parses the HTML content, and searches for the specified keywords. If any keywords are found, the URL and matched keywords are saved. The function then recursively crawls linked pages up to a specified depth, filtering content based on the same keywords.
-
-    Parameters:
-    url (str): The URL to start crawling from.
-    keywords (list): A list of keywords to search for in the page content.
-    max_depth (int, optional): The maximum depth to crawl. Default is 2.
-    visited (set, optional): A set of URLs that have already been visited. Default is None.
-    links_with_keywords (list, optional): A list to store URLs and matched keywords. Default is None.
-
-    Returns:
-    list: A list of dictionaries containing URLs and matched keywords.
-
-    Raises:
-    requests.RequestException: If an error occurs while making the GET request.
-
-    Example:
-    >>> url = "https://example.com"
-    >>> keywords = ["support", "service"]
-    >>> results = crawl_and_filter_content(url, keywords)
-    >>> print(results)
-    [{'url': 'https://example.com/page1', 'matched_keywords': ['support']}, {'url': 'https://example.com/page2', 'matched_keywords': ['service']}]
-    """
-    
-    if visited is None and not isinstance(visited, set):
-        visited = set()
-    if links_with_keywords is None:
-        links_with_keywords = []
-    if url in visited or max_depth == 0:
-        return links_with_keywords
-    visited.add(url)
-    try:
-        response = requests.get(url)
-        if response.status_code != 200:
-            return links_with_keywords
-    except requests.RequestException:
-        return links_with_keywords
-
-    soup = BeautifulSoup(response.text, 'html.parser')
-    page_text = soup.get_text().lower()
-    matched_keywords = [keyword for keyword in keywords if keyword and keyword.lower() in page_text]
-    if matched_keywords:
-        
-        links_with_keywords.append({
-            'url': url,
-            'matched_keywords': matched_keywords
-        })
-        save_relevant_links_to_json(links_with_keywords)
-    #print("Relevant links and keywords saved to 'relevant_links.json'.")
-    
-    for link in soup.find_all('a', href=True):
-        href = urljoin(url, link['href'])
-        parsed_href = urlparse(href)
-        if parsed_href.netloc.endswith(urlparse(url).netloc) and href not in visited:
-            links_with_keywords = crawl_and_filter_content(href, keywords, max_depth - 1, visited, links_with_keywords)
-    
-    return links_with_keywords
-
 # Function to scrape content from URLs
-def scrape_page(url, file):
+def scrape_page(url, file, page_store=None, extractor=None):
     """
-    Scrapes the content from a given URL and writes it to a file.
+    Scrapes the main content from a given URL and writes it to a file.
 
-    This function sends a GET request to the specified URL, parses the HTML content,
-    extracts the text, and writes it to the provided file. The text content is separated by spaces
-    and stripped of leading and trailing whitespace.
+    This function reads the page HTML from the page store filled by the crawl, or sends a GET request
+    to the specified URL if the page is not stored. The main content is extracted with a `ContentExtractor`,
+    which drops navigation, headers, footers, scripts, cookie banners and repeated site chrome, and is written
+    to the provided file with one text block per line. Pages are separated by a blank line.
 
     Parameters:
     url (str): The URL to scrape content from.
     file (file object): The file object to write the scraped content to.
+    page_store (PageStore, optional): The store holding pages fetched during the crawl. Default is None.
+    extractor (ContentExtractor, optional): The extractor shared by all pages of the site. Default is None.
+
+    Returns:
+    dict: Extraction stats for the page ('url', 'bytes_in', 'bytes_out'), or None if scraping failed.
 
     Raises:
     requests.RequestException: If an error occurs while making the GET request.
     Exception: If an error occurs while parsing the HTML content or writing to the file.
     """
+    if extractor is None:
+        extractor = ContentExtractor()
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        page_text = soup.get_text(separator=' ', strip=True)
-        file.write(page_text + "\n\n")
+        html = page_store.get(url) if page_store is not None else None
+        if html is None:
+            response = requests.get(url, timeout=10)
+            response.raise_for_status()
+            html = response.text
+        page_text, stats = extractor.extract(html, url=url)
+        if page_text:
+            file.write(page_text + "\n\n")
+        return stats
     except Exception as e:
         print(f"Error scraping {url}: {e}")
-
-# Save the relevant links and keywords to a JSON file
-def save_relevant_links_to_json(data):
-    """
-    Saves the relevant links and keywords to a JSON file.
-
-    This function takes a list of dictionaries containing URLs and matched keywords, and saves it to a JSON file named 'relevant_links.json' in the 'uploads' directory. The JSON data is formatted with an indentation of 2 spaces for readability.
-
-    Parameters:
-    data (list): A list of dictionaries containing URLs and matched keywords.
-    """
-    with open(os.path.join(BASE_DIR, 'uploads/relevant_links.json'), "w") as json_file:
-        json.dump(data, json_file, indent=2)
-    #print(f"Relevant links and keywords saved to 'relevant_links.json'.")
-
+        return None
 
 """# Save the links to an Excel file
 def save_links_to_excel(links, filepath):
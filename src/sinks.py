@@ -0,0 +1,128 @@
+import os
+import json
+import queue
+
+
+class JsonlFileSink:
+    """
+    Streams crawl results to disk as JSON Lines and writes the final JSON array once at the end.
+
+    Each record is appended to `<name>.jsonl` as one line, and the file is flushed every `batch_size`
+    records, so writing a match never rewrites earlier results. `close()` converts the JSON Lines file into
+    the indented JSON array that `relevant_links.json` has always contained.
+
+    Parameters:
+    json_path (str): Path of the final JSON array, e.g. 'uploads/relevant_links.json'.
+    batch_size (int, optional): The number of records buffered between flushes. Default is 20.
+
+    Example:
+    >>> sink = JsonlFileSink("uploads/relevant_links.json")
+    >>> sink.write({'url': 'https://example.com/tutoring', 'matched_keywords': ['Tutoring']})
+    >>> sink.close()
+    """
+
+    def __init__(self, json_path, batch_size=20):
+        self.json_path = json_path
+        self.jsonl_path = os.path.splitext(json_path)[0] + '.jsonl'
+        self.batch_size = batch_size
+        self.count = 0
+        self._pending = 0
+        os.makedirs(os.path.dirname(os.path.abspath(json_path)), exist_ok=True)
+        self._file = open(self.jsonl_path, 'w', encoding='utf-8')
+
+    def write(self, record):
+        """
+        Appends one record to the JSON Lines file.
+
+        Parameters:
+        record (dict): The record to write.
+        """
+        self._file.write(json.dumps(record) + '\n')
+        self.count += 1
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Flushes buffered records to disk.
+        """
+        self._file.flush()
+        self._pending = 0
+
+    def close(self):
+        """
+        Closes the JSON Lines file and writes the final JSON array from it, one record at a time.
+        """
+        if self._file.closed:
+            return
+        self._file.close()
+        with open(self.jsonl_path, 'r', encoding='utf-8') as source, \
+                open(self.json_path, 'w', encoding='utf-8') as target:
+            target.write('[')
+            first = True
+            for line in source:
+                if not line.strip():
+                    continue
+                record = json.dumps(json.loads(line), indent=2)
+                target.write('\n' if first else ',\n')
+                target.write('  ' + record.replace('\n', '\n  '))
+                first = False
+            target.write('\n]' if not first else ']')
+
+
+class MemorySink:
+    """
+    Collects crawl results in a list.
+
+    Example:
+    >>> sink = MemorySink()
+    >>> sink.write({'url': 'https://example.com', 'matched_keywords': ['Tutoring']})
+    >>> sink.records
+    [{'url': 'https://example.com', 'matched_keywords': ['Tutoring']}]
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class QueueSink:
+    """
+    Hands crawl results to a consumer through a queue as soon as they are found.
+
+    A later stage can start working on relevant pages while the crawl is still running. `close()` puts
+    `QueueSink.DONE` on the queue to tell the consumer that no more records will follow.
+
+    Parameters:
+    results_queue (queue.Queue, optional): The queue to put records on. A new unbounded queue is created if not given.
+
+    Example:
+    >>> sink = QueueSink()
+    >>> sink.write({'url': 'https://example.com', 'matched_keywords': ['Tutoring']})
+    >>> sink.close()
+    >>> list(iter(sink.queue.get, QueueSink.DONE))
+    [{'url': 'https://example.com', 'matched_keywords': ['Tutoring']}]
+    """
+
+    DONE = None
+
+    def __init__(self, results_queue=None):
+        self.queue = results_queue if results_queue is not None else queue.Queue()
+
+    def write(self, record):
+        self.queue.put(record)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.queue.put(self.DONE)
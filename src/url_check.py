@@ -0,0 +1,172 @@
+import os
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+
+from src.crawler import create_session
+from src.metrics import METRICS
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, 'uploads', 'url_check_cache.sqlite3')
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_WORKERS = 16
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Servers that answer HEAD with one of these statuses are retried with GET
+HEAD_FALLBACK_STATUSES = {403, 405, 406, 429, 501}
+
+
+class UrlChecker:
+    """
+    Checks whether URLs are reachable, in parallel and with a persistent result cache.
+
+    Each URL is requested with HEAD (following redirects) over a pooled keep-alive session with strict
+    timeouts, and retried with a streamed GET when the server rejects HEAD. Repeated URLs are checked once.
+    Definitive results are cached in SQLite for `ttl_seconds`; timeouts and connection errors are not cached,
+    so they are retried on the next run. New results are written by `save_cache`, which only adds or updates
+    the rows this checker produced, so checkers in concurrent runs and processes can share one cache file.
+
+    Every result is a dict with 'url', 'valid', 'status_code', 'reason', 'latency' (seconds) and 'cached'.
+
+    Parameters:
+    max_workers (int, optional): The number of URLs checked at once. Default is 16.
+    timeout (tuple, optional): The (connect, read) timeouts in seconds. Default is (3.05, 10).
+    cache_path (str, optional): Path of the SQLite cache, or None to disable caching.
+    Default is 'uploads/url_check_cache.sqlite3'.
+    ttl_seconds (int, optional): How long a cached result stays valid. Default is one day.
+
+    Example:
+    >>> checker = UrlChecker()
+    >>> results = checker.check_many(["https://example.edu/tutoring", "https://example.edu/missing"])
+    >>> results["https://example.edu/missing"]["reason"]
+    'HTTP 404'
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT, cache_path=DEFAULT_CACHE_PATH,
+                 ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_seconds
+        self.session = create_session(max_workers, max_workers)
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._unsaved = {}
+        self._conn = None
+        if cache_path:
+            if cache_path != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS url_checks ("
+                "url TEXT PRIMARY KEY, valid INTEGER NOT NULL, status_code INTEGER, reason TEXT, "
+                "checked_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+            rows = self._conn.execute("SELECT url, valid, status_code, reason, checked_at FROM url_checks "
+                                      "WHERE checked_at >= ?", (time.time() - ttl_seconds,)).fetchall()
+            self._cache = {url: {'valid': bool(valid), 'status_code': status_code, 'reason': reason,
+                                 'checked_at': checked_at} for url, valid, status_code, reason, checked_at in rows}
+
+    def save_cache(self):
+        """
+        Writes the results checked since the last save to the cache and removes expired ones.
+
+        A stored result is only replaced by a newer one, so saves from concurrent checkers can run in any order.
+        """
+        if self._conn is None:
+            return
+        with self._lock:
+            unsaved, self._unsaved = self._unsaved, {}
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO url_checks (url, valid, status_code, reason, checked_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (url) DO UPDATE SET valid = excluded.valid, status_code = excluded.status_code, "
+                    "reason = excluded.reason, checked_at = excluded.checked_at "
+                    "WHERE excluded.checked_at > url_checks.checked_at",
+                    [(url, int(entry['valid']), entry['status_code'], entry['reason'], entry['checked_at'])
+                     for url, entry in unsaved.items()]
+                )
+                self._conn.execute("DELETE FROM url_checks WHERE checked_at < ?", (time.time() - self.ttl_seconds,))
+
+    def _request(self, url):
+        response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+        if response.status_code in HEAD_FALLBACK_STATUSES:
+            response.close()
+            response = self.session.get(url, allow_redirects=True, timeout=self.timeout, stream=True)
+        response.close()
+        return response.status_code
+
+    def check(self, url):
+        """
+        Checks a single URL, using the cache when possible.
+
+        Parameters:
+        url (str): The URL to check.
+
+        Returns:
+        dict: The check result.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(url)
+        if entry and now - entry['checked_at'] <= self.ttl_seconds:
+            METRICS.inc('url_checks_total', result='cached')
+            return {'url': url, 'valid': entry['valid'], 'status_code': entry['status_code'],
+                    'reason': entry['reason'], 'latency': 0.0, 'cached': True}
+
+        result = {'url': url, 'valid': False, 'status_code': None, 'reason': None, 'latency': 0.0, 'cached': False}
+        parsed = urlparse(url or '')
+        if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+            result['reason'] = 'Invalid URL'
+            METRICS.inc('url_checks_total', result='invalid')
+            return result
+
+        started = time.monotonic()
+        transient = False
+        try:
+            status_code = self._request(url)
+            result['status_code'] = status_code
+            result['valid'] = status_code == 200
+            result['reason'] = 'OK' if status_code == 200 else f"HTTP {status_code}"
+        except requests.Timeout:
+            result['reason'] = 'Timed out'
+            transient = True
+        except requests.ConnectionError:
+            result['reason'] = 'Connection error'
+            transient = True
+        except requests.RequestException as e:
+            result['reason'] = f"Request error: {e.__class__.__name__}"
+        result['latency'] = round(time.monotonic() - started, 3)
+        METRICS.observe('url_check_seconds', result['latency'])
+        METRICS.inc('url_checks_total', result='error' if transient else 'valid' if result['valid'] else 'invalid')
+
+        if not transient:
+            entry = {'valid': result['valid'], 'status_code': result['status_code'], 'reason': result['reason'],
+                     'checked_at': now}
+            with self._lock:
+                self._cache[url] = entry
+                self._unsaved[url] = entry
+        return result
+
+    def check_many(self, urls):
+        """
+        Checks a list of URLs in parallel, checking each distinct URL once, and saves the cache.
+
+        Parameters:
+        urls (iterable): The URLs to check. Repeated URLs are checked once.
+
+        Returns:
+        dict: A mapping of URL to check result.
+        """
+        unique_urls = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = dict(zip(unique_urls, executor.map(self.check, unique_urls)))
+        self.save_cache()
+        return results
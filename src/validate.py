@@ -1,69 +1,101 @@
 import json
-import requests
+from src.url_check import UrlChecker
+from src.schema import validate_bulk_records, validate_ctdl_payload
 
 
-def validate_json(input_file, output_file):
+def validate_records(records, url_checker=None):
+    """Filters bulk upload records based on allowed values for support services and checks for valid URLs.
+
+    The records are validated and normalized against the compiled SupportServiceType / AccommodationType
+    enumerations and field rules in `src.schema`, and their 'SubjectWebpage' URLs are checked. All webpages
+    are checked up front in parallel, each distinct URL once, and rejected records and URLs are reported
+    with the reason.
+
+    Args:
+        records (list or dict): The bulk upload records.
+        url_checker (UrlChecker, optional): The checker used for webpage reachability. Default is a new UrlChecker.
+
+    Returns:
+        list: The valid, normalized records.
+    """
+    required_key = 'SubjectWebpage'
+
+    # Validate fields and enumerations locally before any network checks
+    data, rejected = validate_bulk_records(records)
+    for record, reason in rejected:
+        name = record.get('ResourceName') if isinstance(record, dict) else None
+        print(f"Rejected record {name or record!r}: {reason}")
+
+    # Check every webpage once, in parallel
+    if url_checker is None:
+        url_checker = UrlChecker()
+    url_results = url_checker.check_many(item[required_key] for item in data)
+    for result in url_results.values():
+        if not result['valid']:
+            print(f"Rejected {result['url']}: {result['reason']} ({result['latency']}s)")
+
+    return [item for item in data if url_results[item[required_key]]['valid']]
+
+
+def validate_json(input_file, output_file, url_checker=None):
     """Filters JSON data based on allowed values for support services and checks for valid URLs. 
     
-    This function reads a JSON file, filters the data based on allowed values for specific keys,
-    and checks if the 'SubjectWebpage' URL is valid. The filtered data is then written to a new JSON file.
+    This function reads a JSON file, filters its records with `validate_records`, and writes the filtered
+    data to a new JSON file.
     
     Args:
         input_file (str): Path to the input JSON file.
         output_file (str): Path to the output JSON file where filtered data will be saved.
+        url_checker (UrlChecker, optional): The checker used for webpage reachability. Default is a new UrlChecker.
     """
-    
-    keys_to_filter = ['SupportServiceType', 'AccommodationType']
-    allowed_values = {
-        'SupportServiceType': ['AcademicAdvising', 'AssistiveTechnologySupport', 'AudiologicalHealthCare', 
-        'BehavioralService', 'BenefitsSupport', 'CareerAdvising', 'CareerAssessment', 
-        'CareerExploration', 'CaseManagement', 'ChildcareSupport', 'ClothingAssistance', 'ComputerHub', 
-        'Counseling', 'CrisisSupport', 'DiversityEquityInclusion', 'EquipmentProvision', 'FinancialLiteracy', 
-        'HealthCare', 'ImmigrationAssistance', 'InternetAccess', 'JobPlacement', 'LearningResourceProvision', 
-        'LegalService', 'MentalHealthCounseling', 'Mentoring', 'Networking', 'NeurodivergenceService', 
-        'NoteTakingAssistance', 'PeerService', 'PersonalAssistance', 'PostalAddress', 'PsychologicalService', 
-        'PublicBenefitsCaseManagement', 'ReaderService', 'Rehabilitation', 'ResidentialLiving', 'RespiteCare', 
-        'SignLanguage', 'SkillMapping', 'StudySkills', 'SubstanceAbusePrevention', 'SupportCoordination', 
-        'SupportedWork', 'TalentMarketplaceSignaling', 'TechnologyLending', 'TestAssistance', 'Translation', 
-        'Transportation', 'Tutoring', 'VisionService'],
-        
-        'AccommodationType': ['PhysicalAccessibility', 'AccessibleHousing', 'AccessibleParking', 'AccessibleRestroom', 
-        'AdjustableLighting', 'AdjustableWorkstations', 'AlternativeFormats', 'AssistiveTechnology', 
-        'AudioCaptioning', 'CaptioningAndTranscripts', 'ClearSignage', 'ColorBlindness', 
-        'Communication', 'DietaryAccommodation',' FacilityAccommodation', 'FlexibleSchedule', 
-        'HearingLoops', 'MultipleLanguage', 'PhysicalAccessibility', 'PlainLanguage', 
-        'ResourceAndServiceAccommodation', 'ScreenReader', 'Sensory', 'ServiceAnimal', 
-        'TactileSignage']
-    }
-    required_key = 'SubjectWebpage'
-    
-    def is_valid_url(url): # Check if the URL is valid and reachable
-        try:
-            response = requests.head(url, allow_redirects=True)
-            return response.status_code == 200
-        except requests.RequestException:
-            return False
-    
     with open(input_file, 'r') as f:
         data = json.load(f)
-    
-    filtered_data = []
-    for item in data:
-        subject_webpage = item.get(required_key)
-        if not subject_webpage or not is_valid_url(subject_webpage):
-            continue  # Skip this item if the webpage is invalid or missing
-
-        new_item = item.copy()
-        for key in keys_to_filter:
-            if key in new_item and isinstance(new_item[key], str):
-                values = [v.strip() for v in new_item[key].split('|')]
-                valid_values = [v for v in values if v in allowed_values.get(key, [])]
-                new_item[key] = ' | '.join(valid_values)
-            else:
-                values = []
-        filtered_data.append(new_item)
+
+    filtered_data = validate_records(data, url_checker=url_checker)
     
     with open(output_file, 'w') as f:
         json.dump(filtered_data, f, indent=2)
 
-    print(f"Filtered data written to 'filtered_output.json' with {len(filtered_data)} valid entries.")
\ No newline at end of file
+    print(f"Filtered data written to 'filtered_output.json' with {len(filtered_data)} valid entries.")
+
+
+def validate_payload(payload):
+    """Validates a parsed CTDL bulk publish payload before it is sent to the registry.
+
+    This function normalizes the SupportServiceType and AccommodationType concepts of every service
+    (including their 'support:' / 'accommodation:' prefixes), removes values that are not in the
+    enumerations, and drops services that are missing required fields, so bad records are caught
+    locally instead of failing the publish request.
+
+    Args:
+        payload (dict): The parsed CTDL payload.
+
+    Returns:
+        dict: The validated payload.
+
+    Raises:
+        ValueError: If the payload is not a CTDL payload object.
+    """
+    payload, rejected = validate_ctdl_payload(payload)
+    for service, reason in rejected:
+        name = service.get('Name') if isinstance(service, dict) else None
+        print(f"Rejected service {name or service!r}: {reason}")
+    print(f"CTDL payload validated with {len(payload['SupportServices'])} valid services.")
+    return payload
+
+
+def validate_ctdl(json_string):
+    """Validates a CTDL bulk publish payload before it is sent to the registry.
+
+    This function parses the payload and validates it with `validate_payload`.
+
+    Args:
+        json_string (str): The CTDL payload returned by `gemini_query_api`.
+
+    Returns:
+        str: The validated payload as a JSON string.
+
+    Raises:
+        ValueError: If the payload is not valid JSON or not a CTDL payload object.
+    """
+    return json.dumps(validate_payload(json.loads(json_string)), indent=2)
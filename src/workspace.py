@@ -0,0 +1,259 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import threading
+
+from src.metrics import METRICS
+
+# Finished workspaces older than this are removed. Unfinished ones are removed too once this old, since a run
+# that never finished was interrupted.
+DEFAULT_MAX_AGE_SECONDS = int(os.getenv('WORKSPACE_MAX_AGE_SECONDS', str(7 * 24 * 3600)))
+# When all workspaces together take more bytes than this, the oldest finished ones are removed. 0 means no limit.
+DEFAULT_MAX_BYTES = int(os.getenv('WORKSPACE_MAX_BYTES', str(1024 ** 3)))
+
+# Written in every workspace with its run ID, domain and timestamps
+RUN_FILE = 'run.json'
+# Created in a workspace to ask the process running the job to stop it. A file of its own, since run.json is
+# rewritten by the running process and a flag merged into it by another process could be overwritten.
+CANCEL_FILE = 'cancel_requested'
+_RUN_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+def _folder_bytes(folder):
+    total = 0
+    for directory, _, files in os.walk(folder):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                pass
+    return total
+
+
+class WorkspaceManager:
+    """
+    Gives each pipeline run its own output folder, addressed by run ID, and removes old ones.
+
+    A workspace is `<root>/<run_id>` and holds everything specific to one run: the scraped content, relevant
+    links, Gemini JSON, CSV, publish log and other artifacts. Because no two runs write the same files, any
+    number of runs can execute at once, in one process or across the workers of a WSGI server. State that is
+    meant to carry over between runs (page cache, crawl state, publish state) stays in the shared upload folder.
+
+    All bookkeeping is in each workspace's run.json, so managers in different processes sharing `root` agree
+    on which runs exist and which have finished. Other fields can be stored there with `update`, such as the
+    job status `JobManager` shares with workers that did not run the job. Only the process running a job writes
+    its run.json; other processes ask for it to be cancelled with `request_cancel`. `cleanup` removes finished workspaces
+    older than `max_age` and then the oldest finished ones until the total size is within `max_bytes`; a
+    running workspace is only removed once it is older than `max_age`.
+
+    Parameters:
+    root (str): The directory holding the workspaces.
+    max_age_seconds (float, optional): How long a workspace is kept. Default is the WORKSPACE_MAX_AGE_SECONDS
+    environment variable, or 7 days.
+    max_bytes (int, optional): The total size of all workspaces, or 0 for no limit. Default is the
+    WORKSPACE_MAX_BYTES environment variable, or 1 GiB.
+
+    Example:
+    >>> workspaces = WorkspaceManager("uploads/runs")
+    >>> folder = workspaces.create(job.id, domain="illinois.edu")
+    >>> run_pipeline("illinois.edu", "bulk", KEYWORDS_FILE, folder, cache_folder="uploads")
+    >>> workspaces.finish(job.id)
+    >>> workspaces.path(job.id)
+    'uploads/runs/3f2a9c...'
+    """
+
+    def __init__(self, root, max_age_seconds=DEFAULT_MAX_AGE_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _read_run(self, folder):
+        try:
+            with open(os.path.join(folder, RUN_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_run(self, folder, run):
+        # A unique temp name, so processes updating the same run never write one temp file
+        tmp_path = os.path.join(folder, f"{RUN_FILE}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(run, f)
+        os.replace(tmp_path, os.path.join(folder, RUN_FILE))
+
+    def create(self, run_id=None, domain=None):
+        """
+        Creates the workspace of a new run, after removing expired workspaces.
+
+        Parameters:
+        run_id (str, optional): A 32-character lowercase hex ID, such as a job ID. Default is a new random ID.
+        domain (str, optional): The domain of the run, recorded in run.json. Default is None.
+
+        Returns:
+        str: The path of the workspace.
+
+        Raises:
+        ValueError: If the run ID is malformed or already has a workspace.
+        """
+        run_id = run_id or uuid.uuid4().hex
+        if not _RUN_ID.match(run_id):
+            raise ValueError(f"Invalid run ID: {run_id!r}")
+        self.cleanup()
+        folder = os.path.join(self.root, run_id)
+        try:
+            os.makedirs(folder)
+        except FileExistsError:
+            raise ValueError(f"Run {run_id} already has a workspace.") from None
+        self._write_run(folder, {'run_id': run_id, 'domain': domain, 'created_at': time.time(), 'finished_at': None})
+        return folder
+
+    def read(self, run_id):
+        """
+        Returns the run.json of a run.
+
+        Parameters:
+        run_id (str): The run ID.
+
+        Returns:
+        dict: The run's 'run_id', 'domain', 'created_at', 'finished_at' and any fields set with `update`, or None
+        if the workspace does not exist.
+        """
+        folder = self.path(run_id)
+        return self._read_run(folder) if folder else None
+
+    def update(self, run_id, **fields):
+        """
+        Sets fields in the run.json of a run, keeping the others.
+
+        Parameters:
+        run_id (str): The run ID.
+        **fields: The JSON-serializable fields to set.
+
+        Returns:
+        dict: The updated run.json, or None if the workspace does not exist.
+        """
+        folder = self.path(run_id)
+        if folder is None:
+            return None
+        with self._lock:
+            run = self._read_run(folder) or {'run_id': run_id}
+            run.update(fields)
+            self._write_run(folder, run)
+        return run
+
+    def request_cancel(self, run_id):
+        """
+        Asks the process running a run to cancel it, from any process.
+
+        Parameters:
+        run_id (str): The run ID.
+
+        Returns:
+        bool: True if the request was recorded, False if the workspace does not exist.
+        """
+        folder = self.path(run_id)
+        if folder is None:
+            return False
+        with open(os.path.join(folder, CANCEL_FILE), 'a', encoding='utf-8'):
+            pass
+        return True
+
+    def cancel_requested(self, run_id):
+        """
+        Returns whether a run was asked to cancel with `request_cancel`.
+
+        Parameters:
+        run_id (str): The run ID.
+
+        Returns:
+        bool: True if a cancel was requested.
+        """
+        folder = self.path(run_id)
+        return folder is not None and os.path.exists(os.path.join(folder, CANCEL_FILE))
+
+    def finish(self, run_id):
+        """
+        Marks a run as finished, so its workspace can be removed by the size limit.
+
+        Parameters:
+        run_id (str): The run ID.
+        """
+        self.update(run_id, finished_at=time.time())
+
+    def path(self, run_id):
+        """
+        Returns the workspace of a run.
+
+        Parameters:
+        run_id (str): The run ID, e.g. from a download URL.
+
+        Returns:
+        str: The path of the workspace, or None if the ID is malformed or the workspace does not exist.
+        """
+        if not run_id or not _RUN_ID.match(run_id):
+            return None
+        folder = os.path.join(self.root, run_id)
+        return folder if os.path.isdir(folder) else None
+
+    def file(self, run_id, name):
+        """
+        Returns the path of a file in a run's workspace.
+
+        Parameters:
+        run_id (str): The run ID.
+        name (str): The file name, e.g. 'support_services_but.csv'.
+
+        Returns:
+        str: The path of the file, or None if the workspace or file does not exist.
+        """
+        folder = self.path(run_id)
+        if folder is None or os.path.basename(name) != name:
+            return None
+        path = os.path.join(folder, name)
+        return path if os.path.isfile(path) else None
+
+    def cleanup(self):
+        """
+        Removes expired workspaces, then the oldest finished ones while the total exceeds `max_bytes`.
+
+        Returns:
+        int: The number of workspaces removed.
+        """
+        with self._lock:
+            now = time.time()
+            finished = []
+            total = 0
+            removed = 0
+            for run_id in os.listdir(self.root):
+                folder = os.path.join(self.root, run_id)
+                if not _RUN_ID.match(run_id) or not os.path.isdir(folder):
+                    continue
+                run = self._read_run(folder) or {}
+                # A workspace without run.json is being created, or its run.json was lost; its mtime stands in
+                created_at = run.get('created_at') or os.path.getmtime(folder)
+                finished_at = run.get('finished_at')
+                if now - (finished_at or created_at) > self.max_age_seconds:
+                    shutil.rmtree(folder, ignore_errors=True)
+                    METRICS.inc('workspaces_removed_total', reason='age')
+                    removed += 1
+                    continue
+                size = _folder_bytes(folder)
+                total += size
+                if finished_at:
+                    finished.append((finished_at, folder, size))
+
+            for _, folder, size in sorted(finished):
+                if not self.max_bytes or total <= self.max_bytes:
+                    break
+                shutil.rmtree(folder, ignore_errors=True)
+                METRICS.inc('workspaces_removed_total', reason='size')
+                total -= size
+                removed += 1
+        if removed:
+            print(f"Removed {removed} old run workspaces.")
+        return removed
@@ -0,0 +1,20 @@
+import json
+
+from src.chunking import merge_api_results, merge_but_results
+
+
+def test_a_chunk_without_services_still_counts_as_a_result():
+    merged = merge_api_results(['[]', 'not json'])
+
+    assert json.loads(merged) == {'SupportServices': []}
+    assert merge_but_results(['[]']) == '[]'
+    assert merge_api_results(['not json', None]) is None
+
+
+def test_string_values_are_merged_as_single_list_items():
+    first = {'SupportServices': [{'Name': 'Tutoring', 'AvailableAt': 'Main Campus'}]}
+    second = {'SupportServices': [{'Name': 'Tutoring', 'AvailableAt': ['Main Campus', 'Online']}]}
+
+    merged = json.loads(merge_api_results([json.dumps(first), json.dumps(second)]))
+
+    assert merged['SupportServices'][0]['AvailableAt'] == ['Main Campus', 'Online']
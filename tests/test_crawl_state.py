@@ -0,0 +1,84 @@
+import pytest
+
+from benchmarks.site import SiteServer
+from src.crawl_state import CrawlState
+from src.crawler import crawl_site
+from src.page_store import PageStore
+from src.sinks import MemorySink
+
+KEYWORDS = ['Tutoring', 'Counseling', 'Career Services', 'Disability Services']
+WORKERS = 4
+
+
+class Crash(Exception):
+    pass
+
+
+class CrashingSink(MemorySink):
+    # Stops the crawl like a killed process: no final checkpoint and no final page index save
+    def __init__(self, after):
+        super().__init__()
+        self.after = after
+
+    def write(self, record):
+        super().write(record)
+        if len(self.records) == self.after:
+            raise Crash()
+
+
+def crash_and_resume(site, folder, after):
+    state_path = str(folder / 'crawl_state.sqlite3')
+    cache_dir = str(folder / 'page_cache')
+    with pytest.raises(Crash):
+        crawl_site([site.url], KEYWORDS, max_depth=4, max_workers=WORKERS, page_store=PageStore(cache_dir=cache_dir),
+                   sink=CrashingSink(after),
+                   state=CrawlState(state_path, crawl_id='site', checkpoint_seconds=60, checkpoint_urls=3))
+
+    # The crashed crawl still holds its claim; without a lease it is resumed at once
+    state = CrawlState(state_path, crawl_id='site', lease_seconds=0)
+    checkpointed = {url for url, in state._conn.execute(
+        "SELECT url FROM urls WHERE crawl_id = 'site' AND status = 'fetched'")}
+    page_store = PageStore(cache_dir=cache_dir)
+    resumed = crawl_site([site.url], KEYWORDS, max_depth=4, max_workers=WORKERS, page_store=page_store,
+                         sink=MemorySink(), state=state)
+    state.close()
+    return checkpointed, page_store, resumed
+
+
+def test_an_interrupted_crawl_resumes_from_its_last_checkpoint(tmp_path):
+    with SiteServer(pages=40, fanout=4) as site:
+        full = crawl_site([site.url], KEYWORDS, max_depth=4, max_workers=WORKERS, sink=MemorySink())
+        # Every crash point, since checkpoints are triggered both by queued links and by fetched pages
+        for after in range(1, len(full)):
+            checkpointed, page_store, resumed = crash_and_resume(site, tmp_path / str(after), after)
+
+            assert checkpointed
+            # Pages fetched before the interruption are read from the page cache; only those in flight are fetched again
+            assert all(page_store.get(url) is not None for url in checkpointed)
+            assert page_store.fetched <= len(site.page_urls()) - len(checkpointed) + WORKERS
+            assert sorted(entry['url'] for entry in resumed) == sorted(entry['url'] for entry in full)
+
+
+def test_a_crawl_in_progress_is_neither_resumed_nor_replaced_by_another_run(tmp_path):
+    path = str(tmp_path / 'crawl_state.sqlite3')
+    params = {'start_urls': ['https://example.edu'], 'max_depth': 2}
+    first = CrawlState(path, crawl_id='example.edu', owner='first')
+    assert not first.start(params)
+    first.queue('https://example.edu', 0, 'example.edu')
+    first.checkpoint()
+
+    second = CrawlState(path, crawl_id='example.edu', owner='second')
+    assert not second.start(dict(params, max_depth=3))
+    assert second.crawl_id == 'example.edu:second'
+    second.queue('https://example.edu/other', 0, 'example.edu')
+    second.finish()
+    second.close()
+
+    assert first.frontier() == [('https://example.edu', 0, 'example.edu')]
+    first.close()
+    # Once released, the next run resumes the unfinished crawl; the private crawl left nothing behind
+    third = CrawlState(path, crawl_id='example.edu', owner='third')
+    assert third.start(params)
+    assert third.visited() == {'https://example.edu'}
+    assert third._conn.execute("SELECT COUNT(*) FROM crawls").fetchone()[0] == 1
+    third.close()
@@ -0,0 +1,67 @@
+import os
+import threading
+
+from src.jobs import CANCELLED, SUCCEEDED, JobManager
+from src.pipeline import PIPELINE_STAGES, PipelineCancelled
+from src.workspace import WorkspaceManager
+
+
+def run_stages(job, started=None):
+    # Walks the pipeline stages like run_pipeline, stopping at a stage boundary once cancelled
+    for stage in PIPELINE_STAGES:
+        if started is not None:
+            started.set()
+        if job.cancel_event.wait(0.05):
+            raise PipelineCancelled(f"Cancelled before the {stage} stage.")
+        job.update_stage(stage, 'running')
+        job.update_stage(stage, 'done')
+    return {'ctdl_json': '[]', 'messages': [], 'metrics': {'stage_seconds': {}}}
+
+
+def test_a_job_run_by_one_process_is_visible_to_another(tmp_path):
+    # Each manager has its own WorkspaceManager, like two workers of a WSGI server sharing the upload folder
+    worker = JobManager(run_stages, max_workers=1, workspaces=WorkspaceManager(str(tmp_path)))
+    other = JobManager(run_stages, max_workers=1, workspaces=WorkspaceManager(str(tmp_path)))
+
+    job = worker.submit('example.edu', 'bulk')
+    job.future.result()
+    seen = other.get(job.id)
+
+    assert seen.status == SUCCEEDED
+    assert seen.domain == 'example.edu'
+    assert all(info['status'] == 'done' for info in seen.stages.values())
+    assert seen.result['ctdl_json'] == '[]'
+    assert other.workspaces.read(job.id)['finished_at'] is not None
+    assert other.get('0' * 32) is None
+
+
+def test_a_job_is_cancelled_from_another_process(tmp_path):
+    started = threading.Event()
+    worker = JobManager(lambda job: run_stages(job, started), max_workers=1,
+                        workspaces=WorkspaceManager(str(tmp_path)))
+    other = JobManager(run_stages, max_workers=1, workspaces=WorkspaceManager(str(tmp_path)))
+
+    job = worker.submit('example.edu', 'bulk')
+    started.wait(5)
+    other.cancel(job.id)
+    job.future.result()
+
+    assert job.status == CANCELLED
+    assert other.get(job.id).status == CANCELLED
+    # The request is a file of its own, so the running worker's run.json writes cannot drop it
+    assert os.path.exists(os.path.join(tmp_path, job.id, 'cancel_requested'))
+    assert 'cancel_requested' not in other.workspaces.read(job.id)
+
+
+def test_cleanup_removes_expired_and_oversized_finished_workspaces(tmp_path):
+    workspaces = WorkspaceManager(str(tmp_path))
+    finished = workspaces.create(domain='example.edu')
+    running = workspaces.create(domain='example.org')
+    workspaces.finish(os.path.basename(finished))
+
+    assert WorkspaceManager(str(tmp_path), max_bytes=1).cleanup() == 1
+    assert not os.path.exists(finished)
+    assert os.path.exists(running)
+
+    assert WorkspaceManager(str(tmp_path), max_age_seconds=-1).cleanup() == 1
+    assert not os.path.exists(running)
@@ -0,0 +1,20 @@
+import src.gemini_query as gemini_query
+from benchmarks.site import SiteServer
+from benchmarks.stubs import RegistryStub, offline_pipeline
+from src.pipeline import run_pipeline
+
+
+def test_a_run_without_matching_pages_succeeds_without_calling_gemini(tmp_path, monkeypatch):
+    keywords_file = tmp_path / 'keywords.txt'
+    keywords_file.write_text('Quantum Chromodynamics\n', encoding='utf-8')
+    calls = []
+
+    with SiteServer(pages=20) as site, RegistryStub() as registry, offline_pipeline(registry.url):
+        monkeypatch.setattr(gemini_query, '_generate_json', lambda *args, **kwargs: calls.append(args))
+        result = run_pipeline(site.url, 'bulk', str(keywords_file), str(tmp_path / 'run'), save_artifacts=False,
+                              cache_folder=str(tmp_path / 'cache'))
+
+    assert calls == []
+    assert result['ctdl_json'] is None
+    assert result['messages'] == [("error", "No links found with the specified keywords. Please check your input.")]
+    assert result['metrics']['relevant_pages'] == 0
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+import src.publish as publish
+from benchmarks.stubs import RegistryStub
+from src.publish import post_bulk_publish
+from src.publish_state import PublishState
+
+
+def make_payload(count):
+    return {
+        'PublishForOrganizationIdentifier': 'ce-00000000-0000-4000-8000-000000000000',
+        'DefaultLanguage': 'en-US',
+        'SupportServices': [{
+            'CTID': f"ce-00000000-0000-4000-8000-{index:012d}",
+            'Name': f"Service {index}",
+            'Description': f"Support service number {index}.",
+            'SubjectWebpage': f"https://example.edu/services/{index}/"
+        } for index in range(count)]
+    }
+
+
+def read_log(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    # Retries happen immediately, so the tests do not sleep
+    monkeypatch.setattr(publish.random, 'uniform', lambda low, high: 0)
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / 'publish_log.jsonl')
+
+
+def test_services_are_sent_in_batches(log_path):
+    with RegistryStub() as registry:
+        summary = post_bulk_publish(make_payload(7), batch_size=3, url=registry.url, log_path=log_path)
+
+    assert sorted(registry.batches) == [['Service 0', 'Service 1', 'Service 2'],
+                                        ['Service 3', 'Service 4', 'Service 5'],
+                                        ['Service 6']]
+    assert summary['batches'] == 3
+    assert summary['published'] == 7
+    assert summary['failed'] == 0
+    assert summary['failed_batches'] == 0
+
+
+def test_only_transiently_failed_batches_are_retried(log_path):
+    # Service 0's batch fails twice with 503, Service 3's batch is rejected with 400 and never retried
+    with RegistryStub(transient={'Service 0': 2}, invalid={'Service 3'}) as registry:
+        summary = post_bulk_publish(make_payload(6), batch_size=2, retries=3, url=registry.url, log_path=log_path)
+
+    sent = [batch[0] for batch in registry.batches]
+    assert sent.count('Service 0') == 3
+    assert sent.count('Service 2') == 1
+    assert sent.count('Service 4') == 1
+    assert registry.requests == 5
+
+    outcomes = {outcome['name']: outcome for outcome in summary['outcomes']}
+    assert outcomes['Service 0']['successful'] and outcomes['Service 0']['attempts'] == 3
+    assert outcomes['Service 2']['attempts'] == 1
+    assert not outcomes['Service 3']['successful'] and outcomes['Service 3']['status_code'] == 400
+    assert summary['published'] == 4
+    assert summary['failed_batches'] == 1
+
+
+def test_transient_failures_give_up_after_the_last_attempt(log_path):
+    with RegistryStub(transient={'Service 1': 5}, transient_status=429) as registry:
+        summary = post_bulk_publish(make_payload(4), batch_size=2, retries=2, url=registry.url, log_path=log_path)
+
+    assert registry.requests == 3
+    outcomes = {outcome['name']: outcome for outcome in summary['outcomes']}
+    assert not outcomes['Service 1']['successful']
+    assert outcomes['Service 1']['status_code'] == 429
+    assert outcomes['Service 1']['attempts'] == 2
+    assert outcomes['Service 2']['successful']
+
+
+def test_each_service_gets_its_own_outcome(log_path):
+    with RegistryStub(rejected={'Service 1'}) as registry:
+        summary = post_bulk_publish(make_payload(3), batch_size=3, url=registry.url, log_path=log_path)
+
+    assert [(outcome['name'], outcome['successful']) for outcome in summary['outcomes']] == [
+        ('Service 0', True), ('Service 1', False), ('Service 2', True)]
+    assert summary['outcomes'][1]['messages'] == ["Service 1 was rejected."]
+    assert summary['outcomes'][1]['ctid'] == "ce-00000000-0000-4000-8000-000000000001"
+    assert summary['published'] == 2
+    assert summary['failed'] == 1
+    assert summary['failed_batches'] == 1
+    assert registry.services == 2
+
+
+def test_publish_log_is_appended_one_line_per_service(log_path):
+    with RegistryStub(rejected={'Service 2'}) as registry:
+        post_bulk_publish(make_payload(3), batch_size=2, url=registry.url, log_path=log_path)
+        first = read_log(log_path)
+        post_bulk_publish(make_payload(2), batch_size=2, url=registry.url, log_path=log_path)
+        entries = read_log(log_path)
+
+    assert len(first) == 3
+    assert entries[:3] == first
+    assert len(entries) == 5
+    assert [entry['name'] for entry in entries] == ['Service 0', 'Service 1', 'Service 2', 'Service 0', 'Service 1']
+    assert [entry['batch'] for entry in first] == [0, 0, 1]
+    assert not entries[2]['successful']
+    assert all({'run', 'status_code', 'attempts', 'messages', 'ctid'} <= set(entry) for entry in entries)
+
+
+def test_reworded_descriptions_are_unchanged_and_removals_are_reported_once(log_path):
+    state = PublishState(':memory:')
+    with RegistryStub() as registry:
+        post_bulk_publish(make_payload(3), url=registry.url, log_path=log_path, state=state, scope='example.edu')
+
+        payload = make_payload(2)
+        payload['SupportServices'][0]['Description'] = "Reworded by the model."
+        second = post_bulk_publish(payload, url=registry.url, log_path=log_path, state=state, scope='example.edu')
+        third = post_bulk_publish(make_payload(2), url=registry.url, log_path=log_path, state=state,
+                                  scope='example.edu')
+
+    assert second['services'] == 0
+    assert [service['name'] for service in second['removed']] == ['Service 2']
+    assert third['services'] == 0
+    assert third['removed'] == []
+    assert registry.services == 3